@@ -0,0 +1,27 @@
+"""Add forecast monthly demand to production needs
+
+Revision ID: 3f8a61d2c9e0
+Revises: e7c2f0a95d14
+Create Date: 2026-10-17 19:02:37.114583
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8a61d2c9e0'
+down_revision: Union[str, None] = 'e7c2f0a95d14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Filled by the next production_needs rebuild, readers fall back to recently_sold / 3
+    op.add_column('production_needs', sa.Column('forecast_monthly', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('production_needs', 'forecast_monthly')
@@ -0,0 +1,45 @@
+"""Unique product mapping external key
+
+Revision ID: 4b7e1c9d2a6f
+Revises: 85a803d60572
+Create Date: 2026-10-17 09:12:31.418203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7e1c9d2a6f'
+down_revision: Union[str, None] = '85a803d60572'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keep the most recently synced row for duplicated (platform, external_id) pairs
+    op.execute("""
+        DELETE FROM product_mappings
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY platform, external_id
+                    ORDER BY last_synced DESC NULLS LAST, id
+                ) AS duplicate_rank
+                FROM product_mappings
+                WHERE external_id IS NOT NULL
+            ) ranked
+            WHERE duplicate_rank > 1
+        )
+    """)
+    op.create_unique_constraint(
+        'uq_product_mappings_platform_external_id',
+        'product_mappings',
+        ['platform', 'external_id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_product_mappings_platform_external_id', 'product_mappings', type_='unique')
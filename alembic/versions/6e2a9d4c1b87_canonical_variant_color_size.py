@@ -0,0 +1,128 @@
+"""Canonical variant color/size
+
+Revision ID: 6e2a9d4c1b87
+Revises: 9c3f5a8e7d21
+Create Date: 2026-10-17 13:05:41.218406
+
+"""
+from typing import Sequence, Union
+
+import re
+
+from alembic import op
+import sqlalchemy as sa
+from rapidfuzz import fuzz, process
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e2a9d4c1b87'
+down_revision: Union[str, None] = '9c3f5a8e7d21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# services.variant_normalizer's alias tables and rules as of this revision,
+# so the data migration gives the same result however the service changes
+COLOR_ALIASES = {
+    "Black": ["blk", "bk", "blck", "noir", "jet black"],
+    "White": ["wht", "wh", "whte", "optic white"],
+    "Ivory": ["ivr", "ivry", "off white", "offwhite", "ecru"],
+    "Cream": ["crm"],
+    "Navy": ["nvy", "nav", "navy blue", "dark navy"],
+    "Blue": ["blu", "bl"],
+    "Grey": ["gray", "gry", "gy", "grey marl", "grey melange"],
+    "Charcoal": ["char", "chrcl", "charcoal grey", "charcoal gray", "dark grey", "dark gray"],
+    "Brown": ["brn", "brwn", "chocolate"],
+    "Camel": ["cml", "caml"],
+    "Beige": ["bge", "bei"],
+    "Stone": ["stn"],
+    "Khaki": ["khk", "kaki"],
+    "Olive": ["olv", "olive green"],
+    "Green": ["grn", "gren"],
+    "Burgundy": ["burg", "brgndy", "bgd", "wine", "bordeaux"],
+    "Red": ["rd"],
+    "Pink": ["pnk"],
+    "Purple": ["prpl", "purp"],
+    "Orange": ["org", "orng"],
+    "Yellow": ["ylw", "yel", "yllw"],
+    "Tan": [],
+    "Taupe": ["tpe"],
+    "Silver": ["slv", "slvr"],
+    "Gold": ["gld"],
+}
+SIZE_ALIASES = {
+    "XXS": ["2xs", "xxsmall", "xxsml"],
+    "XS": ["xsmall", "xsml", "extrasmall", "xsm"],
+    "S": ["small", "sml", "sm"],
+    "M": ["med", "medium", "md", "mdm"],
+    "L": ["large", "lrg", "lg", "lge"],
+    "XL": ["xlarge", "xlrg", "xlg", "extralarge", "1xl"],
+    "XXL": ["2xl", "xxlarge", "xxlg"],
+    "XXXL": ["3xl", "xxxlarge"],
+    "ONE SIZE": ["os", "onesize", "one", "osfa", "onesizefitsall"],
+}
+COLOR_FUZZY_CUTOFF = 85
+COLOR_FUZZY_MIN_LENGTH = 4  # "ink" must not become "Pink"
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _key(value: str) -> str:
+    return _NON_ALNUM.sub('', value.lower())
+
+
+def _lookup(aliases) -> dict:
+    lookup = {}
+    for canonical, spellings in aliases.items():
+        lookup[_key(canonical)] = canonical
+        for spelling in spellings:
+            lookup[_key(spelling)] = canonical
+    return lookup
+
+
+def _resolver(aliases, fuzzy: bool, casing):
+    lookup = _lookup(aliases)
+    keys = list(lookup)
+
+    def resolve(raw):
+        cleaned = _WHITESPACE.sub(' ', str(raw)).strip()
+        key = _key(cleaned)
+        if not key:
+            return None
+        if key in lookup:
+            return lookup[key]
+        if fuzzy and len(key) >= COLOR_FUZZY_MIN_LENGTH:
+            match = process.extractOne(key, keys, scorer=fuzz.ratio, score_cutoff=COLOR_FUZZY_CUTOFF)
+            if match:
+                return lookup[match[0]]
+        return casing(cleaned)
+    return resolve
+
+
+def _canonicalize(table: str, column: str, resolve) -> None:
+    connection = op.get_bind()
+    raw_values = connection.execute(
+        sa.text(f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL")
+    ).scalars().all()
+    for raw in raw_values:
+        canonical = resolve(raw)
+        if canonical != raw:
+            connection.execute(
+                sa.text(f"UPDATE {table} SET {column} = :canonical WHERE {column} = :raw"),
+                {"canonical": canonical, "raw": raw}
+            )
+
+
+def upgrade() -> None:
+    # Existing rows get the same canonical values new imports are written with
+    color = _resolver(COLOR_ALIASES, fuzzy=True, casing=str.title)
+    size = _resolver(SIZE_ALIASES, fuzzy=False, casing=str.upper)
+    for table in ('product_variants', 'purchase_order_items'):
+        _canonicalize(table, 'color', color)
+        _canonicalize(table, 'size', size)
+
+    op.create_index('ix_product_variants_style_color_size', 'product_variants', ['style_id', 'color', 'size'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_variants_style_color_size', table_name='product_variants')
@@ -0,0 +1,35 @@
+"""Add name synonyms
+
+Revision ID: 9c3f5a8e7d21
+Revises: 4b7e1c9d2a6f
+Create Date: 2026-10-17 11:40:05.772914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3f5a8e7d21'
+down_revision: Union[str, None] = '4b7e1c9d2a6f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('name_synonyms',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('phrase', sa.String(length=200), nullable=False),
+    sa.Column('replacement', sa.String(length=200), nullable=False),
+    sa.Column('active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('phrase')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('name_synonyms')
@@ -0,0 +1,45 @@
+"""Add factory capacities and lead times
+
+Revision ID: a5d3c8e1f472
+Revises: 3f8a61d2c9e0
+Create Date: 2026-10-17 20:14:51.306218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5d3c8e1f472'
+down_revision: Union[str, None] = '3f8a61d2c9e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('factory_capacities',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('factory_name', sa.String(length=200), nullable=False),
+    sa.Column('daily_capacity', sa.Integer(), nullable=False),
+    sa.Column('lead_time_days', sa.Integer(), nullable=False),
+    sa.Column('active', sa.Boolean(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('factory_name')
+    )
+    op.create_table('factory_lead_times',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('factory_id', sa.UUID(), nullable=False),
+    sa.Column('category', sa.String(length=100), nullable=False),
+    sa.Column('lead_time_days', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['factory_id'], ['factory_capacities.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('factory_id', 'category', name='uq_factory_lead_times_factory_category')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('factory_lead_times')
+    op.drop_table('factory_capacities')
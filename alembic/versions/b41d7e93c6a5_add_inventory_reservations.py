@@ -0,0 +1,42 @@
+"""Add inventory reservations
+
+Revision ID: b41d7e93c6a5
+Revises: 6e2a9d4c1b87
+Create Date: 2026-10-17 16:22:48.530917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41d7e93c6a5'
+down_revision: Union[str, None] = '6e2a9d4c1b87'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('inventory_reservations',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('inventory_id', sa.UUID(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('reference', sa.String(length=200), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['inventory_id'], ['inventory.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_inventory_reservations_inventory_id'), 'inventory_reservations', ['inventory_id'], unique=False)
+    op.create_index(op.f('ix_inventory_reservations_status'), 'inventory_reservations', ['status'], unique=False)
+    op.create_index(op.f('ix_inventory_reservations_expires_at'), 'inventory_reservations', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_inventory_reservations_expires_at'), table_name='inventory_reservations')
+    op.drop_index(op.f('ix_inventory_reservations_status'), table_name='inventory_reservations')
+    op.drop_index(op.f('ix_inventory_reservations_inventory_id'), table_name='inventory_reservations')
+    op.drop_table('inventory_reservations')
@@ -0,0 +1,32 @@
+"""Add catalog state version counter
+
+Revision ID: c82e4f19a7b3
+Revises: a5d3c8e1f472
+Create Date: 2026-10-17 22:31:08.540127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c82e4f19a7b3'
+down_revision: Union[str, None] = 'a5d3c8e1f472'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    catalog_state = op.create_table('catalog_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # The single row every product-writing transaction increments
+    op.bulk_insert(catalog_state, [{'id': 1, 'version': 1}])
+
+
+def downgrade() -> None:
+    op.drop_table('catalog_state')
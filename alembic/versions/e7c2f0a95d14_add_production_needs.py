@@ -0,0 +1,121 @@
+"""Add production needs read model
+
+Revision ID: e7c2f0a95d14
+Revises: b41d7e93c6a5
+Create Date: 2026-10-17 17:48:12.904316
+
+"""
+from typing import Sequence, Union
+
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+from decouple import config
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7c2f0a95d14'
+down_revision: Union[str, None] = 'b41d7e93c6a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The tables as of this revision, the build below must not follow later model changes
+orders = sa.table('orders', sa.column('id'), sa.column('status'), sa.column('order_date'), sa.column('required_date'))
+order_items = sa.table('order_items', sa.column('order_id'), sa.column('product_id'), sa.column('quantity'))
+inventory = sa.table('inventory', sa.column('product_id'), sa.column('quantity_available'))
+production_orders = sa.table('production_orders', sa.column('product_id'), sa.column('quantity_to_produce'), sa.column('status'))
+production_needs = sa.table(
+    'production_needs', *(sa.column(name) for name in (
+        'product_id', 'orders_pending', 'earliest_required', 'recently_sold', 'current_stock',
+        'incoming_production', 'safety_stock_needed', 'total_needed', 'total_available', 'to_produce', 'updated_at'
+    ))
+)
+
+
+def _build_needs() -> None:
+    """The production_needs rows as services.production_needs computed them at this revision, in one INSERT ... SELECT"""
+    pending_statuses = ['pending', 'processing', 'confirmed']
+    three_months_ago = datetime.now() - timedelta(days=90)
+    safety_stock_percentage = config('SAFETY_STOCK_PERCENTAGE', default=0.1, cast=float)
+
+    pending = sa.select(
+        order_items.c.product_id,
+        sa.func.sum(sa.case((orders.c.status.in_(pending_statuses), order_items.c.quantity))).label('total_needed'),
+        sa.func.min(sa.case((orders.c.status.in_(['pending', 'processing']), orders.c.required_date))).label('earliest_required'),
+        sa.func.sum(sa.case(
+            ((orders.c.status == 'completed') & (orders.c.order_date >= three_months_ago), order_items.c.quantity)
+        )).label('recently_sold')
+    ).join(
+        orders, order_items.c.order_id == orders.c.id
+    ).where(
+        orders.c.status.in_(pending_statuses + ['completed'])
+    ).group_by(order_items.c.product_id).cte('pending')
+    stock = sa.select(
+        inventory.c.product_id,
+        sa.func.sum(inventory.c.quantity_available).label('inventory_total')
+    ).group_by(inventory.c.product_id).cte('stock')
+    incoming = sa.select(
+        production_orders.c.product_id,
+        sa.func.sum(production_orders.c.quantity_to_produce).label('incoming_production')
+    ).where(
+        production_orders.c.status.in_(['planned', 'sent_to_factory', 'in_production'])
+    ).group_by(production_orders.c.product_id).cte('incoming')
+
+    recently_sold = sa.func.coalesce(pending.c.recently_sold, 0)
+    inventory_total = sa.func.coalesce(stock.c.inventory_total, 0)
+    incoming_production = sa.func.coalesce(incoming.c.incoming_production, 0)
+    safety_stock = sa.cast(sa.func.floor(recently_sold / 3.0 * safety_stock_percentage), sa.Integer)
+    shortfall = pending.c.total_needed + safety_stock - inventory_total - incoming_production
+    rows = sa.select(
+        pending.c.product_id,
+        pending.c.total_needed,
+        pending.c.earliest_required,
+        recently_sold,
+        inventory_total,
+        incoming_production,
+        safety_stock,
+        pending.c.total_needed + safety_stock,
+        inventory_total + incoming_production,
+        sa.case((shortfall > 0, shortfall), else_=0),
+        sa.func.now()
+    ).select_from(
+        pending.outerjoin(stock, stock.c.product_id == pending.c.product_id)
+        .outerjoin(incoming, incoming.c.product_id == pending.c.product_id)
+    ).where(pending.c.total_needed.isnot(None))
+    op.execute(production_needs.insert().from_select([
+        'product_id', 'orders_pending', 'earliest_required', 'recently_sold', 'current_stock',
+        'incoming_production', 'safety_stock_needed', 'total_needed', 'total_available', 'to_produce', 'updated_at'
+    ], rows))
+
+
+def upgrade() -> None:
+    op.create_table('production_needs',
+    sa.Column('product_id', sa.UUID(), nullable=False),
+    sa.Column('orders_pending', sa.Integer(), nullable=False),
+    sa.Column('earliest_required', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('recently_sold', sa.Integer(), nullable=False),
+    sa.Column('current_stock', sa.Integer(), nullable=False),
+    sa.Column('incoming_production', sa.Integer(), nullable=False),
+    sa.Column('safety_stock_needed', sa.Integer(), nullable=False),
+    sa.Column('total_needed', sa.Integer(), nullable=False),
+    sa.Column('total_available', sa.Integer(), nullable=False),
+    sa.Column('to_produce', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    op.create_index(op.f('ix_production_needs_earliest_required'), 'production_needs', ['earliest_required'], unique=False)
+    op.create_index(op.f('ix_production_needs_to_produce'), 'production_needs', ['to_produce'], unique=False)
+    # Per-product refreshes look order lines up by product
+    op.create_index(op.f('ix_order_items_product_id'), 'order_items', ['product_id'], unique=False)
+
+    # Start from a full build, incremental refreshes take over from here
+    _build_needs()
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_order_items_product_id'), table_name='order_items')
+    op.drop_index(op.f('ix_production_needs_to_produce'), table_name='production_needs')
+    op.drop_index(op.f('ix_production_needs_earliest_required'), table_name='production_needs')
+    op.drop_table('production_needs')
@@ -0,0 +1,85 @@
+"""
+Benchmark trigram blocking in CatalogIndex against exhaustive scoring.
+
+    python -m benchmarks.bench_catalog_blocking --sizes 10000 100000 1000000
+
+Catalog names are synthetic but shaped like fashion products
+("Knightsbridge Wool Jacket Navy 0412"). Queries are catalog names with
+typos and reordered words, so the exhaustive best match is known.
+"""
+import argparse
+import random
+import time
+import uuid
+
+from services.catalog_index import CatalogIndex
+from services.name_normalizer import normalize_name
+
+STYLES = ["Knightsbridge", "Heritage", "Urban", "Mayfair", "Chelsea", "Soho", "Camden", "Belgravia",
+          "Kensington", "Marylebone", "Notting", "Richmond", "Hampstead", "Fulham", "Brixton", "Shoreditch"]
+MATERIALS = ["Wool", "Cotton", "Linen", "Silk", "Cashmere", "Leather", "Denim", "Tweed", "Suede", "Velvet"]
+GARMENTS = ["Jacket", "Coat", "Trousers", "Shirt", "Dress", "Skirt", "Blazer", "Knit", "Parka", "Gilet",
+            "Chinos", "Jumper", "Cardigan", "Scarf", "Waistcoat", "Overcoat"]
+COLORS = ["Black", "Navy", "Brown", "Grey", "Camel", "Olive", "Ivory", "Burgundy", "Stone", "Charcoal"]
+
+
+def make_catalog(size: int, rng: random.Random):
+    return [
+        (uuid.uuid4(), f"{rng.choice(STYLES)} {rng.choice(MATERIALS)} {rng.choice(GARMENTS)} "
+                       f"{rng.choice(COLORS)} {i:06d}")
+        for i in range(size)
+    ]
+
+
+def make_query(name: str, rng: random.Random) -> str:
+    words = name.split()
+    rng.shuffle(words)
+    query = list(" ".join(words))
+    position = rng.randrange(len(query))
+    query[position] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    return normalize_name("".join(query))
+
+
+def timed_matches(index: CatalogIndex, queries):
+    start = time.perf_counter()
+    matches = [index.best_match(query) for query in queries]
+    return matches, (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--limits", type=int, nargs="+", default=[200, 1000, 5000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'products':>10} {'limit':>7} {'build s':>8} {'ms/query':>9} {'speedup':>8} {'recall@1':>9}")
+
+    for size in args.sizes:
+        catalog = make_catalog(size, rng)
+        queries = [make_query(name, rng) for _, name in rng.sample(catalog, args.queries)]
+
+        index = CatalogIndex(candidate_limit=0)
+        start = time.perf_counter()
+        index.load(catalog)
+        build_seconds = time.perf_counter() - start
+
+        exhaustive, exhaustive_latency = timed_matches(index, queries)
+        print(f"{size:>10} {'all':>7} {build_seconds:>8.2f} {exhaustive_latency * 1000:>9.2f} {'1.0x':>8} {'1.000':>9}")
+
+        for limit in args.limits:
+            index.candidate_limit = limit
+            blocked, blocked_latency = timed_matches(index, queries)
+            # A blocked lookup "recalls" the query if it finds an equally good product
+            recalled = sum(
+                1 for full, fast in zip(exhaustive, blocked)
+                if fast is not None and full is not None and fast.score >= full.score
+            )
+            print(f"{size:>10} {limit:>7} {'':>8} {blocked_latency * 1000:>9.2f} "
+                  f"{exhaustive_latency / blocked_latency:>7.1f}x {recalled / len(queries):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
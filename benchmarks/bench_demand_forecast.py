@@ -0,0 +1,58 @@
+"""
+Benchmark the demand forecast computation on synthetic history: products x
+months of seasonal sales with staggered launches, the shape load_history()
+returns from the database.
+
+    python -m benchmarks.bench_demand_forecast --products 10000 100000 --months 36
+
+Only the in-memory part is timed (the history scan is one grouped query).
+"""
+import argparse
+import time
+import uuid
+
+import numpy as np
+import polars as pl
+
+from services.demand_forecast import forecast_frame
+
+
+def make_history(products: int, months: int, rng: np.random.Generator, fill: float = 0.7) -> pl.DataFrame:
+    """Monthly units per product: a base level, a seasonal peak month, launches spread over the window"""
+    base = rng.gamma(2.0, 20.0, products)
+    peak = rng.integers(0, 12, products)
+    launch = rng.integers(0, months, products) * (rng.random(products) < 0.4)
+    month = np.arange(months)
+    season = 1 + 0.8 * np.cos(2 * np.pi * (month[None, :] % 12 - peak[:, None]) / 12)
+    sales = rng.poisson(base[:, None] * season)
+    sales[month[None, :] < launch[:, None]] = 0
+    sales[rng.random(sales.shape) > fill] = 0
+
+    rows, columns = np.nonzero(sales)
+    ids = np.array([str(uuid.UUID(int=int(value))) for value in rng.integers(0, 2 ** 63, products)])
+    return pl.DataFrame({
+        "product_id": ids[rows],
+        "month": columns.astype(np.int64),
+        "quantity": sales[rows, columns].astype(np.float64)
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--months", type=int, default=36)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    for products in args.products:
+        history = make_history(products, args.months, rng)
+        first_month = 2023 * 12 + 9
+        started = time.perf_counter()
+        forecast = forecast_frame(history, first_month, args.months)
+        elapsed = time.perf_counter() - started
+        print(f"{products:>8} products  {len(history):>10,} product-months  {elapsed:6.2f}s  "
+              f"mean forecast {forecast['forecast_monthly'].mean():.1f}")
+
+
+if __name__ == "__main__":
+    main()
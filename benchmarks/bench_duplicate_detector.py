@@ -0,0 +1,67 @@
+"""
+Benchmark the near-duplicate detection job on a synthetic catalog with
+planted duplicates.
+
+    python -m benchmarks.bench_duplicate_detector --size 100000 --duplicates 1000
+
+Duplicates are catalog names with a spelling variant ("Knightsbridge" ->
+"Knights Bridge"), a dropped word or a typo. Reports wall time, pair
+count and how many planted duplicates were found.
+"""
+import argparse
+import random
+import time
+import uuid
+
+from benchmarks.bench_catalog_blocking import make_catalog
+from services.duplicate_detector import DuplicateDetector
+
+
+def make_duplicate(name: str, rng: random.Random) -> str:
+    variant = rng.randrange(3)
+    if variant == 0 and "Knightsbridge" in name:
+        return name.replace("Knightsbridge", "Knights Bridge")
+    if variant == 1:
+        words = name.split()
+        del words[rng.randrange(1, len(words) - 1)]
+        return " ".join(words)
+    characters = list(name)
+    characters[rng.randrange(len(characters))] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    return "".join(characters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--duplicates", type=int, default=1000)
+    parser.add_argument("--threshold", type=float, default=90.0)
+    parser.add_argument("--neighbors", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    catalog = make_catalog(args.size, rng)
+    planted = {}
+    for product_id, name in rng.sample(catalog, args.duplicates):
+        duplicate_id = uuid.uuid4()
+        planted[str(duplicate_id)] = str(product_id)
+        catalog.append((duplicate_id, make_duplicate(name, rng)))
+
+    detector = DuplicateDetector(threshold=args.threshold, neighbors=args.neighbors, workers=args.workers)
+    start = time.perf_counter()
+    clusters = detector.find_clusters(catalog)
+    elapsed = time.perf_counter() - start
+
+    linked = {
+        frozenset((pair["first"], pair["second"]))
+        for cluster in clusters for pair in cluster.pairs
+    }
+    found = sum(1 for duplicate_id, original_id in planted.items() if frozenset((duplicate_id, original_id)) in linked)
+    print(f"{len(catalog)} products, {detector.workers} workers: {elapsed:.1f}s, "
+          f"{len(linked)} pairs in {len(clusters)} clusters, "
+          f"{found}/{len(planted)} planted duplicates found")
+
+
+if __name__ == "__main__":
+    main()
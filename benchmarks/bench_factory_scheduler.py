@@ -0,0 +1,70 @@
+"""
+Benchmark factory assignment on synthetic needs: N jobs of random priority,
+required date and category over F factories of different capacity and lead
+times, the shapes FactoryScheduler loads from the database.
+
+    python -m benchmarks.bench_factory_scheduler --jobs 1000 5000 20000 --factories 5 20
+
+Only the in-memory scheduling is timed (loading is three queries, writing one
+multi-row INSERT).
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from services.factory_scheduler import Factories, FactoryScheduler, Job
+
+CATEGORIES = ["knitwear", "denim", "outerwear", "jersey", "accessories"]
+
+
+def make_factories(count: int, rng: np.random.Generator) -> Factories:
+    categories = {category: column for column, category in enumerate(CATEGORIES)}
+    lead_days = np.repeat(rng.integers(7, 45, count).astype(np.float64)[:, None], len(categories) + 1, axis=1)
+    # Some factories are faster on some categories
+    overrides = rng.random((count, len(categories))) < 0.3
+    lead_days[:, :-1][overrides] = rng.integers(3, 20, overrides.sum())
+    return Factories(
+        names=[f"factory-{position}" for position in range(count)],
+        daily_capacity=rng.integers(500, 20000, count).astype(np.float64),
+        lead_days=lead_days,
+        categories=categories,
+        backlog_days=rng.random(count) * 20
+    )
+
+
+def make_jobs(count: int, rng: np.random.Generator):
+    now = datetime.now(timezone.utc)
+    jobs, details = [], {}
+    for _ in range(count):
+        product_id = uuid.uuid4()
+        required = now + timedelta(days=int(rng.integers(1, 90))) if rng.random() < 0.9 else None
+        details[product_id] = (CATEGORIES[rng.integers(0, len(CATEGORIES))] if rng.random() < 0.9 else None, required)
+        jobs.append(Job(product_id, int(rng.integers(10, 2000)), int(rng.integers(1, 6)), required))
+    return jobs, details
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--factories", type=int, nargs="+", default=[5, 20])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    scheduler = FactoryScheduler(db=None)
+    print(f"{'factories':>9} {'jobs':>7} {'seconds':>8} {'late':>7}")
+    for factory_count in args.factories:
+        factories = make_factories(factory_count, rng)
+        for job_count in args.jobs:
+            jobs, details = make_jobs(job_count, rng)
+            started = time.perf_counter()
+            assignments = scheduler._assign(jobs, factories, details)
+            elapsed = time.perf_counter() - started
+            late = len([assignment for assignment in assignments if assignment['late']])
+            print(f"{factory_count:>9} {job_count:>7} {elapsed:>8.3f} {late:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark worker cold start: rebuilding the catalog index in every worker
+versus memory-mapping one persisted index file.
+
+    python -m benchmarks.bench_index_startup --size 1000000 --workers 4
+
+Each worker is a fresh process (as under gunicorn/uvicorn --workers) that
+loads the index and answers one query. Reports per-worker time to first
+match, RSS and PSS (proportional set size, which splits shared pages
+between the processes mapping them) from /proc.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.bench_catalog_blocking import make_catalog, make_query
+from services.catalog_index import CatalogIndex
+
+
+def _memory_kb():
+    usage = {"rss": 0, "pss": 0}
+    try:
+        with open("/proc/self/smaps_rollup") as smaps:
+            for line in smaps:
+                field, value = line.split(":", 1)
+                if field in ("Rss", "Pss"):
+                    usage[field.lower()] = int(value.split()[0])
+    except OSError:
+        pass
+    return usage
+
+
+def _worker(mode, catalog, path, query, ready, release, results):
+    start = time.perf_counter()
+    index = CatalogIndex()
+    if mode == "build":
+        index.load(catalog)
+    else:
+        index.load_file(path)
+    match = index.best_match(query)
+    elapsed = time.perf_counter() - start
+    # Measure while every worker is alive so shared pages are split between them
+    ready.wait()
+    results.put((elapsed, _memory_kb(), match is not None))
+    release.wait()
+
+
+def run_workers(mode, workers, catalog, path, query):
+    context = multiprocessing.get_context("fork")
+    ready = context.Barrier(workers)
+    release = context.Event()
+    results = context.Queue()
+    # The parent hands "build" workers the raw rows, like a fresh DB scan would
+    processes = [
+        context.Process(target=_worker, args=(mode, catalog if mode == "build" else None, path, query, ready, release, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    samples = [results.get() for _ in processes]
+    release.set()
+    for process in processes:
+        process.join()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    catalog = make_catalog(args.size, rng)
+    query = make_query(rng.choice(catalog)[1], rng)
+
+    index = CatalogIndex()
+    index.load(catalog)
+    path = os.path.join(tempfile.mkdtemp(), "catalog.idx")
+    start = time.perf_counter()
+    index.save(path)
+    print(f"saved {args.size} products in {time.perf_counter() - start:.2f}s "
+          f"({os.path.getsize(path) / 2 ** 20:.1f} MiB)")
+    del index
+
+    print(f"{'mode':>6} {'workers':>8} {'first match s':>14} {'RSS MiB/worker':>15} {'PSS MiB total':>14}")
+    for mode in ("build", "mmap"):
+        samples = run_workers(mode, args.workers, catalog, path, query)
+        assert all(found for _, _, found in samples)
+        slowest = max(elapsed for elapsed, _, _ in samples)
+        rss = sum(memory["rss"] for _, memory, _ in samples) / len(samples) / 1024
+        pss = sum(memory["pss"] for _, memory, _ in samples) / 1024
+        print(f"{mode:>6} {args.workers:>8} {slowest:>14.2f} {rss:>15.1f} {pss:>14.1f}")
+    os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Microbenchmark NameNormalizer against the original per-call normalizer.
+
+    python -m benchmarks.bench_name_normalizer --products 100000
+
+The catalog is the synthetic fashion catalog from bench_catalog_blocking.
+"cold" normalizes every name once (cache misses only, the cost of building
+the catalog index); "warm" repeats the same names, as repeated imports and
+catalog reloads do.
+"""
+import argparse
+import random
+import re
+import time
+
+from benchmarks.bench_catalog_blocking import make_catalog
+from services.name_normalizer import DEFAULT_SYNONYMS, NameNormalizer
+
+
+def legacy_normalize(name: str) -> str:
+    """ProductMatcher._normalize_name before the compiled normalizer"""
+    normalized = name.lower().strip()
+    for old, new in DEFAULT_SYNONYMS.items():
+        normalized = normalized.replace(old, new)
+    normalized = re.sub(r'[^\w\s]', ' ', normalized)
+    normalized = re.sub(r'\s+', ' ', normalized)
+    return normalized.strip()
+
+
+def per_call_ns(normalize, names) -> float:
+    start = time.perf_counter_ns()
+    for name in names:
+        normalize(name)
+    return (time.perf_counter_ns() - start) / len(names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Mix in the punctuation and spellings the synonym table exists for
+    names = [
+        rng.choice(["{}", "{} - NEW", "{} & Co", "nice bridge {}", "KNIGHTSBRIDGE_{}"]).format(name)
+        for _, name in make_catalog(args.products, rng)
+    ]
+
+    normalizer = NameNormalizer(cache_size=args.products)
+    mismatches = sum(1 for name in names if normalizer.normalize(name) != legacy_normalize(name))
+
+    legacy = per_call_ns(legacy_normalize, names)
+    cold_normalizer = NameNormalizer(cache_size=args.products)
+    cold = per_call_ns(cold_normalizer.normalize, names)
+    warm = per_call_ns(cold_normalizer.normalize, names)
+
+    print(f"products: {args.products}, output mismatches vs legacy: {mismatches}")
+    print(f"{'legacy':>8}: {legacy:>8.0f} ns/call")
+    print(f"{'cold':>8}: {cold:>8.0f} ns/call  ({legacy / cold:.1f}x)")
+    print(f"{'warm':>8}: {warm:>8.0f} ns/call  ({legacy / warm:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
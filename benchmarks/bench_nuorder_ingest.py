@@ -0,0 +1,109 @@
+"""
+Benchmark NuOrder CSV ingestion: the original ORM loop (db.add + flush per
+PO, db.add per line) against PurchaseOrderBulkLoader (COPY on Postgres,
+multi-row INSERT elsewhere).
+
+    python -m benchmarks.bench_nuorder_ingest --lines 1000 100000 1000000
+
+Runs against the configured database (DB_* settings, TESTING=1 for the test
+database). Every run writes into a transaction that is rolled back, so the
+database is left unchanged. The ORM loop is skipped above --orm-max-lines
+because it takes minutes there.
+"""
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime
+
+import polars as pl
+
+from database.database import SessionLocal
+from models import PurchaseOrder, PurchaseOrderItem
+from services.po_bulk_loader import PurchaseOrderBulkLoader
+
+CUSTOMERS = ["Harrods", "Selfridges", "Liberty", "Harvey Nichols", "Fenwick", "John Lewis"]
+STYLES = ["Knightsbridge Jacket", "Heritage Coat", "Mayfair Blazer", "Chelsea Boot", "Soho Shirt"]
+COLORS = ["Black", "Blk", "Navy", "nvy", "Camel", "Grey", "gray"]
+SIZES = ["XS", "S", "Med", "M", "L", "X-Large"]
+
+
+def make_lines(count: int, rng: random.Random, lines_per_po: int = 30) -> pl.DataFrame:
+    run = uuid.uuid4().hex[:8]
+    return pl.DataFrame({
+        "po_number": [f"BENCH-{run}-{i // lines_per_po}" for i in range(count)],
+        "customer_name": [CUSTOMERS[(i // lines_per_po) % len(CUSTOMERS)] for i in range(count)],
+        "style": [rng.choice(STYLES) for _ in range(count)],
+        "price": [round(rng.uniform(40, 900), 2) for _ in range(count)],
+        "color": [rng.choice(COLORS) for _ in range(count)],
+        "size": [rng.choice(SIZES) for _ in range(count)],
+        "collection_name": ["SS25"] * count,
+        "quantity": [rng.randint(1, 40) for _ in range(count)],
+    })
+
+
+def legacy_load(db, df: pl.DataFrame):
+    """OrderProcessor.process_nuorder_csv before the bulk loader"""
+    for po_number, po_data in df.group_by("po_number"):
+        po = PurchaseOrder(
+            po_number=po_number,
+            customer_name=po_data["customer_name"][0],
+            platform="nuorder",
+            collection_name=po_data["collection_name"][0],
+            total_skus=len(po_data),
+            total_units=po_data["quantity"].sum(),
+            status="received",
+            order_date=datetime.now()
+        )
+        db.add(po)
+        db.flush()
+        for row in po_data.iter_rows(named=True):
+            db.add(PurchaseOrderItem(
+                po_id=po.id,
+                style_name=row["style"],
+                color=row["color"],
+                size=row["size"],
+                quantity=row["quantity"],
+                unit_price=row["price"],
+                total_price=row["quantity"] * row["price"]
+            ))
+    db.flush()
+
+
+def bulk_load(db, df: pl.DataFrame):
+    PurchaseOrderBulkLoader(db).load(df)
+
+
+def rows_per_second(load, df: pl.DataFrame) -> float:
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        load(db, df)
+        elapsed = time.perf_counter() - start
+    finally:
+        db.rollback()
+        db.close()
+    return len(df) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--orm-max-lines", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'lines':>10} {'ORM rows/s':>12} {'bulk rows/s':>12} {'speedup':>8}")
+    for count in args.lines:
+        df = make_lines(count, rng)
+        bulk = rows_per_second(bulk_load, df)
+        if count <= args.orm_max_lines:
+            orm = rows_per_second(legacy_load, df)
+            print(f"{count:>10} {orm:>12,.0f} {bulk:>12,.0f} {bulk / orm:>7.1f}x")
+        else:
+            print(f"{count:>10} {'skipped':>12} {bulk:>12,.0f} {'':>8}")
+
+
+if __name__ == "__main__":
+    main()
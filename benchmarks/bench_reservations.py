@@ -0,0 +1,131 @@
+"""
+Benchmark inventory reservations under contention: N concurrent writers,
+each with its own session, reserving units of one hot SKU.
+
+    python -m benchmarks.bench_reservations --writers 1 4 16 32 --batch 1 10 50
+
+"conditional" is ReservationService (conditional UPDATE, one statement per
+SKU per batch). "naive" is the read-check-write pattern it replaces, shown
+for its oversell count. Runs against the configured database (DB_* settings,
+TESTING=1 for the test database) and deletes the SKU it creates afterwards.
+"""
+import argparse
+import threading
+import time
+import uuid
+
+from sqlalchemy import delete, select, update
+
+from database.database import SessionLocal
+from models import Inventory, InventoryReservation, Product
+from services.reservation_service import ReservationRequest, ReservationService
+
+LOCATION = "warehouse_uk"
+
+
+def create_hot_sku(session_factory, stock: int):
+    db = session_factory()
+    try:
+        product = Product(sku=f"BENCH-HOT-{uuid.uuid4().hex[:8]}", master_name="Benchmark hot SKU")
+        db.add(product)
+        db.flush()
+        inventory = Inventory(product_id=product.id, location=LOCATION, quantity_available=stock, quantity_reserved=0)
+        db.add(inventory)
+        db.commit()
+        return product.id, inventory.id
+    finally:
+        db.close()
+
+
+def drop_hot_sku(session_factory, product_id, inventory_id):
+    db = session_factory()
+    try:
+        db.execute(delete(InventoryReservation).where(InventoryReservation.inventory_id == inventory_id))
+        db.execute(delete(Inventory).where(Inventory.id == inventory_id))
+        db.execute(delete(Product).where(Product.id == product_id))
+        db.commit()
+    finally:
+        db.close()
+
+
+def naive_reserve(db, inventory_id, requests):
+    """Read available, check in Python, write the new value"""
+    reserved = 0
+    for request in requests:
+        available = db.execute(select(Inventory.quantity_available).where(Inventory.id == inventory_id)).scalar()
+        if available >= request.quantity:
+            db.execute(update(Inventory).where(Inventory.id == inventory_id).values(
+                quantity_available=available - request.quantity
+            ))
+            reserved += 1
+    db.commit()
+    return reserved
+
+
+def run(session_factory, mode: str, writers: int, batch: int, per_writer: int, stock: int):
+    product_id, inventory_id = create_hot_sku(session_factory, stock)
+    reserved = [0] * writers
+    errors = []
+    start = threading.Barrier(writers + 1)
+
+    def writer(slot: int):
+        db = session_factory()
+        try:
+            start.wait()
+            for _ in range(per_writer // batch):
+                requests = [ReservationRequest(str(product_id), LOCATION, 1, f"bench:{slot}") for _ in range(batch)]
+                if mode == "naive":
+                    reserved[slot] += naive_reserve(db, inventory_id, requests)
+                else:
+                    results = ReservationService(db, ttl_minutes=0).reserve_many(requests)
+                    reserved[slot] += len([result for result in results if result["reserved"]])
+        except Exception as e:
+            errors.append(str(e))
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=writer, args=(slot,)) for slot in range(writers)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    db = session_factory()
+    try:
+        available = db.execute(select(Inventory.quantity_available).where(Inventory.id == inventory_id)).scalar()
+    finally:
+        db.close()
+    drop_hot_sku(session_factory, product_id, inventory_id)
+
+    total = sum(reserved)
+    # Units handed out beyond what actually left available stock
+    oversold = total - (stock - available)
+    return total, elapsed, oversold, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--per-writer", type=int, default=500, help="reservations attempted per writer")
+    parser.add_argument("--stock", type=int, default=None, help="units on the hot SKU (default: enough for all)")
+    parser.add_argument("--modes", nargs="+", default=["conditional", "naive"], choices=["conditional", "naive"])
+    args = parser.parse_args()
+
+    print(f"{'mode':<12} {'writers':>7} {'batch':>6} {'reserved':>9} {'res/s':>10} {'oversold':>9}")
+    for mode in args.modes:
+        for writers in args.writers:
+            # The naive path has no batch form, one request per statement pair
+            for batch in ([1] if mode == "naive" else args.batch):
+                stock = args.stock if args.stock is not None else writers * args.per_writer
+                total, elapsed, oversold, errors = run(SessionLocal, mode, writers, batch, args.per_writer, stock)
+                print(f"{mode:<12} {writers:>7} {batch:>6} {total:>9} {total / elapsed:>10,.0f} {oversold:>9}")
+                for error in errors[:3]:
+                    print(f"    writer error: {error}")
+
+
+if __name__ == "__main__":
+    main()
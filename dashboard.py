@@ -45,6 +45,7 @@ st.markdown("""
 
 # API base URL
 API_BASE = "http://localhost:8000"
+JOB_POLL_TIMEOUT = 60 * 60  # seconds the page waits for a background import
 
 @st.cache_data(ttl=30)  # Cache for 30 seconds
 def fetch_dashboard_data():
@@ -383,46 +384,75 @@ PO-001,Customer ABC,Knightsbridge Jacket,150.00,Navy,L,Spring 2025,15
                 total_qty = df['quantity'].sum() if 'quantity' in df.columns else 0
                 st.metric("Total Units", total_qty)
             
+            # Re-uploading an export with existing POs only applies what changed
+            resync = st.checkbox("Update existing purchase orders (re-sync)", value=False)
+            
             # Process button
             if st.button("🚀 Process Orders", type="primary"):
-                with st.spinner("Processing orders..."):
-                    # Save uploaded file temporarily
-                    import tempfile
-                    import os
-                    
-                    with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-                        df.to_csv(f.name, index=False)
-                        temp_file_path = f.name
+                # Send the uploaded bytes as-is, the API parses them in a background job
+                response = requests.post(
+                    f"{API_BASE}/orders/upload-csv",
+                    params={"background": "true", "mode": "upsert" if resync else "insert"},
+                    files={"file": (uploaded_file.name, uploaded_file.getvalue(), "text/csv")}
+                )
+                
+                if response.status_code == 200:
+                    job_id = response.json()['job_id']
+                    progress_bar = st.progress(0.0, text="Queued...")
                     
-                    try:
-                        # Call API to process
-                        response = requests.post(
-                            f"{API_BASE}/orders/process-csv",
-                            params={"file_path": temp_file_path}
-                        )
+                    # Poll the job instead of holding one long request open
+                    job, poll_error = None, None
+                    deadline = time.monotonic() + JOB_POLL_TIMEOUT
+                    while True:
+                        try:
+                            job_response = requests.get(f"{API_BASE}/jobs/{job_id}", timeout=5)
+                        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                            job_response = None  # API busy or restarting, ask again
                         
-                        if response.status_code == 200:
-                            result = response.json()
-                            if result['success']:
-                                st.success(f"✅ {result['message']}")
-                                
-                                # Show processed orders
-                                st.subheader("📦 Processed Orders")
-                                processed_df = pd.DataFrame(result['orders'])
-                                st.dataframe(processed_df, use_container_width=True)
-                                
-                                # Clear cache to show updated data
-                                st.cache_data.clear()
-                                
-                            else:
-                                st.error(f"❌ Processing failed: {result['error']}")
-                        else:
-                            st.error(f"❌ API Error: {response.text}")
+                        if job_response is not None and job_response.status_code == 404:
+                            # API restarted (in-process jobs are in memory) or the job was pruned
+                            poll_error = "The import job is no longer known to the API, check the orders before re-uploading"
+                            break
+                        if job_response is not None and job_response.status_code != 200:
+                            poll_error = f"Could not read the import job status ({job_response.status_code}): {job_response.text}"
+                            break
+                        if job_response is not None:
+                            job = job_response.json()
+                            rows_done = job['progress'].get('rows_processed', 0)
+                            progress_bar.progress(
+                                min(rows_done / max(len(df), 1), 1.0),
+                                text=f"{job['status'].title()}: {rows_done:,} of {len(df):,} rows"
+                            )
+                            if job['status'] in ('succeeded', 'failed'):
+                                break
+                        if time.monotonic() > deadline:
+                            poll_error = f"Stopped waiting after {JOB_POLL_TIMEOUT // 60} minutes, job {job_id} may still be running"
+                            break
+                        time.sleep(1)
                     
-                    finally:
-                        # Clean up temp file
-                        if os.path.exists(temp_file_path):
-                            os.unlink(temp_file_path)
+                    if poll_error:
+                        st.error(f"❌ {poll_error}")
+                    elif job['status'] == 'succeeded':
+                        result = job['result']
+                        progress_bar.progress(1.0, text="Done")
+                        st.success(f"✅ {result['message']}")
+                        
+                        # Show processed orders
+                        st.subheader("📦 Processed Orders")
+                        processed_df = pd.DataFrame(result['orders'])
+                        st.dataframe(processed_df, use_container_width=True)
+                        
+                        if result.get('rows_rejected'):
+                            st.warning(f"⚠️ {result['rows_rejected']} rows rejected, the rest were imported")
+                            st.dataframe(pd.DataFrame(result['rejected']), use_container_width=True)
+                        
+                        # Clear cache to show updated data
+                        st.cache_data.clear()
+                        
+                    else:
+                        st.error(f"❌ Processing failed: {job['error']}")
+                else:
+                    st.error(f"❌ API Error: {response.text}")
         
         except Exception as e:
             st.error(f"❌ Error reading CSV: {e}")
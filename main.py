@@ -1,18 +1,36 @@
 # main.py - FastAPI Application
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, File, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import asyncio
+import atexit
+import json
+import logging
 from datetime import datetime, timedelta
 from services.order_processor import OrderProcessor
+from services.batch_ingest import BatchIngestor
+from services.allocation_engine import OPEN_PO_STATUSES, AllocationEngine
+from services.reservation_service import ReservationRequest, ReservationService
+from services.production_planner import ProductionPlanner
+from services.production_needs import SAFETY_STOCK_PERCENTAGE, ProductionNeedsStore, track_changes
+from services.scenario_engine import SCENARIO_MAX, Scenario, ScenarioEngine, grid_size, scenario_grid
+from services.demand_forecast import demand_forecaster
+from services.factory_scheduler import FactoryScheduler
 
 
-from database.database import get_db
-from models import Product, Order, Inventory, ProductMapping, ProductionOrder
+from database.database import get_db, SessionLocal
+from models import Product, Order, Inventory, ProductMapping, ProductionOrder, NameSynonym, FactoryCapacity, FactoryLeadTime
 from models.fashion_extensions import PurchaseOrder, PurchaseOrderItem
 import schemas
 from services.product_matcher import ProductMatcher
+from services.catalog_index import catalog_index, track_catalog_changes
+from services.mapping_resolver import mapping_resolver
+from services.mapping_writer import mapping_writer
+from services.name_normalizer import name_normalizer
+from services.worker_pool import PoolSaturated, pools
+from services.job_queue import FINISHED, job_queue, save_upload
 
 # ------------------------------------------------------------------------------------------------ #
 # ------------------------------------------------------------------------------------------------ #
@@ -20,6 +38,11 @@ from services.product_matcher import ProductMatcher
 
 app = FastAPI(title="Business Integration API", version="1.0.0")
 
+# Keep the production_needs read model current as request sessions commit
+track_changes(SessionLocal)
+# Tell every worker's catalog index when request sessions change products
+track_catalog_changes(SessionLocal)
+
 # CORS middleware for web dashboard
 app.add_middleware(
     CORSMiddleware,
@@ -29,6 +52,80 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+logger = logging.getLogger(__name__)
+
+# Last resort if the process exits without a clean shutdown event (once per process, not per startup)
+atexit.register(mapping_writer.flush)
+
+@app.on_event("startup")
+async def start_background_writers():
+    mapping_writer.start()
+
+def _warm_catalog_index():
+    db = SessionLocal()
+    try:
+        name_normalizer.refresh(db)
+        catalog_index.ensure_loaded(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+async def warm_catalog_index():
+    """Map (or build) the matcher index before the first request needs it"""
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, _warm_catalog_index)
+    except Exception:
+        # The first match will retry the load, don't refuse to start
+        logger.exception("Could not warm the catalog index")
+
+def _warm_demand_forecast():
+    db = SessionLocal()
+    try:
+        demand_forecaster.forecast(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+async def warm_demand_forecast():
+    """Compute today's demand forecast so production_needs refreshes can use it"""
+    await refresh_demand_forecast()
+
+async def refresh_demand_forecast():
+    # Refreshes only read the cached forecast, so a long-running process recomputes it here once a day
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, _warm_demand_forecast)
+    except Exception:
+        logger.exception("Could not compute the demand forecast")
+
+@app.on_event("shutdown")
+async def flush_background_writers():
+    # Let in-flight matches finish (they may still buffer mappings), then flush
+    for pool in pools.values():
+        pool.shutdown()
+    # Buffered product mappings must never be lost on shutdown
+    mapping_writer.stop()
+    job_queue.shutdown()
+
+@app.exception_handler(PoolSaturated)
+async def pool_saturated_handler(request, exc: PoolSaturated):
+    """Shed load instead of queueing without bound"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"}
+    )
+
+def flush_mappings_on_request_end():
+    """Dependency that flushes buffered product mappings once the request is done"""
+    try:
+        yield
+    finally:
+        try:
+            mapping_writer.flush()
+        except Exception:
+            # The response is already decided, the timer flush retries the rows
+            logger.exception("Mapping flush failed, rows kept for the next attempt")
+
 # ------------------------------------------------------------------------------------------------ #
 # ------ PRODUCTS ------ #
 # ------------------------------------------------------------------------------------------------ #
@@ -41,6 +138,35 @@ async def create_product(product: schemas.ProductCreate, db: Session = Depends(g
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
+    catalog_index.sync_product(db_product)
+    return db_product
+
+@app.put("/products/{product_id}", response_model=schemas.Product)
+async def update_product(product_id: str, product: schemas.ProductUpdate, db: Session = Depends(get_db)):
+    """Update a master product"""
+    db_product = db.query(Product).filter(Product.id == product_id).first()
+    if not db_product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    for field, value in product.dict(exclude_unset=True).items():
+        setattr(db_product, field, value)
+    
+    db.commit()
+    db.refresh(db_product)
+    catalog_index.sync_product(db_product)
+    return db_product
+
+@app.delete("/products/{product_id}", response_model=schemas.Product)
+async def deactivate_product(product_id: str, db: Session = Depends(get_db)):
+    """Deactivate a master product (products are never hard-deleted)"""
+    db_product = db.query(Product).filter(Product.id == product_id).first()
+    if not db_product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    db_product.active = False
+    db.commit()
+    db.refresh(db_product)
+    catalog_index.sync_product(db_product)
     return db_product
 
 @app.get("/products/", response_model=List[schemas.Product])
@@ -56,7 +182,7 @@ async def list_products(
         query = query.filter(Product.master_name.ilike(f"%{search}%"))
     return query.offset(skip).limit(limit).all()
 
-@app.post("/products/match")
+@app.post("/products/match", dependencies=[Depends(flush_mappings_on_request_end)])
 async def match_product(
     name: str, 
     sku: Optional[str] = None,
@@ -74,9 +200,89 @@ async def match_product(
     )
     return result
 
+@app.post("/products/match/batch", dependencies=[Depends(flush_mappings_on_request_end)])
+async def match_products_batch(
+    items: List[schemas.ProductMatchRequest],
+    db: Session = Depends(get_db)
+):
+    """Match many external products in one call (NuOrder/Shopify imports)"""
+    matcher = ProductMatcher(db)
+    return await matcher.find_best_matches([item.dict() for item in items])
+
+@app.get("/products/match/stats")
+async def match_stats():
+    """Mapping cache and write-behind buffer metrics"""
+    return {
+        "mapping_writer": mapping_writer.stats(),
+        "mapping_cache": mapping_resolver.stats()
+    }
+
+@app.get("/products/synonyms")
+async def list_synonyms():
+    """Synonym table currently used for name normalization"""
+    return {"version": name_normalizer.version, "synonyms": name_normalizer.synonyms}
+
+@app.put("/products/synonyms")
+async def upsert_synonym(synonym: schemas.NameSynonymUpsert, db: Session = Depends(get_db)):
+    """Add or change a name synonym and hot-reload the normalizer"""
+    phrase = synonym.phrase.lower().strip()
+    db_synonym = db.query(NameSynonym).filter(NameSynonym.phrase == phrase).first()
+    if not db_synonym:
+        db_synonym = NameSynonym(phrase=phrase)
+        db.add(db_synonym)
+    db_synonym.replacement = synonym.replacement.lower()
+    db_synonym.active = synonym.active
+    db.commit()
+    
+    name_normalizer.refresh(db, force=True)
+    return {"version": name_normalizer.version, "synonyms": name_normalizer.synonyms}
+
+@app.post("/products/synonyms/reload")
+async def reload_synonyms(db: Session = Depends(get_db)):
+    """Reload synonyms from the file and the database"""
+    name_normalizer.refresh(db, force=True)
+    return {"version": name_normalizer.version, "synonyms": name_normalizer.synonyms}
+
 # ------------------------------------------------------------------------------------------------ #
 # ------ INVENTORY ------ #
 # ------------------------------------------------------------------------------------------------ #
+# Stock reservations (reserve on order, commit on shipment, release on cancel)
+@app.post("/inventory/reservations")
+async def reserve_inventory(
+    reservations: List[schemas.ReservationCreate],
+    db: Session = Depends(get_db)
+):
+    """Reserve stock for a batch of order lines in one transaction, each line succeeds or fails on its own"""
+    service = ReservationService(db)
+    results = service.reserve_many([
+        ReservationRequest(str(item.product_id), item.location, item.quantity, item.reference)
+        for item in reservations
+    ])
+    return {
+        "success": True,
+        "reserved": len([result for result in results if result["reserved"]]),
+        "failed": len([result for result in results if not result["reserved"]]),
+        "results": results
+    }
+
+@app.post("/inventory/reservations/commit")
+async def commit_reservations(request: schemas.ReservationIds, db: Session = Depends(get_db)):
+    """Held units were shipped"""
+    committed = ReservationService(db).commit(request.reservation_ids)
+    return {"success": True, "committed": committed}
+
+@app.post("/inventory/reservations/release")
+async def release_reservations(request: schemas.ReservationIds, db: Session = Depends(get_db)):
+    """Held units go back to available stock (cancelled order)"""
+    released = ReservationService(db).release(request.reservation_ids)
+    return {"success": True, "released": released}
+
+@app.post("/inventory/reservations/release-expired")
+async def release_expired_reservations(db: Session = Depends(get_db)):
+    """Release reservations held past RESERVATION_TTL_MINUTES"""
+    released = ReservationService(db).release_expired()
+    return {"success": True, "released": released}
+
 # Inventory Management
 # @app.get("/inventory/summary")
 # async def inventory_summary(db: Session = Depends(get_db)):
@@ -90,12 +296,111 @@ async def match_product(
 #     manager = InventoryManager(db)
 #     return await manager.sync_from_platform(platform, data)
 
-# # Production Planning
-# @app.get("/production/calculate")
-# async def calculate_production_needs(db: Session = Depends(get_db)):
-#     """Calculate production requirements"""
-#     planner = ProductionPlanner(db)
-#     return await planner.calculate_needs()
+# Production Planning
+@app.get("/production/calculate")
+async def calculate_production_needs(db: Session = Depends(get_db)):
+    """Calculate production requirements"""
+    if demand_forecaster.stale:
+        await refresh_demand_forecast()
+    planner = ProductionPlanner(db)
+    return await planner.calculate_needs()
+
+@app.post("/production/scenarios")
+async def production_scenarios(request: schemas.ScenarioRequest, db: Session = Depends(get_db)):
+    """
+    What-if production needs: every scenario (and grid combination) is evaluated
+    against one load of demand, stock and incoming production. Totals and
+    to_produce come back as one column per scenario, in request order.
+    """
+    requested = len(request.scenarios)
+    if request.grid:
+        grid = request.grid
+        requested += grid_size(grid.safety_stock_pct, grid.demand_multiplier, grid.factory_delays, grid.horizon_days)
+    # Checked before the grid is expanded
+    if requested > SCENARIO_MAX:
+        raise HTTPException(status_code=422, detail=f"{requested} scenarios requested, at most {SCENARIO_MAX} per call")
+    
+    scenarios = [
+        Scenario(
+            spec.name or f"scenario {position + 1}",
+            SAFETY_STOCK_PERCENTAGE if spec.safety_stock_pct is None else spec.safety_stock_pct,
+            spec.demand_multiplier,
+            spec.factory_delays,
+            spec.horizon_days
+        )
+        for position, spec in enumerate(request.scenarios)
+    ]
+    if request.grid:
+        scenarios += scenario_grid(
+            request.grid.safety_stock_pct or [SAFETY_STOCK_PERCENTAGE],
+            request.grid.demand_multiplier or [1.0],
+            request.grid.factory_delays or [{}],
+            request.grid.horizon_days or [None]
+        )
+    if not scenarios:
+        scenarios = [Scenario("current plan")]
+    
+    engine = ScenarioEngine(db)
+    return await engine.compare(scenarios, request.include_products)
+
+@app.post("/production/needs/rebuild")
+async def rebuild_production_needs(db: Session = Depends(get_db)):
+    """Recompute the production_needs read model from orders, inventory and production orders"""
+    rows = ProductionNeedsStore(db).rebuild()
+    db.commit()
+    return {"success": True, "products": rows}
+
+@app.get("/production/factories")
+async def list_factories(db: Session = Depends(get_db)):
+    """Factory capacities and per-category lead times used by the scheduler"""
+    return [
+        {
+            "factory_name": factory.factory_name,
+            "daily_capacity": factory.daily_capacity,
+            "lead_time_days": factory.lead_time_days,
+            "active": factory.active,
+            "category_lead_times": {row.category: row.lead_time_days for row in factory.lead_times}
+        }
+        for factory in db.query(FactoryCapacity).order_by(FactoryCapacity.factory_name).all()
+    ]
+
+@app.put("/production/factories")
+async def upsert_factory(factory: schemas.FactoryCapacityUpsert, db: Session = Depends(get_db)):
+    """Add or change a factory's capacity and lead times"""
+    if factory.daily_capacity < 0:
+        raise HTTPException(status_code=400, detail="daily_capacity must not be negative")
+    db_factory = db.query(FactoryCapacity).filter(FactoryCapacity.factory_name == factory.factory_name).first()
+    if not db_factory:
+        db_factory = FactoryCapacity(factory_name=factory.factory_name)
+        db.add(db_factory)
+    db_factory.daily_capacity = factory.daily_capacity
+    db_factory.lead_time_days = factory.lead_time_days
+    db_factory.active = factory.active
+    # The listed categories replace the previous overrides
+    existing = {row.category: row for row in db_factory.lead_times}
+    for category, row in existing.items():
+        if category not in factory.category_lead_times:
+            db_factory.lead_times.remove(row)
+    for category, days in factory.category_lead_times.items():
+        if category in existing:
+            existing[category].lead_time_days = days
+        else:
+            db_factory.lead_times.append(FactoryLeadTime(category=category, lead_time_days=days))
+    db.commit()
+    return {"success": True, "factory_name": db_factory.factory_name}
+
+@app.post("/production/schedule")
+async def schedule_production(request: schemas.ScheduleRequest, db: Session = Depends(get_db)):
+    """
+    Assign the current production needs (and unassigned planned orders) to
+    factories and completion dates within their capacity, and create the
+    production orders in one transaction
+    """
+    scheduler = FactoryScheduler(db)
+    try:
+        return await scheduler.schedule_current(request.min_priority, request.include_unassigned, request.dry_run)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 # @app.post("/production/orders")
 # async def create_production_order(
@@ -141,6 +446,11 @@ async def dashboard_analytics(
         ).count()
     }
     
+@app.get("/metrics/pools")
+async def pool_metrics():
+    """Queue depth, rejections and latency/queue-wait histograms per worker pool"""
+    return {name: pool.stats() for name, pool in pools.items()}
+
 @app.get("/sync/status")
 async def get_sync_status():
     """Get integration sync status"""
@@ -167,13 +477,69 @@ async def get_sync_status():
 @app.post("/orders/process-csv")
 async def process_order_csv(
     file_path: str,
+    streaming: Optional[bool] = None,
+    background: bool = False,
+    mode: str = "insert",
+    db: Session = Depends(get_db)
+):
+    """
+    Process NuOrder CSV file (large files are streamed in chunks unless streaming=false).
+    background=true returns a job id right away, poll /jobs/{job_id} for progress.
+    mode=upsert re-syncs POs that already exist, applying only the line differences.
+    """
+    if background:
+        job_id = job_queue.submit("csv_import", file_path=file_path, streaming=streaming, mode=mode)
+        return {"success": True, "job_id": job_id, "status_url": f"/jobs/{job_id}"}
+    
+    processor = OrderProcessor(db)
+    result = await processor.process_nuorder_csv(file_path, streaming=streaming, mode=mode)
+    return result
+
+@app.post("/orders/upload-csv")
+async def upload_order_csv(
+    file: UploadFile = File(...),
+    streaming: Optional[bool] = None,
+    background: bool = False,
+    mode: str = "insert",
     db: Session = Depends(get_db)
 ):
-    """Process NuOrder CSV file"""
+    """Process an uploaded NuOrder CSV, parsed straight from the upload buffer"""
+    if background:
+        # The upload buffer is gone once the request ends, the job gets its own copy
+        file_path = await asyncio.get_running_loop().run_in_executor(None, save_upload, file.file)
+        job_id = job_queue.submit("csv_import", file_path=file_path, streaming=streaming, mode=mode, delete_after=True)
+        return {"success": True, "job_id": job_id, "status_url": f"/jobs/{job_id}"}
+    
     processor = OrderProcessor(db)
-    result = await processor.process_nuorder_csv(file_path)
+    result = await processor.process_nuorder_csv(file.file, streaming=streaming, mode=mode)
     return result
 
+@app.post("/orders/batch-import")
+async def batch_import_orders(
+    source: str,
+    mode: str = "insert",
+    collisions: str = "skip",
+    workers: Optional[int] = None,
+    background: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Import every CSV of a directory (or glob) in one batch: files are parsed in
+    parallel, POs found in several files are reported and handled per `collisions`
+    (skip, first, merge). Per-file rows/s, rejections and errors are in "files".
+    """
+    # Bad options are rejected here, not after parsing or inside a background job
+    try:
+        ingestor = BatchIngestor(db, workers=workers, mode=mode, collisions=collisions)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if background:
+        job_id = job_queue.submit("batch_import", source=source, mode=mode, collisions=collisions, workers=workers)
+        return {"success": True, "job_id": job_id, "status_url": f"/jobs/{job_id}"}
+    
+    return await asyncio.get_running_loop().run_in_executor(None, ingestor.ingest, source)
+
 @app.get("/orders/sync-inventory/{po_id}")
 async def sync_po_inventory(
     po_id: str,
@@ -184,6 +550,22 @@ async def sync_po_inventory(
     result = await processor.sync_po_with_inventory(po_id)
     return result
 
+@app.post("/orders/allocate")
+async def allocate_open_orders(
+    request: schemas.AllocationRequest = schemas.AllocationRequest(),
+    db: Session = Depends(get_db)
+):
+    """Allocate stock across every open PO at once and report per-PO shortfalls"""
+    engine = AllocationEngine(db)
+    try:
+        return engine.allocate(
+            order_by=request.order_by,
+            priority=request.priority,
+            statuses=request.statuses or OPEN_PO_STATUSES
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/orders/purchase-orders")
 async def list_purchase_orders(
     status: Optional[str] = None,
@@ -204,4 +586,37 @@ async def list_purchase_orders(
         "total_units": order.total_units,
         "status": order.status,
         "order_date": order.order_date.isoformat() if order.order_date else None
-    } for order in orders]
\ No newline at end of file
+    } for order in orders]
+
+# ------------------------------------------------------------------------------------------------ #
+# ------ JOBS ------ #
+# ------------------------------------------------------------------------------------------------ #
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status, progress and (once finished) result of a background job"""
+    job = job_queue.status(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, interval: float = 1.0):
+    """Server-sent events with the job status whenever it changes, until the job finishes"""
+    if not job_queue.status(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        last = None
+        while True:
+            job = job_queue.status(job_id)
+            if job is None:
+                return
+            payload = json.dumps(job, default=str)
+            if payload != last:
+                yield f"data: {payload}\n\n"
+                last = payload
+            if job["status"] in FINISHED:
+                return
+            await asyncio.sleep(interval)
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
@@ -1,12 +1,12 @@
-from .product import Product, ProductMapping
-from .inventory import Inventory
+from .product import Product, ProductMapping, NameSynonym, CatalogState
+from .inventory import Inventory, InventoryReservation
 from .order import Order, OrderItem
-from .production import ProductionOrder
+from .production import ProductionOrder, ProductionNeed, FactoryCapacity, FactoryLeadTime
 from .invoice import Invoice
 from .fashion_extensions import Collection, Style, ProductVariant, PurchaseOrder, PurchaseOrderItem
 
 __all__ = [
-    "Product", "ProductMapping", "Inventory", "Order", "OrderItem", 
-    "ProductionOrder", "Invoice", "Collection", "Style", 
+    "Product", "ProductMapping", "NameSynonym", "CatalogState", "Inventory", "InventoryReservation", "Order", "OrderItem", 
+    "ProductionOrder", "ProductionNeed", "FactoryCapacity", "FactoryLeadTime", "Invoice", "Collection", "Style", 
     "ProductVariant", "PurchaseOrder", "PurchaseOrderItem"
 ]
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Integer, Float, ForeignKey, Boolean, DateTime
+from sqlalchemy import Column, String, Text, Integer, Float, ForeignKey, Boolean, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database.database import Base
@@ -55,6 +55,11 @@ class ProductVariant(Base):
     # Relationships
     product = relationship("Product")
     style = relationship("Style", back_populates="variants")
+    
+    # Variant resolution is an equality lookup on canonical color/size
+    __table_args__ = (
+        Index('ix_product_variants_style_color_size', 'style_id', 'color', 'size'),
+    )
 
 class PurchaseOrder(Base):
     __tablename__ = "purchase_orders"
@@ -17,4 +17,18 @@ class Inventory(Base):
     last_updated = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # Relationships
-    product = relationship("Product", back_populates="inventory")
\ No newline at end of file
+    product = relationship("Product", back_populates="inventory")
+
+class InventoryReservation(Base):
+    __tablename__ = "inventory_reservations"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    inventory_id = Column(UUID(as_uuid=True), ForeignKey('inventory.id'), nullable=False, index=True)
+    quantity = Column(Integer, nullable=False)
+    reference = Column(String(200))  # order the units are held for, e.g. 'shopify:1042', 'nuorder:PO-778'
+    status = Column(String(20), nullable=False, default='held', index=True)  # held, committed, released
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), index=True)
+    
+    # Relationships
+    inventory = relationship("Inventory")
@@ -28,7 +28,7 @@ class OrderItem(Base):
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     order_id = Column(UUID(as_uuid=True), ForeignKey('orders.id'), nullable=False)
-    product_id = Column(UUID(as_uuid=True), ForeignKey('products.id'), nullable=False)
+    product_id = Column(UUID(as_uuid=True), ForeignKey('products.id'), nullable=False, index=True)
     quantity = Column(Integer, nullable=False)
     unit_price = Column(DECIMAL(10, 2))
     total_price = Column(DECIMAL(10, 2))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, DECIMAL, Boolean, DateTime, UUID, ForeignKey
+from sqlalchemy import Column, String, Text, DECIMAL, Boolean, DateTime, UUID, ForeignKey, UniqueConstraint, Integer, BigInteger
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database.database import Base
@@ -26,8 +26,19 @@ class Product(Base):
     order_items = relationship("OrderItem", back_populates="product")
     production_orders = relationship("ProductionOrder", back_populates="product")
 
+# Single row (id 1) bumped in every transaction that writes products, see services.catalog_index
+class CatalogState(Base):
+    __tablename__ = "catalog_state"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
 class ProductMapping(Base):
     __tablename__ = "product_mappings"
+    __table_args__ = (
+        # One mapping per external product; also serves the strategy 2 lookup
+        UniqueConstraint('platform', 'external_id', name='uq_product_mappings_platform_external_id'),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     product_id = Column(UUID(as_uuid=True), ForeignKey('products.id'), nullable=False, index=True)
@@ -38,4 +49,14 @@ class ProductMapping(Base):
     last_synced = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
-    product = relationship("Product", back_populates="mappings")
\ No newline at end of file
+    product = relationship("Product", back_populates="mappings")
+
+class NameSynonym(Base):
+    __tablename__ = "name_synonyms"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    phrase = Column(String(200), unique=True, nullable=False)  # e.g. 'nice bridge'
+    replacement = Column(String(200), nullable=False)  # e.g. 'knights bridge'
+    active = Column(Boolean, default=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, UUID, ForeignKey
+from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, UUID, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database.database import Base
@@ -19,4 +19,47 @@ class ProductionOrder(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
-    product = relationship("Product", back_populates="production_orders")
\ No newline at end of file
+    product = relationship("Product", back_populates="production_orders")
+
+# Read model maintained by services.production_needs
+class ProductionNeed(Base):
+    __tablename__ = "production_needs"
+    
+    product_id = Column(UUID(as_uuid=True), ForeignKey('products.id'), primary_key=True)
+    orders_pending = Column(Integer, nullable=False)
+    earliest_required = Column(DateTime(timezone=True), index=True)  # of pending/processing orders
+    recently_sold = Column(Integer, nullable=False, default=0)  # completed, last 90 days
+    forecast_monthly = Column(Float)  # forecast units next month, the safety stock base (NULL: recently_sold / 3)
+    current_stock = Column(Integer, nullable=False, default=0)
+    incoming_production = Column(Integer, nullable=False, default=0)
+    safety_stock_needed = Column(Integer, nullable=False, default=0)
+    total_needed = Column(Integer, nullable=False)
+    total_available = Column(Integer, nullable=False)
+    to_produce = Column(Integer, nullable=False, index=True)
+    updated_at = Column(DateTime(timezone=True))
+
+# Factory capacity and lead times, read by services.factory_scheduler
+class FactoryCapacity(Base):
+    __tablename__ = "factory_capacities"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    factory_name = Column(String(200), unique=True, nullable=False)  # as in production_orders.factory_name
+    daily_capacity = Column(Integer, nullable=False)  # units per day
+    lead_time_days = Column(Integer, nullable=False, default=0)  # from finished production to completion (QC, shipping)
+    active = Column(Boolean, default=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    # Relationships
+    lead_times = relationship("FactoryLeadTime", back_populates="factory", cascade="all, delete-orphan")
+
+class FactoryLeadTime(Base):
+    __tablename__ = "factory_lead_times"
+    __table_args__ = (UniqueConstraint('factory_id', 'category', name='uq_factory_lead_times_factory_category'),)
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    factory_id = Column(UUID(as_uuid=True), ForeignKey('factory_capacities.id'), nullable=False)
+    category = Column(String(100), nullable=False)  # products.category
+    lead_time_days = Column(Integer, nullable=False)  # replaces the factory's lead time for this category
+    
+    # Relationships
+    factory = relationship("FactoryCapacity", back_populates="lead_times")
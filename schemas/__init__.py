@@ -1,9 +1,13 @@
 from .product import Product, ProductCreate, ProductUpdate
-from .order import Order, OrderCreate, OrderUpdate
-from .inventory import Inventory, InventoryCreate, InventoryUpdate
+from .order import Order, OrderCreate, OrderUpdate, AllocationRequest
+from .inventory import Inventory, InventoryCreate, InventoryUpdate, ReservationCreate, ReservationIds
+from .matching import ProductMatchRequest, NameSynonymUpsert
+from .production import ScenarioSpec, ScenarioGrid, ScenarioRequest, FactoryCapacityUpsert, ScheduleRequest
 
 __all__ = [
     "Product", "ProductCreate", "ProductUpdate",
-    "Order", "OrderCreate", "OrderUpdate", 
-    "Inventory", "InventoryCreate", "InventoryUpdate"
+    "Order", "OrderCreate", "OrderUpdate", "AllocationRequest",
+    "Inventory", "InventoryCreate", "InventoryUpdate", "ReservationCreate", "ReservationIds",
+    "ProductMatchRequest", "NameSynonymUpsert",
+    "ScenarioSpec", "ScenarioGrid", "ScenarioRequest", "FactoryCapacityUpsert", "ScheduleRequest"
 ]
\ No newline at end of file
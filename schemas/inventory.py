@@ -1,5 +1,5 @@
 from pydantic import BaseModel, UUID4
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class InventoryBase(BaseModel):
@@ -26,4 +26,13 @@ class Inventory(InventoryBase):
     last_updated: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ReservationCreate(BaseModel):
+    product_id: UUID4
+    location: str
+    quantity: int
+    reference: Optional[str] = None  # order the units are held for
+
+class ReservationIds(BaseModel):
+    reservation_ids: List[UUID4]
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class ProductMatchRequest(BaseModel):
+    name: str
+    sku: Optional[str] = None
+    platform: str = "unknown"
+    external_id: Optional[str] = None
+
+class NameSynonymUpsert(BaseModel):
+    phrase: str
+    replacement: str
+    active: bool = True
@@ -27,4 +27,9 @@ class Order(OrderBase):
     created_at: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class AllocationRequest(BaseModel):
+    order_by: str = "required_date"  # or "order_date"
+    priority: List[str] = []  # PO numbers allocated first, in this order
+    statuses: Optional[List[str]] = None  # defaults to the open PO statuses
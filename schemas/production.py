@@ -0,0 +1,33 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+class ScenarioSpec(BaseModel):
+    name: Optional[str] = None
+    safety_stock_pct: Optional[float] = None  # defaults to SAFETY_STOCK_PERCENTAGE
+    demand_multiplier: float = 1.0
+    factory_delays: Dict[str, int] = {}  # factory_name -> days late
+    horizon_days: Optional[int] = None  # count incoming completing within this many days, None = all
+
+class ScenarioGrid(BaseModel):
+    # Every combination of the listed values, an empty list keeps the default
+    safety_stock_pct: List[float] = []
+    demand_multiplier: List[float] = []
+    factory_delays: List[Dict[str, int]] = []
+    horizon_days: List[Optional[int]] = []
+
+class ScenarioRequest(BaseModel):
+    scenarios: List[ScenarioSpec] = []
+    grid: Optional[ScenarioGrid] = None
+    include_products: bool = True
+
+class FactoryCapacityUpsert(BaseModel):
+    factory_name: str
+    daily_capacity: int  # units per day
+    lead_time_days: int = 0
+    active: bool = True
+    category_lead_times: Dict[str, int] = {}  # product category -> lead time replacing lead_time_days
+
+class ScheduleRequest(BaseModel):
+    dry_run: bool = False  # assign and report without writing production orders
+    include_unassigned: bool = True  # also schedule planned production orders without a factory
+    min_priority: int = 1  # only needs at or above this priority
@@ -0,0 +1,206 @@
+# services/allocation_engine.py
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from decouple import config
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import Inventory, ProductVariant, PurchaseOrder, PurchaseOrderItem
+from models.fashion_extensions import Style
+
+# POs still waiting for stock
+OPEN_PO_STATUSES = [status.strip() for status in config('OPEN_PO_STATUSES', default='received,processed').split(',')]
+# Locations drawn from first, unlisted locations follow by name
+ALLOCATION_LOCATIONS = [location.strip() for location in config('ALLOCATION_LOCATIONS', default='').split(',') if location.strip()]
+
+ORDERINGS = ("required_date", "order_date")
+
+VariantKey = Tuple[str, str, str]  # (style, color, size)
+StockKey = Tuple[str, str]  # (product_id, location)
+
+
+class AllocationEngine:
+    """
+    Allocates available stock across every open PO in one pass, so two POs
+    can no longer both be "in stock" on the same units.
+
+    Availability is read once into an in-memory ledger keyed by
+    (product_id, location), the level inventory is kept at, so every
+    (style, color, size) variant pointing to a product draws from that one
+    balance. POs then draw from it in priority order (listed PO numbers
+    first, then by required_date or order_date). A PO line
+    matches stock the way sync_po_with_inventory does: any style whose name
+    contains the line's style name, with equal color and size.
+    """
+
+    def __init__(self, db: Session, location_order: Sequence[str] = ALLOCATION_LOCATIONS):
+        self.db = db
+        self.location_order = list(location_order)
+
+    def allocate(
+        self,
+        order_by: str = "required_date",
+        priority: Sequence[str] = (),
+        statuses: Sequence[str] = OPEN_PO_STATUSES
+    ) -> Dict:
+        if order_by not in ORDERINGS:
+            raise ValueError(f"Unknown ordering {order_by}")
+        started = time.perf_counter()
+
+        orders = self._load_orders(statuses)
+        ledger, products, locations = self._load_ledger()
+        styles_for = self._style_matcher(list(products))
+
+        ranks = {po_number: rank for rank, po_number in enumerate(priority)}
+        orders.sort(key=lambda order: (
+            ranks.get(order["po_number"], len(ranks)),
+            order[order_by] is None,
+            order[order_by] or datetime.min,
+            order["po_number"]
+        ))
+
+        results = []
+        for order in orders:
+            lines = []
+            for line in order["lines"]:
+                remaining = line["requested"]
+                allocations: Dict[str, int] = {}
+                for variant_key in styles_for(line["style"], line["color"], line["size"]):
+                    for product_id in products[variant_key]:
+                        for location in locations[product_id]:
+                            if not remaining:
+                                break
+                            key = (product_id, location)
+                            taken = min(ledger[key], remaining)
+                            if taken > 0:
+                                ledger[key] -= taken
+                                allocations[location] = allocations.get(location, 0) + taken
+                                remaining -= taken
+                allocated = line["requested"] - remaining
+                lines.append(dict(
+                    line,
+                    allocated=allocated,
+                    shortfall=remaining,
+                    allocations=allocations,
+                    status="allocated" if not remaining else ("partial" if allocated else "unallocated")
+                ))
+
+            requested = sum(line["requested"] for line in lines)
+            shortfall = sum(line["shortfall"] for line in lines)
+            results.append({
+                "po_id": order["po_id"],
+                "po_number": order["po_number"],
+                "customer": order["customer"],
+                "required_date": order["required_date"].isoformat() if order["required_date"] else None,
+                "requested": requested,
+                "allocated": requested - shortfall,
+                "shortfall": shortfall,
+                "status": "allocated" if not shortfall else ("partial" if shortfall < requested else "unallocated"),
+                "lines": lines
+            })
+
+        return {
+            "success": True,
+            "orders": results,
+            "total_orders": len(results),
+            "orders_allocated": len([order for order in results if order["status"] == "allocated"]),
+            "orders_short": len([order for order in results if order["status"] != "allocated"]),
+            "total_lines": sum(len(order["lines"]) for order in results),
+            "units_short": sum(order["shortfall"] for order in results),
+            "seconds": round(time.perf_counter() - started, 3)
+        }
+
+    def _load_orders(self, statuses: Sequence[str]) -> List[Dict]:
+        rows = self.db.query(
+            PurchaseOrder.id,
+            PurchaseOrder.po_number,
+            PurchaseOrder.customer_name,
+            PurchaseOrder.required_date,
+            PurchaseOrder.order_date,
+            PurchaseOrderItem.style_name,
+            PurchaseOrderItem.color,
+            PurchaseOrderItem.size,
+            PurchaseOrderItem.quantity
+        ).join(
+            PurchaseOrderItem, PurchaseOrderItem.po_id == PurchaseOrder.id
+        ).filter(
+            PurchaseOrder.status.in_(statuses)
+        ).all()
+
+        orders: Dict = {}
+        for po_id, po_number, customer, required_date, order_date, style, color, size, quantity in rows:
+            order = orders.get(po_id)
+            if order is None:
+                order = orders[po_id] = {
+                    "po_id": str(po_id),
+                    "po_number": po_number,
+                    "customer": customer,
+                    "required_date": required_date,
+                    "order_date": order_date,
+                    "lines": []
+                }
+            order["lines"].append({"style": style, "color": color, "size": size, "requested": quantity or 0})
+        return list(orders.values())
+
+    def _load_ledger(self) -> Tuple[Dict[StockKey, int], Dict[VariantKey, List[str]], Dict[str, List[str]]]:
+        """
+        Available units per (product_id, location), the stocked products behind
+        each (style, color, size), and each product's locations in draw order
+        """
+        stock = self.db.query(
+            Inventory.product_id,
+            Inventory.location,
+            func.sum(Inventory.quantity_available)
+        ).group_by(Inventory.product_id, Inventory.location).all()
+
+        ledger: Dict[StockKey, int] = {}
+        locations: Dict[str, List[str]] = {}
+        for product_id, location, quantity in stock:
+            ledger[(str(product_id), location)] = int(quantity or 0)
+            locations.setdefault(str(product_id), []).append(location)
+
+        preference = {location: rank for rank, location in enumerate(self.location_order)}
+        for product_locations in locations.values():
+            product_locations.sort(key=lambda location: (preference.get(location, len(preference)), location))
+
+        variants = self.db.query(
+            Style.style_name,
+            ProductVariant.color,
+            ProductVariant.size,
+            ProductVariant.product_id
+        ).join(
+            ProductVariant, ProductVariant.style_id == Style.id
+        ).distinct().all()
+
+        products: Dict[VariantKey, List[str]] = {}
+        for style, color, size, product_id in variants:
+            if str(product_id) in locations:
+                products.setdefault((style, color, size), []).append(str(product_id))
+        for variant_products in products.values():
+            variant_products.sort()
+        return ledger, products, locations
+
+    @staticmethod
+    def _style_matcher(variant_keys: List[VariantKey]):
+        """fn(style, color, size) -> ledger variants the line can draw from, resolved once per distinct line"""
+        styles_by_variant: Dict[Tuple[str, str], List[str]] = {}
+        for style, color, size in variant_keys:
+            styles_by_variant.setdefault((color, size), []).append(style)
+        for styles in styles_by_variant.values():
+            styles.sort()
+        resolved: Dict[VariantKey, List[VariantKey]] = {}
+
+        def match(style: Optional[str], color: Optional[str], size: Optional[str]) -> List[VariantKey]:
+            key = (style, color, size)
+            if key not in resolved:
+                needle = (style or "").lower()
+                resolved[key] = [
+                    (candidate, color, size)
+                    for candidate in styles_by_variant.get((color, size), [])
+                    if needle in candidate.lower()
+                ]
+            return resolved[key]
+
+        return match
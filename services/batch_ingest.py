@@ -0,0 +1,274 @@
+# services/batch_ingest.py
+"""
+Batch import of a directory of NuOrder CSV exports (one per showroom/agent).
+
+Files are parsed and validated in parallel in a process pool. The valid lines
+of every file then go through one PurchaseOrderBulkLoader, so small files are
+written in shared bulk statements instead of one import per file.
+
+A PO number found in more than one file is a collision, handled by `collisions`:
+- "skip" (default): its lines are not written, the export it belongs to is unclear
+- "first": only the lines of the first file (in name order) are written
+- "merge": the lines of every file go into the one PO
+
+    python -m services.batch_ingest /data/exports/2026-10-17 --mode upsert
+"""
+import argparse
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import polars as pl
+from decouple import config
+from sqlalchemy.orm import Session
+
+from services.order_validation import REQUIRED_COLUMNS, VALIDATION_REPORT_LIMIT, rejection_report, validate_order_lines
+from services.po_bulk_loader import INSERT, UPSERT, PurchaseOrderBulkLoader
+from services.variant_normalizer import variant_normalizer
+
+logger = logging.getLogger(__name__)
+
+BATCH_INGEST_WORKERS = config('BATCH_INGEST_WORKERS', default=0, cast=int)  # 0 = one per CPU
+BATCH_WRITE_ROWS = config('BATCH_WRITE_ROWS', default=50000, cast=int)
+
+SKIP, FIRST, MERGE = "skip", "first", "merge"
+COLLISION_POLICIES = (SKIP, FIRST, MERGE)
+
+# Columns the loader reads, text columns are cast so files with differently
+# inferred types (a numeric style column) concatenate
+LOADED_COLUMNS = REQUIRED_COLUMNS + ["total_price"]
+TEXT_COLUMNS = ["po_number", "customer_name", "style", "color", "size", "collection_name"]
+
+
+class ParsedFile(NamedTuple):
+    path: str
+    lines: Optional[pl.DataFrame]  # valid, normalized lines
+    rows: int
+    rows_rejected: int
+    rejected: List[Dict]
+    rejected_lines: Optional[pl.DataFrame]  # every rejected line, normalized, for upsert
+    seconds: float
+    error: Optional[str]
+
+
+def resolve_sources(source: str) -> List[str]:
+    """CSV files of a directory, or the files matching a glob, in name order"""
+    if os.path.isdir(source):
+        source = os.path.join(source, "*.csv")
+    return sorted(path for path in glob.glob(source) if os.path.isfile(path))
+
+
+def parse_file(path: str) -> ParsedFile:
+    """Read, validate and normalize one export (runs in a pool worker)"""
+    started = time.perf_counter()
+    try:
+        df = pl.read_csv(path, infer_schema_length=10000)
+        valid, rejected = validate_order_lines(df)
+        lines = variant_normalizer.normalize_frame(valid).select(
+            [pl.col(column).cast(pl.Utf8) if column in TEXT_COLUMNS else pl.col(column) for column in LOADED_COLUMNS]
+        )
+        rejected = variant_normalizer.normalize_frame(rejected)
+        return ParsedFile(path, lines, len(df), len(rejected), rejection_report(rejected), rejected,
+                          time.perf_counter() - started, None)
+    except Exception as e:
+        return ParsedFile(path, None, 0, 0, [], None, time.perf_counter() - started, str(e))
+
+
+def find_collisions(parsed: List[ParsedFile]) -> Dict[str, List[str]]:
+    """PO number -> files it appears in, for POs found in more than one file"""
+    files_by_po: Dict[str, List[str]] = {}
+    for result in parsed:
+        if result.lines is None:
+            continue
+        for po_number in result.lines["po_number"].unique(maintain_order=True).to_list():
+            files_by_po.setdefault(po_number, []).append(result.path)
+    return {po_number: paths for po_number, paths in files_by_po.items() if len(paths) > 1}
+
+
+class BatchIngestor:
+    """Parallel parse/validate of many order exports, merged into shared bulk writes"""
+
+    def __init__(
+        self,
+        db: Session,
+        workers: Optional[int] = None,
+        mode: str = INSERT,
+        collisions: str = SKIP,
+        write_rows: int = BATCH_WRITE_ROWS
+    ):
+        # Checked before any file is parsed
+        if mode not in (INSERT, UPSERT):
+            raise ValueError(f"Unknown import mode {mode}")
+        if collisions not in COLLISION_POLICIES:
+            raise ValueError(f"Unknown collision policy {collisions}")
+        self.db = db
+        self.workers = workers or BATCH_INGEST_WORKERS or os.cpu_count() or 1
+        self.mode = mode
+        self.collisions = collisions
+        self.write_rows = write_rows
+
+    def ingest(self, source: str, progress: Optional[Callable[..., None]] = None) -> Dict:
+        paths = resolve_sources(source)
+        if not paths:
+            return {"success": False, "error": f"No CSV files found for {source}"}
+
+        started = time.perf_counter()
+        parsed = self.parse(paths, progress)
+        parse_seconds = time.perf_counter() - started
+
+        collisions = find_collisions(parsed)
+        frames = self._apply_collisions(parsed, collisions)
+
+        write_started = time.perf_counter()
+        rejected = [result.rejected_lines for result in parsed if result.rejected_lines is not None]
+        try:
+            written = self.write(frames, progress, rejected)
+        except Exception as e:
+            self.db.rollback()
+            return {"success": False, "error": str(e), "files": self._file_reports(parsed, collisions)}
+        write_seconds = time.perf_counter() - write_started
+
+        return {
+            "success": True,
+            "message": f"Processed {len(written['orders'])} purchase orders from {len(paths)} files",
+            "files": self._file_reports(parsed, collisions),
+            "files_failed": sum(1 for result in parsed if result.error),
+            "collisions": [{"po_number": po_number, "files": files} for po_number, files in collisions.items()],
+            "collision_policy": self.collisions,
+            "orders": written["orders"],
+            "changes": written["changes"],
+            "rows_processed": sum(result.rows for result in parsed),
+            "rows_rejected": sum(result.rows_rejected for result in parsed),
+            "rows_written": written["rows"],
+            "parse_seconds": round(parse_seconds, 3),
+            "write_seconds": round(write_seconds, 3),
+            "rows_per_second": round(written["rows"] / (time.perf_counter() - started), 1)
+        }
+
+    def parse(self, paths: List[str], progress: Optional[Callable[..., None]] = None) -> List[ParsedFile]:
+        """Parse files in worker processes, results in the order of paths"""
+        if self.workers <= 1 or len(paths) <= 1:
+            results = {}
+            for path in paths:
+                results[path] = parse_file(path)
+                if progress:
+                    progress(files_parsed=len(results), files_total=len(paths))
+            return [results[path] for path in paths]
+
+        results = {}
+        # polars runs its own thread pool, forking a process that already used it can deadlock
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(paths)), mp_context=context) as executor:
+            futures = [executor.submit(parse_file, path) for path in paths]
+            for future in as_completed(futures):
+                result = future.result()
+                results[result.path] = result
+                logger.info("Parsed %s: %d rows in %.2fs", result.path, result.rows, result.seconds)
+                if progress:
+                    progress(files_parsed=len(results), files_total=len(paths))
+        return [results[path] for path in paths]
+
+    def write(
+        self,
+        frames: List[pl.DataFrame],
+        progress: Optional[Callable[..., None]] = None,
+        rejected: Optional[List[pl.DataFrame]] = None
+    ) -> Dict:
+        """
+        Load every file's lines through one loader in slices of write_rows,
+        committing per slice. Rejected lines keep their existing lines on upsert.
+        """
+        loader = PurchaseOrderBulkLoader(self.db, platform="nuorder", mode=self.mode)
+        for lines in rejected or []:
+            loader.keep(lines)
+        orders: Dict[str, Dict] = {}
+        rows_done = 0
+
+        lines = pl.concat(frames) if frames else pl.DataFrame()
+        for offset in range(0, len(lines), self.write_rows):
+            for summary in loader.load(lines.slice(offset, self.write_rows)):
+                known = orders.get(summary["po_number"])
+                if known:
+                    known["total_skus"] += summary["total_skus"]
+                    known["total_units"] += summary["total_units"]
+                else:
+                    orders[summary["po_number"]] = summary
+            self.db.commit()
+            rows_done = min(offset + self.write_rows, len(lines))
+            if progress:
+                progress(rows_written=rows_done, orders_written=len(orders))
+
+        # Upsert deletes and totals need every file
+        changes = loader.finish()
+        self.db.commit()
+        return {"orders": list(orders.values()), "changes": changes, "rows": rows_done}
+
+    def _apply_collisions(self, parsed: List[ParsedFile], collisions: Dict[str, List[str]]) -> List[pl.DataFrame]:
+        frames = []
+        for result in parsed:
+            if result.lines is None:
+                continue
+            lines = result.lines
+            if self.collisions == SKIP:
+                lines = lines.filter(~pl.col("po_number").is_in(list(collisions)))
+            elif self.collisions == FIRST:
+                not_owned = [po_number for po_number, files in collisions.items() if files[0] != result.path]
+                lines = lines.filter(~pl.col("po_number").is_in(not_owned))
+            frames.append(lines)
+        return frames
+
+    def _file_reports(self, parsed: List[ParsedFile], collisions: Dict[str, List[str]]) -> List[Dict]:
+        reports = []
+        for result in parsed:
+            colliding = sorted(po_number for po_number, files in collisions.items() if result.path in files)
+            reports.append({
+                "file": result.path,
+                "success": result.error is None,
+                "error": result.error,
+                "rows": result.rows,
+                "rows_valid": len(result.lines) if result.lines is not None else 0,
+                "rows_rejected": result.rows_rejected,
+                "rejected": result.rejected[:VALIDATION_REPORT_LIMIT],
+                "colliding_po_numbers": colliding,
+                "seconds": round(result.seconds, 3),
+                "rows_per_second": round(result.rows / result.seconds, 1) if result.seconds else 0.0
+            })
+        return reports
+
+
+def main():
+    from database.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Import a directory (or glob) of NuOrder CSV exports")
+    parser.add_argument("source", help="directory of .csv files or a glob like 'exports/*-orders.csv'")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--mode", choices=["insert", "upsert"], default="insert")
+    parser.add_argument("--collisions", choices=COLLISION_POLICIES, default=SKIP)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    ingestor = BatchIngestor(SessionLocal(), workers=args.workers, mode=args.mode, collisions=args.collisions)
+    try:
+        result = ingestor.ingest(args.source)
+    finally:
+        ingestor.db.close()
+
+    for report in result.get("files", []):
+        status = report["error"] or f"{report['rows_valid']} valid, {report['rows_rejected']} rejected"
+        print(f"{report['file']}: {report['rows']} rows, {report['rows_per_second']} rows/s, {status}")
+    if not result["success"]:
+        print(f"Import failed: {result['error']}")
+        raise SystemExit(1)
+    for collision in result["collisions"]:
+        print(f"PO {collision['po_number']} in {len(collision['files'])} files ({result['collision_policy']})")
+    print(json.dumps({key: result[key] for key in ("changes", "rows_processed", "rows_rejected", "rows_written",
+                                                  "parse_seconds", "write_seconds", "rows_per_second")}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+# services/catalog_index.py
+import itertools
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from decouple import config
+from rapidfuzz import fuzz, process
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from models.product import CatalogState, Product
+from services.index_store import (
+    MappedPostings, StringColumn, UuidColumn, encode_strings, read_index, write_index
+)
+from services.name_normalizer import name_normalizer, normalize_name
+
+# Same scorers and weights as the original per-product loop
+# (token_set_ratio gets double weight)
+SCORERS = (
+    (fuzz.ratio, 1),
+    (fuzz.partial_ratio, 1),
+    (fuzz.token_sort_ratio, 1),
+    (fuzz.token_set_ratio, 2),
+)
+TOTAL_WEIGHT = sum(weight for _, weight in SCORERS)
+
+# Upper bound on cells in one score matrix, keeps batch scoring memory bounded
+MAX_MATRIX_CELLS = 20_000_000
+
+# Recall vs latency: how many trigram-blocked candidates reach the fuzzy scorers.
+# Catalogs at or below this size are always scored exhaustively, 0 disables blocking.
+CANDIDATE_LIMIT = config('MATCHER_CANDIDATE_LIMIT', default=1000, cast=int)
+
+# Shared on-disk copy of the index that workers memory-map instead of
+# rebuilding it from a Product table scan. Empty disables persistence.
+CATALOG_INDEX_PATH = config('CATALOG_INDEX_PATH', default='')
+CATALOG_VERSION_CHECK_INTERVAL = config('CATALOG_VERSION_CHECK_INTERVAL', default=30.0, cast=float)  # seconds
+
+_EMPTY_POSTING = np.empty(0, dtype=np.int32)
+
+
+def trigrams(normalized: str) -> Set[str]:
+    """Character trigrams of a normalized name, padded so word edges count"""
+    padded = f" {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CatalogMatch(NamedTuple):
+    id: object
+    master_name: str
+    score: float  # 0-100, same scale as the rapidfuzz scorers
+
+
+class CatalogSnapshot(NamedTuple):
+    # Python lists when built in-process, lazily decoded columns when mapped from disk
+    ids: Sequence
+    names: Sequence[str]
+    normalized: Sequence[str]
+    positions: Optional[Dict]  # product id -> position, built on demand for mapped snapshots
+    postings: Mapping[str, np.ndarray]  # trigram -> catalog positions
+
+
+def catalog_version(db: Session) -> str:
+    """Changes whenever a product is created, renamed, activated or deactivated"""
+    version = db.scalar(select(CatalogState.version).where(CatalogState.id == 1))
+    return str(version or 0)
+
+
+def _bump_catalog_version(session: Session, flush_context):
+    # A counter, not max(updated_at): now() is the transaction start, so a long
+    # transaction can commit a product change older than the current maximum
+    if not any(isinstance(obj, Product) for obj in itertools.chain(session.new, session.dirty, session.deleted)):
+        return
+    connection = session.connection()
+    bumped = connection.execute(
+        update(CatalogState).where(CatalogState.id == 1).values(version=CatalogState.version + 1)
+    )
+    if not bumped.rowcount:
+        connection.execute(insert(CatalogState).values(id=1, version=1))
+
+
+def track_catalog_changes(session_factory):
+    """Bump catalog_state.version in every transaction of session_factory that writes products"""
+    event.listen(session_factory, "after_flush", _bump_catalog_version)
+
+
+class CatalogIndex:
+    """
+    Process-wide index of active products with pre-normalized names.
+    Scores a query against the whole catalog in vectorized rapidfuzz calls
+    instead of a Python loop over ORM objects. For large catalogs an inverted
+    trigram index first narrows the catalog to the most plausible candidates.
+    With index_path set the index is persisted to a versioned file that every
+    worker memory-maps read-only, so it is only rebuilt when the catalog changes.
+    """
+
+    def __init__(
+        self,
+        candidate_limit: int = CANDIDATE_LIMIT,
+        index_path: str = CATALOG_INDEX_PATH,
+        version_check_interval: float = CATALOG_VERSION_CHECK_INTERVAL
+    ):
+        self.candidate_limit = candidate_limit
+        self.index_path = index_path
+        self.version_check_interval = version_check_interval
+        self.catalog_version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._normalizer_version = None
+        self._checked_at = 0.0
+        self._snapshot = CatalogSnapshot([], [], [], {}, {})
+
+    def __len__(self) -> int:
+        return len(self._snapshot.ids)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        """The current contents, immutable: a reload swaps in a new snapshot"""
+        return self._snapshot
+
+    def load(self, rows: Iterable[Tuple]):
+        """Replace the index contents with (product_id, master_name) rows (in memory only)"""
+        normalizer_version = name_normalizer.version
+        ids, names, normalized, positions = [], [], [], {}
+        gram_ids = {}
+        gram_column, position_column = array('i'), array('i')
+        for product_id, master_name in rows:
+            position = len(ids)
+            positions[product_id] = position
+            ids.append(product_id)
+            names.append(master_name)
+            normalized_name = normalize_name(master_name)
+            normalized.append(normalized_name)
+            for gram in trigrams(normalized_name):
+                gram_column.append(gram_ids.setdefault(gram, len(gram_ids)))
+                position_column.append(position)
+
+        postings = self._build_postings(gram_ids, gram_column, position_column)
+        with self._lock:
+            self._snapshot = CatalogSnapshot(ids, names, normalized, positions, postings)
+            self._normalizer_version = normalizer_version
+            self._loaded = True
+
+    def load_from_db(self, db: Session):
+        """Build the index from a single scan of active products"""
+        rows = db.query(Product.id, Product.master_name).filter(
+            Product.active == True
+        ).all()
+        self.load(rows)
+
+    def ensure_loaded(self, db: Session):
+        """Load the index, or reload it when the catalog version or synonyms changed"""
+        # Names must be re-normalized whenever the synonym table changes
+        normalizer_changed = self._normalizer_version != name_normalizer.version
+        now = time.monotonic()
+        if self._loaded and not normalizer_changed and now - self._checked_at < self.version_check_interval:
+            return
+        self._checked_at = now
+
+        version = catalog_version(db)
+        if self._loaded and not normalizer_changed and version == self.catalog_version:
+            return
+
+        if self.index_path and self.load_file(self.index_path, version):
+            return
+
+        self.load_from_db(db)
+        self.catalog_version = version
+        if self.index_path:
+            self.save(self.index_path, version)
+            # Re-open the file so this worker shares its pages with the others
+            self.load_file(self.index_path, version)
+
+    def invalidate(self):
+        """Force a reload on next use"""
+        self._loaded = False
+        self.catalog_version = None
+
+    def save(self, path: str, version: Optional[str] = None):
+        """Write the current index to a versioned file other workers can map"""
+        snapshot = self._snapshot
+        names_blob, names_offsets = encode_strings(snapshot.names)
+        normalized_blob, normalized_offsets = encode_strings(snapshot.normalized)
+        arrays = {
+            "ids": UuidColumn.encode(snapshot.ids),
+            "names_blob": names_blob,
+            "names_offsets": names_offsets,
+            "normalized_blob": normalized_blob,
+            "normalized_offsets": normalized_offsets,
+            **MappedPostings.encode(snapshot.postings)
+        }
+        header = {
+            "catalog_version": version,
+            "normalizer": name_normalizer.fingerprint,
+            "products": len(snapshot.ids)
+        }
+        write_index(path, header, arrays)
+
+    def load_file(self, path: str, version: Optional[str] = None) -> bool:
+        """
+        Memory-map a saved index read-only. Returns False when the file is
+        missing, unreadable or built for another catalog version or synonym table.
+        """
+        try:
+            header, arrays = read_index(path)
+        except (OSError, ValueError):
+            return False
+        if header["normalizer"] != name_normalizer.fingerprint:
+            return False
+        if version is not None and header["catalog_version"] != version:
+            return False
+
+        snapshot = CatalogSnapshot(
+            UuidColumn(arrays["ids"]),
+            StringColumn(arrays["names_blob"], arrays["names_offsets"]),
+            StringColumn(arrays["normalized_blob"], arrays["normalized_offsets"]),
+            None,
+            MappedPostings.decode(arrays)
+        )
+        with self._lock:
+            self._snapshot = snapshot
+            self.catalog_version = header["catalog_version"]
+            self._normalizer_version = name_normalizer.version
+            self._loaded = True
+        return True
+
+    def sync_product(self, product: Product):
+        """Apply a created/updated/deactivated product to the index"""
+        if product.active:
+            self.upsert(product.id, product.master_name)
+        else:
+            self.remove(product.id)
+
+    def upsert(self, product_id, master_name: str):
+        # Not loaded yet - the full load will pick the change up
+        if not self._loaded:
+            return
+
+        with self._lock:
+            # Copy-on-write so concurrent readers keep a consistent snapshot
+            ids, names, normalized, positions, postings = self._copy_snapshot()
+            normalized_name = normalize_name(master_name)
+            position = positions.get(product_id)
+            if position is None:
+                position = len(ids)
+                positions[product_id] = position
+                ids.append(product_id)
+                names.append(master_name)
+                normalized.append(normalized_name)
+            else:
+                self._update_postings(postings, trigrams(normalized[position]), remove=position)
+                names[position] = master_name
+                normalized[position] = normalized_name
+            self._update_postings(postings, trigrams(normalized_name), add=position)
+            self._snapshot = CatalogSnapshot(ids, names, normalized, positions, postings)
+
+    def remove(self, product_id):
+        if not self._loaded:
+            return
+
+        with self._lock:
+            ids, names, normalized, positions, postings = self._copy_snapshot()
+            if product_id not in positions:
+                return
+            # Swap the last entry into the freed slot to keep arrays compact
+            position = positions.pop(product_id)
+            last = len(ids) - 1
+            self._update_postings(postings, trigrams(normalized[position]), remove=position)
+            if position != last:
+                last_grams = trigrams(normalized[last])
+                self._update_postings(postings, last_grams, remove=last)
+                self._update_postings(postings, last_grams, add=position)
+                ids[position] = ids[last]
+                names[position] = names[last]
+                normalized[position] = normalized[last]
+                positions[ids[position]] = position
+            ids.pop()
+            names.pop()
+            normalized.pop()
+            self._snapshot = CatalogSnapshot(ids, names, normalized, positions, postings)
+
+    def _copy_snapshot(self) -> Tuple[List, List[str], List[str], Dict, Dict]:
+        snapshot = self._snapshot
+        ids = list(snapshot.ids)
+        if snapshot.positions is None:
+            positions = {product_id: position for position, product_id in enumerate(ids)}
+        else:
+            positions = dict(snapshot.positions)
+        return (
+            ids,
+            list(snapshot.names),
+            list(snapshot.normalized),
+            positions,
+            # Posting arrays are replaced, never modified (mapped ones stay shared),
+            # so a shallow copy is enough
+            dict(snapshot.postings)
+        )
+
+    def best_match(self, normalized_query: str) -> Optional[CatalogMatch]:
+        """Highest scoring product for a normalized query, None if nothing scores"""
+        return self._best_match(self._snapshot, normalized_query)
+
+    def best_matches(self, normalized_queries: List[str], workers: int = 1) -> Dict[str, Optional[CatalogMatch]]:
+        """
+        Best match for many normalized queries using a queries x catalog score
+        matrix. workers=-1 spreads the rapidfuzz scoring across all cores.
+        """
+        snapshot = self._snapshot
+        queries = list(dict.fromkeys(normalized_queries))
+        if not snapshot.ids:
+            return {query: None for query in queries}
+
+        # Blocked lookups score a few hundred candidates each, cheaper than any matrix
+        if self._uses_blocking(snapshot):
+            return {query: self._best_match(snapshot, query) for query in queries}
+
+        matches = {}
+        chunk_size = max(1, MAX_MATRIX_CELLS // len(snapshot.ids))
+        for start in range(0, len(queries), chunk_size):
+            chunk = queries[start:start + chunk_size]
+            scores = self.combined_scores(chunk, self._all_normalized(snapshot), workers)
+            positions = np.argmax(scores, axis=1)
+            for row, (query, position) in enumerate(zip(chunk, positions)):
+                matches[query] = self._match_at(snapshot, position, scores[row, position])
+
+        return matches
+
+    def candidates(self, normalized_query: str) -> Optional[np.ndarray]:
+        """
+        Catalog positions sharing the most trigrams with the query, in catalog
+        order. None means blocking is off and the whole catalog is scored.
+        """
+        snapshot = self._snapshot
+        if not self._uses_blocking(snapshot):
+            return None
+        return self._candidates(snapshot, normalized_query)
+
+    def _uses_blocking(self, snapshot: CatalogSnapshot) -> bool:
+        return 0 < self.candidate_limit < len(snapshot.ids)
+
+    def _candidates(self, snapshot: CatalogSnapshot, normalized_query: str) -> np.ndarray:
+        postings = [
+            snapshot.postings[gram] for gram in trigrams(normalized_query)
+            if gram in snapshot.postings
+        ]
+        if not postings:
+            return _EMPTY_POSTING
+
+        # Shared-trigram count per catalog position
+        overlap = np.bincount(np.concatenate(postings), minlength=len(snapshot.ids))
+        matched = np.flatnonzero(overlap)
+        if len(matched) > self.candidate_limit:
+            top = np.argpartition(overlap[matched], -self.candidate_limit)[-self.candidate_limit:]
+            # Keep catalog order so ties resolve the same way as a full scan
+            matched = np.sort(matched[top])
+        return matched
+
+    def _best_match(self, snapshot: CatalogSnapshot, normalized_query: str) -> Optional[CatalogMatch]:
+        if not snapshot.ids:
+            return None
+
+        if not self._uses_blocking(snapshot):
+            scores = self.combined_scores([normalized_query], self._all_normalized(snapshot))[0]
+            position = int(np.argmax(scores))
+            return self._match_at(snapshot, position, scores[position])
+
+        candidates = self._candidates(snapshot, normalized_query)
+        if not len(candidates):
+            return None
+
+        choices = [snapshot.normalized[position] for position in candidates]
+        scores = self.combined_scores([normalized_query], choices)[0]
+        best = int(np.argmax(scores))
+        return self._match_at(snapshot, candidates[best], scores[best])
+
+    @staticmethod
+    def _all_normalized(snapshot: CatalogSnapshot) -> List[str]:
+        if isinstance(snapshot.normalized, StringColumn):
+            return snapshot.normalized.materialize()
+        return snapshot.normalized
+
+    @staticmethod
+    def _match_at(snapshot: CatalogSnapshot, position: int, score: float) -> Optional[CatalogMatch]:
+        if score <= 0:
+            return None
+        return CatalogMatch(snapshot.ids[position], snapshot.names[position], float(score))
+
+    @staticmethod
+    def combined_scores(queries: List[str], choices: List[str], workers: int = 1) -> np.ndarray:
+        """(queries x choices) weighted score matrix over normalized names, 0-100"""
+        combined = np.zeros((len(queries), len(choices)), dtype=np.float64)
+        for scorer, weight in SCORERS:
+            combined += weight * process.cdist(
+                queries, choices, scorer=scorer, dtype=np.float64, workers=workers
+            )
+        combined /= TOTAL_WEIGHT
+        return combined
+
+    @staticmethod
+    def _build_postings(gram_ids: Dict[str, int], gram_column: array, position_column: array) -> Dict[str, np.ndarray]:
+        """Group (trigram, position) pairs into one posting array per trigram"""
+        if not gram_ids:
+            return {}
+
+        grams = np.frombuffer(gram_column, dtype=np.int32)
+        positions = np.frombuffer(position_column, dtype=np.int32)
+        order = np.argsort(grams, kind='stable')
+        counts = np.bincount(grams, minlength=len(gram_ids))
+        # Views into one contiguous array, cheap to hold for large catalogs
+        postings = np.split(positions[order], np.cumsum(counts)[:-1])
+        return dict(zip(gram_ids, postings))
+
+    @staticmethod
+    def _update_postings(postings: Dict[str, np.ndarray], grams: Set[str], add: Optional[int] = None, remove: Optional[int] = None):
+        for gram in grams:
+            posting = postings.get(gram, _EMPTY_POSTING)
+            if remove is not None:
+                posting = posting[posting != remove]
+            if add is not None:
+                posting = np.append(posting, np.int32(add))
+            if len(posting):
+                postings[gram] = posting
+            else:
+                postings.pop(gram, None)
+
+
+# Shared by every request handled in this process
+catalog_index = CatalogIndex()
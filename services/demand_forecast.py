@@ -0,0 +1,190 @@
+# services/demand_forecast.py
+"""
+Monthly demand forecasts for every product, used as the safety stock input
+instead of "last 90 days / 3".
+
+Completed sales are read in one grouped scan (product x calendar month over
+the last FORECAST_HISTORY_MONTHS complete months) into a dense products x
+months matrix. Every statistic is then a whole-matrix operation:
+- rolling: mean of the last FORECAST_ROLLING_MONTHS months
+- seasonal index per calendar month, shrunk towards the catalog-wide index
+  for products with little history (collections sell in seasons)
+- exponentially smoothed level of the deseasonalized series, from each
+  product's first sale
+The forecast for next month is level x next month's seasonal index, never
+below 0 (net returns). Results are cached for the day.
+"""
+import threading
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import polars as pl
+from decouple import config
+from sqlalchemy import extract, func, select
+from sqlalchemy.orm import Session
+
+from models import Order, OrderItem
+
+FORECAST_HISTORY_MONTHS = config('FORECAST_HISTORY_MONTHS', default=36, cast=int)
+FORECAST_ROLLING_MONTHS = config('FORECAST_ROLLING_MONTHS', default=3, cast=int)
+FORECAST_ALPHA = config('FORECAST_ALPHA', default=0.3, cast=float)
+# Units of history at which a product's own seasonality gets half the weight
+SEASONAL_SHRINKAGE_UNITS = config('SEASONAL_SHRINKAGE_UNITS', default=100, cast=float)
+SALES_STATUSES = ['completed']
+
+HISTORY_FETCH_ROWS = 100000
+
+
+def _month_number(day: date) -> int:
+    return day.year * 12 + day.month - 1
+
+
+def load_history(db: Session, months: int = FORECAST_HISTORY_MONTHS, today: Optional[date] = None) -> Tuple[pl.DataFrame, int]:
+    """
+    Units sold per (product_id, month) over the last `months` complete months,
+    and the month number (year * 12 + month - 1) of the first column
+    """
+    today = today or date.today()
+    last_month = _month_number(today) - 1
+    first_month = last_month - months + 1
+    start = datetime(first_month // 12, first_month % 12 + 1, 1)
+    end = datetime(today.year, today.month, 1)
+
+    year = extract('year', Order.order_date)
+    month = extract('month', Order.order_date)
+    statement = select(
+        OrderItem.product_id, year, month, func.sum(OrderItem.quantity)
+    ).join(
+        Order, OrderItem.order_id == Order.id
+    ).where(
+        Order.status.in_(SALES_STATUSES),
+        Order.order_date >= start,
+        Order.order_date < end
+    ).group_by(OrderItem.product_id, year, month)
+
+    frames = []
+    result = db.execute(statement.execution_options(yield_per=HISTORY_FETCH_ROWS))
+    for rows in result.partitions():
+        product_ids, years, months_, quantities = zip(*rows)
+        frames.append(pl.DataFrame({
+            "product_id": [str(product_id) for product_id in product_ids],
+            "month": [int(y) * 12 + int(m) - 1 - first_month for y, m in zip(years, months_)],
+            "quantity": [float(quantity or 0) for quantity in quantities]
+        }, schema={"product_id": pl.Utf8, "month": pl.Int64, "quantity": pl.Float64}))
+    history = pl.concat(frames) if frames else \
+        pl.DataFrame(schema={"product_id": pl.Utf8, "month": pl.Int64, "quantity": pl.Float64})
+    return history, first_month
+
+
+def forecast_frame(
+    history: pl.DataFrame,
+    first_month: int,
+    months: int = FORECAST_HISTORY_MONTHS,
+    alpha: float = FORECAST_ALPHA,
+    rolling_months: int = FORECAST_ROLLING_MONTHS,
+    shrinkage_units: float = SEASONAL_SHRINKAGE_UNITS
+) -> pl.DataFrame:
+    """product_id, rolling, ewma_level, seasonal_index, forecast_monthly for every product in history"""
+    products = history["product_id"].unique().sort()
+    positions = pl.DataFrame({"product_id": products, "row": pl.int_range(0, len(products), eager=True)})
+    cells = history.join(positions, on="product_id", how="inner")
+
+    sales = np.zeros((len(products), months))
+    sales[cells["row"].to_numpy(), cells["month"].to_numpy()] = cells["quantity"].to_numpy()
+    calendar = (first_month + np.arange(months)) % 12  # calendar month of each column
+
+    # Months from each product's first sale on are observed, earlier zeros are "not launched"
+    first_sale = np.argmax(sales > 0, axis=1)
+    observed = np.arange(months)[None, :] >= first_sale[:, None]
+
+    # Seasonal index: mean sales of each calendar month over the product's mean month
+    by_calendar = np.zeros((len(products), 12))
+    observed_by_calendar = np.zeros((len(products), 12))
+    for month in range(12):
+        columns = calendar == month
+        by_calendar[:, month] = sales[:, columns].sum(axis=1)
+        observed_by_calendar[:, month] = observed[:, columns].sum(axis=1)
+    total = sales.sum(axis=1)
+    mean_month = total / np.maximum(observed.sum(axis=1), 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        own_index = (by_calendar / observed_by_calendar) / mean_month[:, None]
+        catalog_index = (by_calendar.sum(axis=0) / observed_by_calendar.sum(axis=0)) / \
+            (total.sum() / max(observed.sum(), 1))
+    catalog_index = np.where(np.isfinite(catalog_index) & (catalog_index > 0), catalog_index, 1.0)
+    own_index = np.where(np.isfinite(own_index), own_index, catalog_index[None, :])
+    weight = (total / (total + shrinkage_units))[:, None]
+    seasonal_index = np.maximum(weight * own_index + (1 - weight) * catalog_index[None, :], 0.05)
+
+    # Exponentially smoothed level of the deseasonalized series
+    deseasonalized = sales / seasonal_index[:, calendar]
+    level = deseasonalized[np.arange(len(products)), first_sale]
+    for month in range(months):
+        smoothed = alpha * deseasonalized[:, month] + (1 - alpha) * level
+        level = np.where(month > first_sale, smoothed, level)
+
+    next_calendar = (first_month + months) % 12
+    rolling = sales[:, -rolling_months:].sum(axis=1) / rolling_months
+    return pl.DataFrame({
+        "product_id": products,
+        "rolling": rolling,
+        "ewma_level": level,
+        "seasonal_index": seasonal_index[:, next_calendar],
+        "forecast_monthly": np.maximum(level * seasonal_index[:, next_calendar], 0.0)
+    })
+
+
+class DemandForecaster:
+    """Computes forecasts at most once per day per process"""
+
+    def __init__(self, months: int = FORECAST_HISTORY_MONTHS):
+        self.months = months
+        self._day: Optional[date] = None
+        self._forecast: Optional[pl.DataFrame] = None
+        self._monthly: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def forecast(self, db: Session) -> pl.DataFrame:
+        """Today's forecasts, computed on the first call of the day"""
+        with self._lock:
+            today = date.today()
+            if self._day != today:
+                history, first_month = load_history(db, self.months, today)
+                forecast = forecast_frame(history, first_month, self.months)
+                self._forecast = forecast
+                self._monthly = dict(zip(forecast["product_id"].to_list(), forecast["forecast_monthly"].to_list()))
+                self._day = today
+            return self._forecast
+
+    def monthly_demand(self, db: Optional[Session] = None) -> Dict[str, float]:
+        """
+        product_id -> forecast units next month. With a session the forecast
+        is brought up to date first, without one the last computed is used as
+        is (empty if none was computed yet): production_needs refreshes run
+        in the commit and must not compute one. It stays yesterday's until
+        something calls forecast(), /production/calculate does when stale.
+        """
+        if db is not None:
+            self.forecast(db)
+        return self._monthly
+
+    @property
+    def ready(self) -> bool:
+        """Whether this process computed a forecast yet"""
+        return self._day is not None
+
+    @property
+    def stale(self) -> bool:
+        """Whether the cached forecast (if any) is not today's"""
+        return self._day != date.today()
+
+    def invalidate(self):
+        with self._lock:
+            self._day = None
+
+    def info(self) -> Dict:
+        return {"day": self._day.isoformat() if self._day else None, "stale": self.stale, "products": len(self._monthly)}
+
+
+# Shared by every request handled in this process
+demand_forecaster = DemandForecaster()
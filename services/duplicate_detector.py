@@ -0,0 +1,251 @@
+# services/duplicate_detector.py
+"""
+Offline job that finds near-duplicate master products
+("Knightsbridge Jacket" vs "Knights Bridge Jacket").
+
+    python -m services.duplicate_detector --threshold 90 --output duplicates.json
+
+Names are normalized exactly as ProductMatcher does (synonyms from the
+name_synonyms table included), each product is compared
+only with the products sharing the most trigrams with it (blocking), and the
+chunks of products are scored in parallel processes that memory-map one
+shared catalog index. Pairs above the threshold are grouped into clusters.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from decouple import config
+from sqlalchemy.orm import Session
+
+from models.product import Product
+from services.catalog_index import CatalogIndex, trigrams
+from services.name_normalizer import name_normalizer
+
+DUPLICATE_THRESHOLD = config('DUPLICATE_THRESHOLD', default=90.0, cast=float)
+DUPLICATE_NEIGHBORS = config('DUPLICATE_NEIGHBORS', default=50, cast=int)
+DUPLICATE_CHUNK_SIZE = 2000
+
+# Trigrams shared by more than this share of the catalog ("ket", " co") say
+# little about duplicates and dominate blocking time, so they are skipped
+MAX_GRAM_SHARE = 0.01
+MIN_BLOCKING_GRAMS = 3
+
+# Set in each worker process by _init_worker
+_worker_index: Optional[CatalogIndex] = None
+
+
+class DuplicatePair(NamedTuple):
+    first: int  # catalog positions, first < second
+    second: int
+    score: float
+
+
+class DuplicateCluster(NamedTuple):
+    products: List[Dict]  # {"id", "master_name"}
+    pairs: List[Dict]  # {"first", "second", "score"} by product id
+    score: float  # weakest link holding the cluster together
+
+
+def _init_worker(index_path: str, neighbors: int, synonyms: Dict[str, str]):
+    global _worker_index
+    # The saved index is only accepted under the synonym table it was built with
+    name_normalizer.load_synonyms(synonyms)
+    index = CatalogIndex(candidate_limit=neighbors)
+    if not index.load_file(index_path):
+        raise RuntimeError(f"Could not load the catalog index saved at {index_path}")
+    _worker_index = index
+
+
+def _score_chunk(start: int, stop: int, threshold: float) -> List[DuplicatePair]:
+    return score_positions(_worker_index, range(start, stop), threshold)
+
+
+def blocked_neighbors(index: CatalogIndex, position: int) -> np.ndarray:
+    """Catalog positions sharing the most informative trigrams with a product"""
+    snapshot = index.snapshot
+    postings = sorted(
+        (snapshot.postings[gram] for gram in trigrams(snapshot.normalized[position]) if gram in snapshot.postings),
+        key=len
+    )
+    max_posting = max(index.candidate_limit, int(len(snapshot.ids) * MAX_GRAM_SHARE))
+    # Always keep a few of the rarest grams so names made of common words still block
+    postings = postings[:MIN_BLOCKING_GRAMS] + [
+        posting for posting in postings[MIN_BLOCKING_GRAMS:] if len(posting) <= max_posting
+    ]
+    if not postings:
+        return np.empty(0, dtype=np.int32)
+
+    matched, overlap = np.unique(np.concatenate(postings), return_counts=True)
+    keep = matched != position
+    matched, overlap = matched[keep], overlap[keep]
+    if len(matched) > index.candidate_limit:
+        top = np.argpartition(overlap, -index.candidate_limit)[-index.candidate_limit:]
+        matched = np.sort(matched[top])
+    return matched
+
+
+def score_positions(index: CatalogIndex, positions: Iterable[int], threshold: float) -> List[DuplicatePair]:
+    """Pairs scoring at least threshold between the given products and their blocked neighbors"""
+    snapshot = index.snapshot
+    pairs = []
+    for position in positions:
+        name = snapshot.normalized[position]
+        candidates = blocked_neighbors(index, position)
+        if not len(candidates):
+            continue
+
+        choices = [snapshot.normalized[candidate] for candidate in candidates]
+        scores = CatalogIndex.combined_scores([name], choices)[0]
+        for candidate in np.flatnonzero(scores >= threshold):
+            other = int(candidates[candidate])
+            pairs.append(DuplicatePair(min(position, other), max(position, other), float(scores[candidate])))
+    return pairs
+
+
+def cluster_pairs(pairs: Iterable[DuplicatePair]) -> Dict[int, List[DuplicatePair]]:
+    """Union-find the pairs into connected components, keyed by root position"""
+    parent: Dict[int, int] = {}
+
+    def find(position: int) -> int:
+        parent.setdefault(position, position)
+        while parent[position] != position:
+            parent[position] = parent[parent[position]]
+            position = parent[position]
+        return position
+
+    pairs = list(pairs)
+    for pair in pairs:
+        first, second = find(pair.first), find(pair.second)
+        if first != second:
+            parent[max(first, second)] = min(first, second)
+
+    clusters: Dict[int, List[DuplicatePair]] = {}
+    for pair in pairs:
+        clusters.setdefault(find(pair.first), []).append(pair)
+    return clusters
+
+
+class DuplicateDetector:
+    """
+    All-pairs near-duplicate detection over the product catalog.
+    Work is roughly products x neighbors fuzzy comparisons instead of products².
+    """
+
+    def __init__(
+        self,
+        threshold: float = DUPLICATE_THRESHOLD,
+        neighbors: int = DUPLICATE_NEIGHBORS,
+        workers: Optional[int] = None,
+        chunk_size: int = DUPLICATE_CHUNK_SIZE
+    ):
+        self.threshold = threshold
+        self.neighbors = neighbors
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+    def find_duplicates(self, db: Session) -> List[DuplicateCluster]:
+        """Duplicate clusters among active products"""
+        name_normalizer.refresh(db, force=True)
+        rows = db.query(Product.id, Product.master_name).filter(Product.active == True).all()
+        return self.find_clusters(rows)
+
+    def find_clusters(self, rows: Iterable[Tuple]) -> List[DuplicateCluster]:
+        """Duplicate clusters among (product_id, master_name) rows, most similar first"""
+        index = CatalogIndex(candidate_limit=self.neighbors)
+        index.load(rows)
+        pairs = self.find_pairs(index)
+
+        snapshot = index.snapshot
+        clusters = []
+        for linked in cluster_pairs(pairs).values():
+            members = sorted({pair.first for pair in linked} | {pair.second for pair in linked})
+            clusters.append(DuplicateCluster(
+                products=[
+                    {"id": str(snapshot.ids[position]), "master_name": snapshot.names[position]}
+                    for position in members
+                ],
+                pairs=[
+                    {
+                        "first": str(snapshot.ids[pair.first]),
+                        "second": str(snapshot.ids[pair.second]),
+                        "score": round(pair.score, 2)
+                    }
+                    for pair in sorted(linked, key=lambda pair: -pair.score)
+                ],
+                score=round(min(pair.score for pair in linked), 2)
+            ))
+
+        clusters.sort(key=lambda cluster: (-cluster.score, -len(cluster.products)))
+        return clusters
+
+    def find_pairs(self, index: CatalogIndex) -> List[DuplicatePair]:
+        """Every pair of catalog positions scoring at least the threshold"""
+        total = len(index)
+        chunks = [(start, min(start + self.chunk_size, total)) for start in range(0, total, self.chunk_size)]
+
+        if self.workers <= 1 or len(chunks) <= 1:
+            found = score_positions(index, range(total), self.threshold)
+        else:
+            found = self._score_in_processes(index, chunks)
+
+        # Each pair is usually found from both sides, keep its best score
+        best: Dict[Tuple[int, int], DuplicatePair] = {}
+        for pair in found:
+            key = (pair.first, pair.second)
+            if key not in best or pair.score > best[key].score:
+                best[key] = pair
+        return list(best.values())
+
+    def _score_in_processes(self, index: CatalogIndex, chunks: List[Tuple[int, int]]) -> List[DuplicatePair]:
+        # Workers map one saved copy of the index instead of each rebuilding it
+        handle, index_path = tempfile.mkstemp(prefix="duplicate-index-")
+        os.close(handle)
+        try:
+            index.save(index_path)
+            # Spawned workers start clean and get the synonym table explicitly
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(index_path, self.neighbors, dict(name_normalizer.synonyms))
+            ) as executor:
+                futures = [executor.submit(_score_chunk, start, stop, self.threshold) for start, stop in chunks]
+                return [pair for future in futures for pair in future.result()]
+        finally:
+            os.unlink(index_path)
+
+
+def main():
+    from database.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Find near-duplicate master products")
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD)
+    parser.add_argument("--neighbors", type=int, default=DUPLICATE_NEIGHBORS)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default="-", help="JSON file, - for stdout")
+    args = parser.parse_args()
+
+    detector = DuplicateDetector(threshold=args.threshold, neighbors=args.neighbors, workers=args.workers)
+    db = SessionLocal()
+    try:
+        clusters = detector.find_duplicates(db)
+    finally:
+        db.close()
+
+    report = json.dumps([cluster._asdict() for cluster in clusters], indent=2)
+    if args.output == "-":
+        print(report)
+    else:
+        with open(args.output, "w") as output:
+            output.write(report)
+        print(f"{len(clusters)} duplicate clusters written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+# services/factory_scheduler.py
+"""
+Capacity-aware factory scheduling for production orders.
+
+Takes the prioritized production needs (ProductionPlanner.calculate_needs)
+and the factory capacity / lead-time tables, assigns every need to a factory
+and a completion date, and writes the resulting ProductionOrder rows in one
+transaction.
+
+Greedy list scheduling: needs are popped from a heap by priority, then by
+earliest required date, and each goes to the factory that completes it
+first given the work already queued there (open production orders included):
+    completion = factory free + quantity / daily_capacity + lead time
+Planned production orders without a factory (ProductionPlanner.create_order)
+are scheduled the same way and updated in place.
+
+Runs that write are serialized with a Postgres advisory lock held until their
+commit, and read the needs only once they hold it, so two concurrent runs
+cannot both order production for the same shortfall.
+"""
+import heapq
+import itertools
+import math
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+from decouple import config
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from models import FactoryCapacity, FactoryLeadTime, Product, ProductionNeed, ProductionOrder
+from services.production_needs import INCOMING_STATUSES, mark_changed
+from services.production_planner import ProductionPlanner
+from services.worker_pool import BoundedPool
+
+UNASSIGNED_STATUSES = ['planned']  # orders in these without a factory are scheduled too
+SCHEDULE_LOCK_KEY = 0x5C4ED01E  # pg_advisory_xact_lock key shared by every scheduling run
+
+SCHEDULE_POOL_WORKERS = config('SCHEDULE_POOL_WORKERS', default=1, cast=int)
+SCHEDULE_POOL_MAX_QUEUE = config('SCHEDULE_POOL_MAX_QUEUE', default=4, cast=int)
+
+# Scheduling runs load every need and open order, off the event loop
+scheduling_pool = BoundedPool("scheduling", SCHEDULE_POOL_WORKERS, SCHEDULE_POOL_MAX_QUEUE)
+
+
+class Factories(NamedTuple):
+    names: List[str]
+    daily_capacity: np.ndarray  # units per day, per factory
+    lead_days: np.ndarray  # (factories x categories), last column for categories without an override
+    categories: Dict[str, int]  # category -> lead_days column
+    backlog_days: np.ndarray  # days of open work already queued, per factory
+
+
+class Job(NamedTuple):
+    product_id: uuid.UUID
+    quantity: int
+    priority: int
+    required: Optional[datetime]
+    order_id: Optional[uuid.UUID] = None  # existing unassigned production order
+    quantity_needed: Optional[int] = None
+    quantity_in_stock: Optional[int] = None
+
+
+def load_factories(db: Session) -> Factories:
+    """Active factories, their lead time per product category and the open work queued on each"""
+    factories = db.query(FactoryCapacity).filter(
+        # active has only a Python-side default, NULL counts as active
+        FactoryCapacity.active.isnot(False),
+        FactoryCapacity.daily_capacity > 0
+    ).order_by(FactoryCapacity.factory_name).all()
+    positions = {factory.id: position for position, factory in enumerate(factories)}
+
+    overrides = db.query(FactoryLeadTime).filter(FactoryLeadTime.factory_id.in_(list(positions))).all()
+    categories = {category: column for column, category in enumerate(sorted({row.category for row in overrides}))}
+    lead_days = np.repeat(
+        np.array([factory.lead_time_days or 0 for factory in factories], dtype=np.float64)[:, None],
+        len(categories) + 1, axis=1
+    )
+    for row in overrides:
+        lead_days[positions[row.factory_id], categories[row.category]] = row.lead_time_days
+
+    names = [factory.factory_name for factory in factories]
+    daily_capacity = np.array([factory.daily_capacity for factory in factories], dtype=np.float64)
+    queued = dict(db.query(
+        ProductionOrder.factory_name,
+        func.sum(ProductionOrder.quantity_to_produce)
+    ).filter(
+        ProductionOrder.status.in_(INCOMING_STATUSES),
+        ProductionOrder.factory_name.in_(names)
+    ).group_by(ProductionOrder.factory_name).all())
+    backlog_days = np.array([queued.get(name) or 0 for name in names], dtype=np.float64) / daily_capacity
+    return Factories(names, daily_capacity, lead_days, categories, backlog_days)
+
+
+class FactoryScheduler:
+    """Assigns production needs to factories and completion dates within their capacity"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    async def schedule_current(self, min_priority: int = 1, include_unassigned: bool = True, dry_run: bool = False) -> Dict:
+        """Run run() on the scheduling pool (PoolSaturated when it is full)"""
+        return await scheduling_pool.run(self.run, min_priority, include_unassigned, dry_run)
+
+    def run(self, min_priority: int = 1, include_unassigned: bool = True, dry_run: bool = False) -> Dict:
+        """Schedule the current production needs, one writing run at a time"""
+        if not dry_run:
+            self._lock()
+        needs = ProductionPlanner(self.db).current_needs()
+        return self.schedule(needs, include_unassigned, dry_run, min_priority)
+
+    def schedule(
+        self,
+        needs: Iterable[Dict],
+        include_unassigned: bool = True,
+        dry_run: bool = False,
+        min_priority: int = 1
+    ) -> Dict:
+        """
+        Schedule needs (calculate_needs rows: product_id, to_produce, priority,
+        total_needed, current_stock) and, with include_unassigned, planned
+        production orders without a factory, both from min_priority up.
+        Unless dry_run, new orders are inserted and unassigned ones updated
+        in one transaction.
+        """
+        started = time.perf_counter()
+        factories = load_factories(self.db)
+        if not factories.names:
+            raise ValueError("No active factory capacity configured")
+
+        jobs = [
+            Job(self._uuid(need['product_id']), need['to_produce'], need.get('priority', 1), None,
+                quantity_needed=need.get('total_needed'), quantity_in_stock=need.get('current_stock'))
+            for need in needs if need.get('to_produce', 0) > 0 and need.get('priority', 1) >= min_priority
+        ]
+        if include_unassigned:
+            unassigned = self.db.query(
+                ProductionOrder.id, ProductionOrder.product_id, ProductionOrder.quantity_to_produce,
+                ProductionOrder.priority
+            ).filter(
+                ProductionOrder.status.in_(UNASSIGNED_STATUSES),
+                ProductionOrder.factory_name.is_(None),
+                ProductionOrder.quantity_to_produce > 0,
+                func.coalesce(ProductionOrder.priority, 1) >= min_priority
+            )
+            if not dry_run:
+                # Locked until the commit, so none gets a factory elsewhere after its
+                # production days were charged here (rows assigned meanwhile drop out)
+                unassigned = unassigned.with_for_update(of=ProductionOrder)
+            jobs += [
+                Job(row.product_id, row.quantity_to_produce, row.priority or 1, None, order_id=row.id)
+                for row in unassigned.all()
+            ]
+        details = self._product_details({job.product_id for job in jobs})
+        jobs = [job._replace(required=details.get(job.product_id, (None, None))[1]) for job in jobs]
+        loaded = time.perf_counter()
+
+        assignments = self._assign(jobs, factories, details)
+        if not dry_run:
+            self._write(assignments)
+        return self._payload(assignments, factories, dry_run, loaded - started, time.perf_counter() - loaded)
+
+    def _assign(self, jobs: List[Job], factories: Factories, details: Dict) -> List[Dict]:
+        """Greedy earliest completion, most urgent job first"""
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        free_days = factories.backlog_days.copy()
+        uncategorized = len(factories.categories)
+
+        # Priority first, then the earliest required date, jobs without one last
+        sequence = itertools.count()
+        heap = [
+            (-job.priority, job.required is None, self._timestamp(job.required), next(sequence), job)
+            for job in jobs
+        ]
+        heapq.heapify(heap)
+
+        assignments = []
+        while heap:
+            job = heapq.heappop(heap)[-1]
+            category = details.get(job.product_id, (None, None))[0]
+            lead_days = factories.lead_days[:, factories.categories.get(category, uncategorized)]
+            production_days = job.quantity / factories.daily_capacity
+            completion_days = free_days + production_days + lead_days
+            factory = int(np.argmin(completion_days))
+            free_days[factory] += production_days[factory]
+
+            expected_completion = today + timedelta(days=math.ceil(completion_days[factory]))
+            assignments.append({
+                'product_id': job.product_id,
+                'production_order_id': job.order_id,
+                'quantity': job.quantity,
+                'priority': job.priority,
+                'factory_name': factories.names[factory],
+                'expected_completion': expected_completion,
+                'required_date': job.required,
+                'late': job.required is not None and expected_completion > self._aware(job.required),
+                'quantity_needed': job.quantity_needed,
+                'quantity_in_stock': job.quantity_in_stock
+            })
+        return assignments
+
+    def _write(self, assignments: List[Dict]):
+        """New orders in one multi-row INSERT, unassigned ones in one executemany UPDATE, one commit"""
+        created_at = datetime.now(timezone.utc)
+        new_orders = [
+            {
+                'id': uuid.uuid4(),
+                'product_id': assignment['product_id'],
+                'quantity_needed': assignment['quantity_needed'],
+                'quantity_in_stock': assignment['quantity_in_stock'],
+                'quantity_to_produce': assignment['quantity'],
+                'priority': assignment['priority'],
+                'factory_name': assignment['factory_name'],
+                'expected_completion': assignment['expected_completion'],
+                'status': 'planned',
+                'created_at': created_at
+            }
+            for assignment in assignments if assignment['production_order_id'] is None
+        ]
+        existing = [
+            {
+                'order_id': assignment['production_order_id'],
+                'factory_name': assignment['factory_name'],
+                'expected_completion': assignment['expected_completion']
+            }
+            for assignment in assignments if assignment['production_order_id'] is not None
+        ]
+        try:
+            if new_orders:
+                self.db.execute(insert(ProductionOrder), new_orders)
+            if existing:
+                # The rows are locked since schedule() read them, the guard is only a backstop
+                self.db.connection().execute(
+                    update(ProductionOrder)
+                    .where(ProductionOrder.id == bindparam('order_id'), ProductionOrder.factory_name.is_(None))
+                    .values(factory_name=bindparam('factory_name'), expected_completion=bindparam('expected_completion')),
+                    existing
+                )
+            # Core writes are invisible to the session, production_needs is told directly
+            mark_changed(self.db, {order['product_id'] for order in new_orders})
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        for assignment, order in zip(
+            (assignment for assignment in assignments if assignment['production_order_id'] is None), new_orders
+        ):
+            assignment['production_order_id'] = order['id']
+
+    def _lock(self):
+        """Wait for any other writing run, the lock is held until this transaction ends"""
+        if self.db.get_bind().dialect.name == "postgresql":
+            self.db.execute(select(func.pg_advisory_xact_lock(SCHEDULE_LOCK_KEY)))
+
+    def _product_details(self, product_ids) -> Dict:
+        """product_id -> (category, earliest required date of its pending orders)"""
+        if not product_ids:
+            return {}
+        rows = self.db.query(
+            Product.id, Product.category, ProductionNeed.earliest_required
+        ).outerjoin(
+            ProductionNeed, ProductionNeed.product_id == Product.id
+        ).filter(Product.id.in_(list(product_ids))).all()
+        return {product_id: (category, required) for product_id, category, required in rows}
+
+    def _payload(self, assignments: List[Dict], factories: Factories, dry_run: bool, load_seconds: float, schedule_seconds: float) -> Dict:
+        load = {name: {'factory_name': name, 'orders': 0, 'units': 0, 'last_completion': None} for name in factories.names}
+        for assignment in assignments:
+            factory = load[assignment['factory_name']]
+            factory['orders'] += 1
+            factory['units'] += assignment['quantity']
+            factory['last_completion'] = max(filter(None, [factory['last_completion'], assignment['expected_completion']]))
+        return {
+            "success": True,
+            "dry_run": dry_run,
+            "scheduled": len(assignments),
+            "late": len([assignment for assignment in assignments if assignment['late']]),
+            "factories": list(load.values()),
+            "orders": [
+                {key: value for key, value in assignment.items() if key not in ('quantity_needed', 'quantity_in_stock')}
+                for assignment in assignments
+            ],
+            "load_seconds": round(load_seconds, 3),
+            "schedule_seconds": round(schedule_seconds, 3)
+        }
+
+    @staticmethod
+    def _aware(value: datetime) -> datetime:
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+    @classmethod
+    def _timestamp(cls, value: Optional[datetime]) -> float:
+        return cls._aware(value).timestamp() if value is not None else 0.0
+
+    @staticmethod
+    def _uuid(value) -> uuid.UUID:
+        return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
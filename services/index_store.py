@@ -0,0 +1,191 @@
+# services/index_store.py
+import json
+import os
+import struct
+import tempfile
+import uuid
+from collections.abc import Mapping, Sequence
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# File layout: magic | header length (uint64) | JSON header | aligned raw arrays
+INDEX_MAGIC = b"ARCHIDX\x00"
+INDEX_FORMAT_VERSION = 1
+_PREFIX = struct.Struct("<8sQ")
+_ALIGNMENT = 64
+
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def encode_strings(strings: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Pack strings into one UTF-8 blob plus an offsets array"""
+    encoded = [value.encode('utf-8') for value in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        offsets[1:] = np.cumsum([len(value) for value in encoded])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return blob, offsets
+
+
+class StringColumn(Sequence):
+    """Read-only strings decoded on access from a (possibly memory-mapped) blob"""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+        self._materialized: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        start, end = self._offsets[position], self._offsets[position + 1]
+        return self._blob[start:end].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def materialize(self) -> List[str]:
+        """Decode everything once, for callers that need a real list"""
+        if self._materialized is None:
+            self._materialized = list(self)
+        return self._materialized
+
+
+class UuidColumn(Sequence):
+    """Read-only UUIDs stored as an (n, 16) byte array"""
+
+    def __init__(self, values: np.ndarray):
+        self._values = values
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        return uuid.UUID(bytes=self._values[position].tobytes())
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    @staticmethod
+    def encode(values: Iterable[uuid.UUID]) -> np.ndarray:
+        return np.frombuffer(b"".join(value.bytes for value in values), dtype=np.uint8).reshape(-1, 16)
+
+
+class MappedPostings(Mapping):
+    """trigram -> positions, backed by sorted grams and one CSR rows array"""
+
+    def __init__(self, grams: StringColumn, offsets: np.ndarray, rows: np.ndarray):
+        self._grams = grams
+        self._offsets = offsets
+        self._rows = rows
+        self._lookup: Optional[Dict[str, int]] = None
+
+    def _index(self) -> Dict[str, int]:
+        # Only the gram strings are decoded per process, the postings stay shared
+        if self._lookup is None:
+            self._lookup = {gram: i for i, gram in enumerate(self._grams)}
+        return self._lookup
+
+    def __getitem__(self, gram: str) -> np.ndarray:
+        i = self._index()[gram]
+        return self._rows[self._offsets[i]:self._offsets[i + 1]]
+
+    def __contains__(self, gram) -> bool:
+        return gram in self._index()
+
+    def __iter__(self):
+        return iter(self._index())
+
+    def __len__(self) -> int:
+        return len(self._grams)
+
+    @staticmethod
+    def encode(postings: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        grams = sorted(postings)
+        gram_blob, gram_offsets = encode_strings(grams)
+        offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+        if grams:
+            offsets[1:] = np.cumsum([len(postings[gram]) for gram in grams])
+            rows = np.concatenate([postings[gram] for gram in grams]).astype(np.int32, copy=False)
+        else:
+            rows = np.empty(0, dtype=np.int32)
+        return {
+            "gram_blob": gram_blob,
+            "gram_offsets": gram_offsets,
+            "posting_offsets": offsets,
+            "posting_rows": rows
+        }
+
+    @classmethod
+    def decode(cls, arrays: Dict[str, np.ndarray]) -> "MappedPostings":
+        return cls(
+            StringColumn(arrays["gram_blob"], arrays["gram_offsets"]),
+            arrays["posting_offsets"],
+            arrays["posting_rows"]
+        )
+
+
+def write_index(path: str, header: Dict, arrays: Dict[str, np.ndarray]):
+    """Write header and arrays to path atomically (readers never see a partial file)"""
+    layout, offset = {}, 0
+    for name, values in arrays.items():
+        values = np.ascontiguousarray(values)
+        arrays[name] = values
+        layout[name] = {"dtype": values.dtype.str, "shape": list(values.shape), "offset": offset}
+        offset = _aligned(offset + values.nbytes)
+
+    header = dict(header, format_version=INDEX_FORMAT_VERSION, arrays=layout)
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = _aligned(_PREFIX.size + len(header_bytes))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix=".catalog-index-")
+    try:
+        with os.fdopen(handle, "wb") as out:
+            out.write(_PREFIX.pack(INDEX_MAGIC, len(header_bytes)))
+            out.write(header_bytes)
+            for name, values in arrays.items():
+                out.seek(data_start + layout[name]["offset"])
+                out.write(values.tobytes())
+        # Workers that already mapped the old file keep their (unlinked) copy
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def read_index(path: str) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """Memory-map an index file read-only, raises ValueError if it is not one"""
+    with open(path, "rb") as handle:
+        prefix = handle.read(_PREFIX.size)
+        if len(prefix) != _PREFIX.size:
+            raise ValueError(f"{path} is not a catalog index file")
+        magic, header_length = _PREFIX.unpack(prefix)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{path} is not a catalog index file")
+        header = json.loads(handle.read(header_length))
+    if header.get("format_version") != INDEX_FORMAT_VERSION:
+        raise ValueError(f"{path} has unsupported format {header.get('format_version')}")
+
+    data_start = _aligned(_PREFIX.size + header_length)
+    mapped = np.memmap(path, dtype=np.uint8, mode="r")
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        start = data_start + spec["offset"]
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        arrays[name] = mapped[start:start + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+    return header, arrays
@@ -0,0 +1,270 @@
+# services/job_queue.py
+"""
+Background jobs for long-running work (order CSV imports) so requests return
+a job id immediately instead of holding the connection and a DB session.
+
+Two backends, picked with JOB_QUEUE_BACKEND:
+- "inprocess" (default): one thread pool per job type inside the API process.
+- "celery": tasks go to Celery over CELERY_BROKER_URL (Redis). Each job type
+  has its own queue, so concurrency per type is the worker's -c for that queue:
+      celery -A services.job_queue worker -Q csv_import -c 2
+  Uploaded files must then live on storage the workers can read (JOB_UPLOAD_DIR).
+"""
+import asyncio
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Dict, Optional
+
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUE_BACKEND = config('JOB_QUEUE_BACKEND', default='inprocess')
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
+# "job_type=workers" pairs, e.g. "csv_import=2,default=4"
+JOB_CONCURRENCY = config('JOB_CONCURRENCY', default='csv_import=2,default=4')
+JOB_UPLOAD_DIR = config('JOB_UPLOAD_DIR', default=os.path.join(tempfile.gettempdir(), 'arch-jobs'))
+MAX_FINISHED_JOBS = config('MAX_FINISHED_JOBS', default=1000, cast=int)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+# job_type -> fn(progress, **params) returning a JSON-serializable result
+handlers: Dict[str, Callable] = {}
+
+
+def job_handler(job_type: str):
+    """Register the function that runs jobs of job_type"""
+    def register(fn: Callable) -> Callable:
+        handlers[job_type] = fn
+        return fn
+    return register
+
+
+def parse_concurrency(spec: str) -> Dict[str, int]:
+    limits = {}
+    for pair in filter(None, (part.strip() for part in spec.split(','))):
+        job_type, _, workers = pair.partition('=')
+        limits[job_type.strip()] = int(workers)
+    return limits
+
+
+def save_upload(stream: BinaryIO, suffix: str = ".csv") -> str:
+    """Copy an upload to JOB_UPLOAD_DIR so a job can read it after the request ends"""
+    os.makedirs(JOB_UPLOAD_DIR, exist_ok=True)
+    handle, path = tempfile.mkstemp(dir=JOB_UPLOAD_DIR, suffix=suffix)
+    with os.fdopen(handle, "wb") as out:
+        while True:
+            block = stream.read(1024 * 1024)
+            if not block:
+                break
+            out.write(block)
+    return path
+
+
+class JobQueue(ABC):
+    """Interface shared by the backends"""
+
+    @abstractmethod
+    def submit(self, job_type: str, **params) -> str:
+        """Queue a job, returns its id"""
+
+    @abstractmethod
+    def status(self, job_id: str) -> Optional[Dict]:
+        """The job's state, None once it is unknown (never submitted or pruned)"""
+
+    def shutdown(self):
+        pass
+
+
+class InProcessJobQueue(JobQueue):
+    """
+    Runs jobs on per-type thread pools in this process. Job state lives in
+    memory, the newest MAX_FINISHED_JOBS finished jobs stay queryable.
+    """
+
+    def __init__(self, concurrency: Dict[str, int], max_finished: int = MAX_FINISHED_JOBS):
+        self.concurrency = concurrency
+        self.max_finished = max_finished
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, job_type: str, **params) -> str:
+        if job_type not in handlers:
+            raise ValueError(f"Unknown job type {job_type}")
+
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "job_type": job_type,
+                "status": QUEUED,
+                "progress": {},
+                "result": None,
+                "error": None,
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None
+            }
+            self._prune()
+        self._executor(job_type).submit(self._run, job_id, job_type, params)
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job, progress=dict(job["progress"])) if job else None
+
+    def shutdown(self):
+        # Let running imports finish their current chunk and commit
+        for executor in self._executors.values():
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _executor(self, job_type: str) -> ThreadPoolExecutor:
+        with self._lock:
+            executor = self._executors.get(job_type)
+            if executor is None:
+                workers = self.concurrency.get(job_type, self.concurrency.get("default", 1))
+                executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"job-{job_type}")
+                self._executors[job_type] = executor
+            return executor
+
+    def _run(self, job_id: str, job_type: str, params: Dict):
+        self._update(job_id, status=RUNNING, started_at=time.time())
+
+        def progress(**values):
+            with self._lock:
+                self._jobs[job_id]["progress"].update(values)
+
+        try:
+            result = handlers[job_type](progress, **params)
+            self._update(job_id, status=SUCCEEDED, result=result, finished_at=time.time())
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job_id, job_type)
+            self._update(job_id, status=FAILED, error=str(e), finished_at=time.time())
+
+    def _update(self, job_id: str, **values):
+        with self._lock:
+            self._jobs[job_id].update(values)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+
+class CeleryJobQueue(JobQueue):
+    """Sends jobs to Celery workers, one queue per job type"""
+
+    STATES = {"PENDING": QUEUED, "RECEIVED": QUEUED, "STARTED": RUNNING, "PROGRESS": RUNNING,
+              "RETRY": QUEUED, "SUCCESS": SUCCEEDED, "FAILURE": FAILED, "REVOKED": FAILED}
+
+    def __init__(self, app):
+        self.app = app
+
+    def submit(self, job_type: str, **params) -> str:
+        if job_type not in handlers:
+            raise ValueError(f"Unknown job type {job_type}")
+        result = run_job_task.apply_async(args=(job_type,), kwargs=params, queue=job_type)
+        return result.id
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        result = self.app.AsyncResult(job_id)
+        status = self.STATES.get(result.state, QUEUED)
+        info = result.info if isinstance(result.info, dict) else {}
+        return {
+            "job_id": job_id,
+            "status": status,
+            "progress": info if status == RUNNING else {},
+            "result": result.result if status == SUCCEEDED else None,
+            "error": str(result.result) if status == FAILED else None
+        }
+
+
+def create_job_queue(backend: str = JOB_QUEUE_BACKEND) -> JobQueue:
+    if backend == "celery":
+        return CeleryJobQueue(celery_app)
+    return InProcessJobQueue(parse_concurrency(JOB_CONCURRENCY))
+
+
+# Celery is optional: only needed by the celery backend and by the workers
+try:
+    from celery import Celery
+except ImportError:  # pragma: no cover
+    celery_app = None
+    run_job_task = None
+else:
+    celery_app = Celery("arch_jobs", broker=CELERY_BROKER_URL, backend=CELERY_BROKER_URL)
+    celery_app.conf.task_track_started = True
+
+    @celery_app.task(bind=True, name="jobs.run")
+    def run_job_task(task, job_type: str, **params):
+        def progress(**values):
+            task.update_state(state="PROGRESS", meta=values)
+        return handlers[job_type](progress, **params)
+
+
+@job_handler("csv_import")
+def import_order_csv(
+    progress: Callable,
+    file_path: str,
+    streaming: Optional[bool] = None,
+    mode: str = "insert",
+    delete_after: bool = False
+):
+    """NuOrder CSV import with its own DB session, reporting rows/orders done per chunk"""
+    from database.database import SessionLocal
+    from services.order_processor import OrderProcessor
+
+    db = SessionLocal()
+    try:
+        processor = OrderProcessor(db)
+        result = asyncio.run(processor.process_nuorder_csv(
+            file_path,
+            streaming=streaming,
+            progress=lambda rows, orders: progress(rows_processed=rows, orders_processed=orders),
+            mode=mode
+        ))
+    finally:
+        db.close()
+        if delete_after and os.path.exists(file_path):
+            os.unlink(file_path)
+
+    if not result["success"]:
+        raise RuntimeError(result["error"])
+    return result
+
+
+@job_handler("batch_import")
+def import_order_batch(
+    progress: Callable,
+    source: str,
+    mode: str = "insert",
+    collisions: str = "skip",
+    workers: Optional[int] = None
+):
+    """Directory/glob of NuOrder CSVs, reporting files parsed then rows written"""
+    from database.database import SessionLocal
+    from services.batch_ingest import BatchIngestor
+
+    db = SessionLocal()
+    try:
+        result = BatchIngestor(db, workers=workers, mode=mode, collisions=collisions).ingest(source, progress=progress)
+    finally:
+        db.close()
+
+    if not result["success"]:
+        raise RuntimeError(result["error"])
+    return result
+
+
+# Shared by every request handled in this process
+job_queue = create_job_queue()
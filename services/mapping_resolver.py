@@ -0,0 +1,131 @@
+# services/mapping_resolver.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from decouple import config
+from sqlalchemy import and_, or_, tuple_
+from sqlalchemy.orm import Session
+
+from models.product import Product, ProductMapping
+
+MAPPING_CACHE_SIZE = config('MAPPING_CACHE_SIZE', default=100_000, cast=int)
+MAPPING_CACHE_TTL = config('MAPPING_CACHE_TTL', default=900, cast=float)  # seconds
+
+
+class ResolvedMapping(NamedTuple):
+    id: object  # product id
+    master_name: str
+
+
+class MappingResolver:
+    """
+    Resolves (platform, external_id) to the mapped master product.
+    Hits are kept in a bounded LRU cache with a TTL so repeat syncs from the
+    same platform are answered from memory; misses go to Postgres in one query
+    backed by the (platform, external_id) unique index.
+    """
+
+    def __init__(self, max_size: int = MAPPING_CACHE_SIZE, ttl: float = MAPPING_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[Tuple, Tuple[ResolvedMapping, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, db: Session, platform: str, external_id: Optional[str]) -> Optional[ResolvedMapping]:
+        key = (platform, external_id)
+        return self.resolve_many(db, [key]).get(key)
+
+    def resolve_many(self, db: Session, keys: Iterable[Tuple]) -> Dict[Tuple, ResolvedMapping]:
+        """Resolve many (platform, external_id) keys, one query for all cache misses"""
+        resolved = {}
+        missing = set()
+        now = time.monotonic()
+
+        with self._lock:
+            for key in set(keys):
+                entry = self._cache.get(key)
+                if entry and entry[1] > now:
+                    self._cache.move_to_end(key)
+                    resolved[key] = entry[0]
+                    self.hits += 1
+                else:
+                    if entry:
+                        del self._cache[key]
+                    missing.add(key)
+                    self.misses += 1
+
+        if missing:
+            loaded = self._load(db, missing)
+            with self._lock:
+                for key, mapping in loaded.items():
+                    self._put(key, mapping, now)
+            resolved.update(loaded)
+
+        return resolved
+
+    def prime(self, platform: str, external_id: Optional[str], mapping: ResolvedMapping):
+        """Cache a mapping that was just written (or buffered for writing)"""
+        with self._lock:
+            self._put((platform, external_id), mapping, time.monotonic())
+
+    def invalidate(self, platform: str, external_id: Optional[str]):
+        with self._lock:
+            self._cache.pop((platform, external_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "size": len(self._cache),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def _put(self, key: Tuple, mapping: ResolvedMapping, now: float):
+        self._cache[key] = (mapping, now + self.ttl)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def _load(self, db: Session, keys: Iterable[Tuple]) -> Dict[Tuple, ResolvedMapping]:
+        with_id = {key for key in keys if key[1] is not None}
+        # external_id == None compares with IS NULL, same as the original lookup
+        null_id_platforms = {platform for platform, external_id in keys if external_id is None}
+
+        conditions = []
+        if with_id:
+            conditions.append(tuple_(ProductMapping.platform, ProductMapping.external_id).in_(with_id))
+        if null_id_platforms:
+            conditions.append(and_(
+                ProductMapping.platform.in_(null_id_platforms),
+                ProductMapping.external_id.is_(None)
+            ))
+
+        # Join the product in the same query instead of lazy-loading it
+        rows = db.query(
+            ProductMapping.platform,
+            ProductMapping.external_id,
+            Product.id,
+            Product.master_name
+        ).join(
+            Product, ProductMapping.product_id == Product.id
+        ).filter(
+            or_(*conditions)
+        ).all()
+
+        mappings = {}
+        for row in rows:
+            mappings.setdefault((row.platform, row.external_id), ResolvedMapping(row.id, row.master_name))
+        return mappings
+
+
+# Shared by every request handled in this process
+mapping_resolver = MappingResolver()
@@ -0,0 +1,196 @@
+# services/mapping_writer.py
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from decouple import config
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DBAPIError, DisconnectionError, InterfaceError, OperationalError
+from sqlalchemy.orm import Session
+
+from database.database import SessionLocal
+from models.product import ProductMapping
+
+logger = logging.getLogger(__name__)
+
+MAPPING_WRITER_MAX_BUFFER = config('MAPPING_WRITER_MAX_BUFFER', default=500, cast=int)
+MAPPING_WRITER_FLUSH_INTERVAL = config('MAPPING_WRITER_FLUSH_INTERVAL', default=2.0, cast=float)  # seconds
+
+
+def upsert_mappings(db: Session, rows: List[Dict]):
+    """Insert mappings, re-pointing any existing (platform, external_id) row"""
+    statement = pg_insert(ProductMapping)
+    statement = statement.on_conflict_do_update(
+        index_elements=[ProductMapping.platform, ProductMapping.external_id],
+        set_={
+            "product_id": statement.excluded.product_id,
+            "external_name": statement.excluded.external_name,
+            "last_synced": statement.excluded.last_synced
+        }
+    )
+    db.execute(statement, rows)
+
+
+def _connection_error(error: Exception) -> bool:
+    """The database was unreachable, as opposed to a row it refused"""
+    if isinstance(error, (OperationalError, InterfaceError, DisconnectionError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+class MappingWriter:
+    """
+    Write-behind buffer for ProductMapping rows.
+    Mappings are de-duplicated on (platform, external_id) (last write wins) and
+    flushed as one upsert when the buffer fills, on a timer, when a match
+    request ends and on shutdown.
+    
+    If the database is unreachable the rows stay buffered for the next flush.
+    Any other failure is retried row by row and rows the database still
+    refuses (e.g. an external_id too long for the column) are logged and
+    dropped, so one bad row cannot block every later flush.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_buffer: int = MAPPING_WRITER_MAX_BUFFER,
+        flush_interval: float = MAPPING_WRITER_FLUSH_INTERVAL
+    ):
+        self.session_factory = session_factory
+        self.max_buffer = max_buffer
+        self.flush_interval = flush_interval
+        self._buffer: Dict[Tuple, Dict] = {}
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Metrics
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.rows_flushed = 0
+        self.rows_dropped = 0
+        self.duplicates_dropped = 0
+        self.last_flush_rows = 0
+        self.last_flush_ms = 0.0
+        self.last_flush_at: Optional[float] = None
+
+    def add(self, row: Dict):
+        """Buffer a mapping row, flushing inline once the buffer is full. Never raises"""
+        key = (row["platform"], row["external_id"])
+        with self._buffer_lock:
+            if key in self._buffer:
+                self.duplicates_dropped += 1
+            self._buffer[key] = row
+            full = len(self._buffer) >= self.max_buffer
+
+        if full:
+            try:
+                self.flush()
+            except Exception:
+                # A match must not fail because its mapping could not be saved yet
+                logger.exception("Mapping flush failed, rows kept for the next attempt")
+
+    def pending(self, platform: str, external_id: Optional[str]) -> Optional[Dict]:
+        with self._buffer_lock:
+            return self._buffer.get((platform, external_id))
+
+    def flush(self) -> int:
+        """Write everything buffered as one upsert, returns the number of rows written"""
+        with self._flush_lock:
+            with self._buffer_lock:
+                rows, self._buffer = self._buffer, {}
+            if not rows:
+                return 0
+
+            started = time.perf_counter()
+            db = self.session_factory()
+            try:
+                upsert_mappings(db, list(rows.values()))
+                db.commit()
+                written = len(rows)
+            except Exception as e:
+                db.rollback()
+                self.failed_flushes += 1
+                if _connection_error(e):
+                    self._requeue(rows)
+                    raise
+                written = self._flush_rows(db, rows)
+            finally:
+                db.close()
+
+            self.flushes += 1
+            self.rows_flushed += written
+            self.last_flush_rows = written
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+            self.last_flush_at = time.time()
+            return written
+
+    def _flush_rows(self, db: Session, rows: Dict[Tuple, Dict]) -> int:
+        """One upsert per row after a failed batch, dropping the rows the database refuses"""
+        written = 0
+        remaining = list(rows.items())
+        while remaining:
+            key, row = remaining.pop(0)
+            try:
+                upsert_mappings(db, [row])
+                db.commit()
+                written += 1
+            except Exception as e:
+                db.rollback()
+                if _connection_error(e):
+                    self._requeue(dict([(key, row)] + remaining))
+                    raise
+                self.rows_dropped += 1
+                logger.error("Dropping product mapping %s that the database refused: %s", key, e)
+        return written
+
+    def _requeue(self, rows: Dict[Tuple, Dict]):
+        # Put the rows back unless a newer mapping arrived meanwhile
+        with self._buffer_lock:
+            for key, row in rows.items():
+                self._buffer.setdefault(key, row)
+
+    def start(self):
+        """Start the background timer that flushes every flush_interval seconds"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="mapping-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the timer and flush whatever is still buffered"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> Dict:
+        return {
+            "buffered": len(self._buffer),
+            "max_buffer": self.max_buffer,
+            "flush_interval_seconds": self.flush_interval,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "rows_flushed": self.rows_flushed,
+            "rows_dropped": self.rows_dropped,
+            "duplicates_dropped": self.duplicates_dropped,
+            "last_flush_rows": self.last_flush_rows,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "last_flush_at": self.last_flush_at
+        }
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Mapping flush failed, rows kept for the next attempt")
+
+
+# Shared by every request handled in this process
+mapping_writer = MappingWriter()
@@ -0,0 +1,155 @@
+# services/name_normalizer.py
+import csv
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from decouple import config
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models.product import NameSynonym
+
+NAME_SYNONYMS_FILE = config('NAME_SYNONYMS_FILE', default='')
+NAME_SYNONYMS_RELOAD_INTERVAL = config('NAME_SYNONYMS_RELOAD_INTERVAL', default=30.0, cast=float)  # seconds
+NAME_NORMALIZER_CACHE_SIZE = config('NAME_NORMALIZER_CACHE_SIZE', default=200_000, cast=int)
+
+# Common naming variations seen across platforms
+DEFAULT_SYNONYMS = {
+    'knightsbridge': 'knights bridge',
+    'nice bridge': 'knights bridge',
+    '&': 'and',
+    '+': 'and',
+    '-': ' ',
+    '_': ' ',
+}
+
+# Any run of punctuation and whitespace collapses to a single space
+_SEPARATORS = re.compile(r'\W+')
+
+
+class NameNormalizer:
+    """
+    Normalizes product names for matching.
+    The synonym table is compiled into one alternation regex (longest phrase
+    first) so every name is rewritten in a single pass, and results are
+    memoized in a bounded LRU cache. Synonyms come from DEFAULT_SYNONYMS, an
+    optional JSON/CSV file and the name_synonyms table; refresh() reloads them
+    when any source changes.
+    """
+
+    def __init__(self, synonyms: Optional[Dict[str, str]] = None, cache_size: int = NAME_NORMALIZER_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.synonyms_file = NAME_SYNONYMS_FILE
+        self.reload_interval = NAME_SYNONYMS_RELOAD_INTERVAL
+        self.version = 0
+        self._lock = threading.Lock()
+        self._source_signature: Optional[Tuple] = None
+        self._checked_at = 0.0
+        self.load_synonyms(DEFAULT_SYNONYMS if synonyms is None else synonyms)
+
+    def normalize(self, name: str) -> str:
+        return self._normalize(name)
+
+    def load_synonyms(self, synonyms: Dict[str, str]):
+        """Compile a synonym table and start a fresh cache"""
+        table = {phrase.lower(): replacement.lower() for phrase, replacement in synonyms.items() if phrase}
+        normalize = self._compile(table, self.cache_size)
+        fingerprint = hashlib.sha1(json.dumps(table, sort_keys=True).encode('utf-8')).hexdigest()
+        with self._lock:
+            self.synonyms = table
+            self.fingerprint = fingerprint  # stable across processes, unlike version
+            self._normalize = normalize
+            self.version += 1
+
+    def refresh(self, db: Optional[Session] = None, force: bool = False) -> bool:
+        """
+        Reload synonyms if the file or the name_synonyms table changed.
+        Checks at most every reload_interval seconds unless forced.
+        Returns True when a new table was compiled.
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_interval:
+            return False
+        self._checked_at = now
+
+        signature = self._signature(db)
+        if not force and signature == self._source_signature:
+            return False
+
+        synonyms = dict(DEFAULT_SYNONYMS)
+        if self.synonyms_file and os.path.exists(self.synonyms_file):
+            synonyms.update(self._read_file(self.synonyms_file))
+        if db is not None:
+            synonyms.update(self._read_db(db))
+
+        self.load_synonyms(synonyms)
+        self._source_signature = signature
+        return True
+
+    def cache_info(self):
+        return self._normalize.cache_info()
+
+    def _signature(self, db: Optional[Session]) -> Tuple:
+        file_mtime = None
+        if self.synonyms_file and os.path.exists(self.synonyms_file):
+            file_mtime = os.path.getmtime(self.synonyms_file)
+
+        db_state = None
+        if db is not None:
+            db_state = tuple(db.query(func.count(NameSynonym.id), func.max(NameSynonym.updated_at)).one())
+
+        return (file_mtime, db_state)
+
+    @staticmethod
+    def _read_file(path: str) -> Dict[str, str]:
+        """JSON object {"phrase": "replacement"} or CSV rows phrase,replacement"""
+        with open(path, newline='', encoding='utf-8') as handle:
+            if path.endswith('.json'):
+                return json.load(handle)
+            return {row[0]: row[1] for row in csv.reader(handle) if len(row) >= 2}
+
+    @staticmethod
+    def _read_db(db: Session) -> Dict[str, str]:
+        rows = db.query(NameSynonym.phrase, NameSynonym.replacement).filter(
+            NameSynonym.active == True
+        ).all()
+        return {row.phrase: row.replacement for row in rows}
+
+    @staticmethod
+    def _compile(table: Dict[str, str], cache_size: int):
+        if table:
+            pattern = re.compile('|'.join(
+                re.escape(phrase) for phrase in sorted(table, key=len, reverse=True)
+            ))
+        else:
+            pattern = None
+
+        def replace(match) -> str:
+            return table[match.group(0)]
+
+        @lru_cache(maxsize=cache_size)
+        def normalize(name: str) -> str:
+            normalized = name.lower().strip()
+            if pattern is not None:
+                normalized = pattern.sub(replace, normalized)
+            # Fast path: only letters, digits and spaces left, just collapse the spaces
+            if normalized.replace(' ', '').isalnum():
+                return ' '.join(normalized.split())
+            return _SEPARATORS.sub(' ', normalized).strip()
+
+        return normalize
+
+
+# Shared by every request handled in this process
+name_normalizer = NameNormalizer()
+
+
+def normalize_name(name: str) -> str:
+    """Normalize product names for better matching"""
+    return name_normalizer.normalize(name)
@@ -1,10 +1,65 @@
 import pandas as pd
+import io
+import logging
+import os
+from decouple import config
+from sqlalchemy import func, literal
 from sqlalchemy.orm import Session
-from models import PurchaseOrder, PurchaseOrderItem, ProductVariant
-from typing import Dict, List
+from models import Inventory, PurchaseOrder, PurchaseOrderItem, ProductVariant
+from models.fashion_extensions import Style
+from services.order_validation import rejection_report, validate_order_lines, VALIDATION_REPORT_LIMIT
+from services.po_bulk_loader import PurchaseOrderBulkLoader
+from services.variant_normalizer import variant_normalizer
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Union
 import uuid
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+# Files above this size are streamed in chunks instead of read whole
+CSV_STREAMING_THRESHOLD_MB = config('CSV_STREAMING_THRESHOLD_MB', default=100, cast=int)
+CSV_CHUNK_ROWS = config('CSV_CHUNK_ROWS', default=50000, cast=int)
+CSV_CHUNK_BYTES = config('CSV_CHUNK_BYTES', default=8 * 1024 * 1024, cast=int)
+
+
+def _source_size(source: Union[str, BinaryIO]) -> int:
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    position = source.tell()
+    size = source.seek(0, os.SEEK_END)
+    source.seek(position)
+    return size - position
+
+
+def read_csv_chunks(stream: BinaryIO, chunk_bytes: int = CSV_CHUNK_BYTES) -> Iterator["pl.DataFrame"]:
+    """
+    Parse a binary CSV stream (e.g. an upload) block by block. Blocks are cut
+    after a complete line outside quotes and every block is parsed with the
+    header and column types of the first one.
+    """
+    import polars as pl
+    
+    header = stream.readline()
+    schema = None
+    pending = b""
+    while True:
+        block = stream.read(chunk_bytes)
+        data = pending + block
+        if not block:
+            end = len(data)
+        else:
+            end = data.rfind(b"\n") + 1
+            # A newline inside a quoted field is not a line end ("" escapes keep quote parity)
+            while end and data.count(b'"', 0, end) % 2:
+                end = data.rfind(b"\n", 0, end - 1) + 1
+        if end:
+            frame = pl.read_csv(io.BytesIO(header + data[:end]), dtypes=schema)
+            schema = schema or frame.schema
+            yield frame
+        pending = data[end:]
+        if not block:
+            return
+
 class OrderProcessor:
     """
     Handles order processing from NuOrder/CSV imports
@@ -13,70 +68,143 @@ class OrderProcessor:
     def __init__(self, db: Session):
         self.db = db
     
-    async def process_nuorder_csv(self, csv_file_path: str) -> Dict:
+    async def process_nuorder_csv(
+        self,
+        source: Union[str, BinaryIO],
+        streaming: Optional[bool] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+        mode: str = "insert"
+    ) -> Dict:
         """
-        Process NuOrder CSV export
+        Process NuOrder CSV export from a file path or a binary file object (upload)
         Format: PO number, customer name, style, price, color, size, collection name
+        
+        streaming=None streams sources above CSV_STREAMING_THRESHOLD_MB. Streaming
+        reads and commits one chunk at a time, so memory stays flat whatever the
+        file size; progress(rows_done, orders_done) is called per chunk.
+        
+        mode="upsert" re-imports POs that already exist, writing only the line
+        differences, instead of failing on the duplicate po_number.
         """
+        if streaming is None:
+            try:
+                streaming = _source_size(source) > CSV_STREAMING_THRESHOLD_MB * 1024 * 1024
+            except OSError as e:
+                return {
+                    "success": False,
+                    "error": str(e)
+                }
+        if streaming:
+            return self._process_nuorder_csv_chunks(self._csv_chunks(source), progress, mode)
+        
         try:
             # Read CSV with polars
             import polars as pl
-            df = pl.read_csv(csv_file_path)
+            df = pl.read_csv(source)
             
-            # Group by PO number to create purchase orders
-            po_groups = df.group_by("po_number")
+            # Type checks, totals and rejected lines column-wise, before any DB work
+            valid, rejected = self._prepare_lines(df)
             
-            processed_orders = []
+            # One COPY/multi-row INSERT per table instead of an ORM flush per PO
+            loader = PurchaseOrderBulkLoader(self.db, platform="nuorder", mode=mode)
+            loader.keep(rejected)
+            processed_orders = loader.load(valid)
+            changes = loader.finish()
             
-            for po_number, po_data in po_groups:
-                # Create purchase order
-                po = PurchaseOrder(
-                    po_number=po_number,
-                    customer_name=po_data["customer_name"][0],
-                    platform="nuorder",
-                    collection_name=po_data["collection_name"][0],
-                    total_skus=len(po_data),
-                    total_units=po_data["quantity"].sum(),
-                    status="received",
-                    order_date=datetime.now()
-                )
-                
-                self.db.add(po)
-                self.db.flush()  # Get the ID
+            self.db.commit()
+            
+            return {
+                "success": True,
+                "message": f"Processed {len(processed_orders)} purchase orders",
+                "orders": processed_orders,
+                "changes": changes,
+                "rows_rejected": len(rejected),
+                "rejected": rejection_report(rejected)
+            }
+            
+        except Exception as e:
+            self.db.rollback()
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    @staticmethod
+    def _prepare_lines(df: "pl.DataFrame", first_line: int = 2):
+        valid, rejected = validate_order_lines(df, first_line=first_line)
+        # Canonical color/size ("Blk" -> "Black", "Med" -> "M"), once per distinct value,
+        # rejected lines too so upserts can match them to existing lines
+        return variant_normalizer.normalize_frame(valid), variant_normalizer.normalize_frame(rejected)
+    
+    @staticmethod
+    def _csv_chunks(source: Union[str, BinaryIO]) -> Iterator["pl.DataFrame"]:
+        if not isinstance(source, str):
+            yield from read_csv_chunks(source)
+            return
+        
+        import polars as pl
+        reader = pl.read_csv_batched(source, batch_size=CSV_CHUNK_ROWS, infer_schema_length=10000)
+        while True:
+            batches = reader.next_batches(1)
+            if not batches:
+                return
+            yield batches[0]
+    
+    def _process_nuorder_csv_chunks(
+        self,
+        chunks: Iterator["pl.DataFrame"],
+        progress: Optional[Callable[[int, int], None]] = None,
+        mode: str = "insert"
+    ) -> Dict:
+        """Commit per chunk. POs spanning chunks are continued, not duplicated"""
+        orders: Dict[str, Dict] = {}
+        rejected: List[Dict] = []
+        rows_done = 0
+        rows_rejected = 0
+        
+        try:
+            loader = PurchaseOrderBulkLoader(self.db, platform="nuorder", mode=mode)
+            for chunk in chunks:
+                valid, chunk_rejected = self._prepare_lines(chunk, first_line=rows_done + 2)
+                rows_rejected += len(chunk_rejected)
+                rejected.extend(rejection_report(chunk_rejected, VALIDATION_REPORT_LIMIT - len(rejected)))
+                loader.keep(chunk_rejected)
                 
-                # Create line items
-                for row in po_data.iter_rows(named=True):
-                    line_item = PurchaseOrderItem(
-                        po_id=po.id,
-                        style_name=row["style"],
-                        color=row["color"],
-                        size=row["size"],
-                        quantity=row["quantity"],
-                        unit_price=row["price"],
-                        total_price=row["quantity"] * row["price"]
-                    )
-                    self.db.add(line_item)
+                for summary in loader.load(valid):
+                    known = orders.get(summary["po_number"])
+                    if known:
+                        known["total_skus"] += summary["total_skus"]
+                        known["total_units"] += summary["total_units"]
+                    else:
+                        orders[summary["po_number"]] = summary
                 
-                processed_orders.append({
-                    "po_number": po_number,
-                    "customer": po.customer_name,
-                    "total_skus": po.total_skus,
-                    "total_units": po.total_units
-                })
+                self.db.commit()
+                rows_done += len(chunk)
+                logger.info("Imported %d rows (%d purchase orders)", rows_done, len(orders))
+                if progress:
+                    progress(rows_done, len(orders))
             
+            # Upsert deletes and totals need the whole file
+            changes = loader.finish()
             self.db.commit()
             
             return {
                 "success": True,
-                "message": f"Processed {len(processed_orders)} purchase orders",
-                "orders": processed_orders
+                "message": f"Processed {len(orders)} purchase orders",
+                "orders": list(orders.values()),
+                "changes": changes,
+                "rows_processed": rows_done,
+                "rows_rejected": rows_rejected,
+                "rejected": rejected
             }
             
         except Exception as e:
             self.db.rollback()
+            # Earlier chunks are committed, report how far the import got
             return {
                 "success": False,
-                "error": str(e)
+                "error": str(e),
+                "rows_processed": rows_done
             }
     
     async def sync_po_with_inventory(self, po_id: str) -> Dict:
@@ -89,20 +217,35 @@ class OrderProcessor:
         if not po:
             return {"success": False, "error": "Purchase order not found"}
         
+        # One grouped query for every line: variants are matched on the stored
+        # (canonical) color/size, inventory is summed per location
+        search = literal("%") + PurchaseOrderItem.style_name + literal("%")
+        stock = self.db.query(
+            PurchaseOrderItem.id,
+            Inventory.location,
+            func.sum(Inventory.quantity_available)
+        ).join(
+            Style, Style.style_name.ilike(search)
+        ).join(
+            ProductVariant,
+            (ProductVariant.style_id == Style.id)
+            & (ProductVariant.color == PurchaseOrderItem.color)
+            & (ProductVariant.size == PurchaseOrderItem.size)
+        ).join(
+            Inventory, Inventory.product_id == ProductVariant.product_id
+        ).filter(
+            PurchaseOrderItem.po_id == po.id
+        ).group_by(PurchaseOrderItem.id, Inventory.location).all()
+        
+        by_location: Dict = {}
+        for item_id, location, quantity in stock:
+            by_location.setdefault(item_id, {})[location] = int(quantity or 0)
+        
         availability_report = []
         
         for item in po.line_items:
-            # Find matching product variants
-            variants = self.db.query(ProductVariant).filter(
-                ProductVariant.style_name.ilike(f"%{item.style_name}%"),
-                ProductVariant.color == item.color,
-                ProductVariant.size == item.size
-            ).all()
-            
-            total_available = sum([
-                inv.quantity_available for variant in variants 
-                for inv in variant.product.inventory
-            ])
+            locations = by_location.get(item.id, {})
+            total_available = sum(locations.values())
             
             availability_report.append({
                 "style": item.style_name,
@@ -111,7 +254,8 @@ class OrderProcessor:
                 "requested": item.quantity,
                 "available": total_available,
                 "shortfall": max(0, item.quantity - total_available),
-                "status": "in_stock" if total_available >= item.quantity else "short"
+                "status": "in_stock" if total_available >= item.quantity else "short",
+                "available_by_location": locations
             })
         
         return {
@@ -0,0 +1,84 @@
+# services/order_validation.py
+from typing import Dict, List, NamedTuple
+
+import polars as pl
+
+REQUIRED_COLUMNS = ["po_number", "customer_name", "style", "price", "color", "size", "collection_name", "quantity"]
+
+# Rejected lines returned inline in an import response, the counts are always complete
+VALIDATION_REPORT_LIMIT = 1000
+
+
+class ValidationResult(NamedTuple):
+    valid: pl.DataFrame  # typed lines with total_price, ready for PurchaseOrderBulkLoader
+    rejected: pl.DataFrame  # line, po_number, style, color, size, errors
+
+
+def _blank(lines: pl.DataFrame, column: str) -> pl.Expr:
+    if lines.schema[column] != pl.Utf8:
+        return pl.col(column).is_null()
+    return pl.col(column).is_null() | (pl.col(column).str.strip() == "")
+
+
+def validate_order_lines(lines: pl.DataFrame, first_line: int = 2) -> ValidationResult:
+    """
+    Type-check and derive NuOrder import lines column-wise. Lines failing a
+    rule are split off with their reasons, so one bad line no longer rolls
+    back the whole import. first_line is the file line of the first row
+    (2 = right after the header) so the report points at the CSV.
+    """
+    missing = [column for column in REQUIRED_COLUMNS if column not in lines.columns]
+    if missing:
+        raise ValueError(f"CSV is missing required columns: {', '.join(missing)}")
+
+    quantity = pl.col("quantity").cast(pl.Float64, strict=False)
+    price = pl.col("price").cast(pl.Float64, strict=False)
+    # (rule, message), the first failing rule per column is reported
+    rules = [
+        [(_blank(lines, "po_number"), "missing po_number")],
+        [(_blank(lines, "style"), "missing style")],
+        [
+            (_blank(lines, "quantity"), "missing quantity"),
+            (quantity.is_null(), "quantity is not a number"),
+            (quantity != quantity.floor(), "quantity is not a whole number"),
+            (quantity <= 0, "quantity must be positive"),
+        ],
+        [
+            (_blank(lines, "price"), "missing price"),
+            (price.is_null(), "price is not a number"),
+            (price < 0, "price is negative"),
+        ],
+    ]
+
+    # Plain boolean columns decide validity, reasons are only built for rejected lines
+    failed = pl.any_horizontal([rule for column_rules in rules for rule, _ in column_rules])
+    checked = lines.with_row_count("line", offset=first_line).with_columns(failed.fill_null(True).alias("failed"))
+
+    valid = checked.filter(~pl.col("failed")).with_columns(
+        pl.col("po_number").cast(pl.Utf8),
+        quantity.cast(pl.Int64).alias("quantity"),
+        price.alias("price"),
+        (quantity * price).alias("total_price")
+    ).drop("line", "failed")
+
+    reasons = []
+    for column_rules in rules:
+        (rule, message), *rest = column_rules
+        reason = pl.when(rule).then(pl.lit(message))
+        for rule, message in rest:
+            reason = reason.when(rule).then(pl.lit(message))
+        reasons.append(reason)
+    rejected = checked.filter(pl.col("failed")).select(
+        pl.col("line"),
+        pl.col("po_number").cast(pl.Utf8),
+        pl.col("style").cast(pl.Utf8),
+        pl.col("color").cast(pl.Utf8),
+        pl.col("size").cast(pl.Utf8),
+        pl.concat_list(reasons).list.drop_nulls().list.join("; ").alias("errors")
+    )
+    return ValidationResult(valid, rejected)
+
+
+def rejection_report(rejected: pl.DataFrame, limit: int = VALIDATION_REPORT_LIMIT) -> List[Dict]:
+    """First rejected lines as dicts for an import response"""
+    return rejected.head(limit).to_dicts()
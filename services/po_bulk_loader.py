@@ -0,0 +1,391 @@
+# services/po_bulk_loader.py
+import io
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, Set, Tuple
+
+import polars as pl
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from models import PurchaseOrder, PurchaseOrderItem
+
+PO_COLUMNS = [
+    "id", "po_number", "customer_name", "platform", "collection_name",
+    "total_skus", "total_units", "status", "order_date"
+]
+
+INSERT, UPSERT = "insert", "upsert"
+
+# A PO line is identified by its PO, style, color and size. Repeated lines
+# with the same key are paired up in order of appearance.
+LINE_KEY = ["po_number", "_style", "_color", "_size"]
+LOOKUP_BATCH_SIZE = 5000
+PRICE_DECIMALS = 4
+
+
+def _uuid_column(name: str, length: int) -> pl.Series:
+    return pl.Series(name, [str(uuid.uuid4()) for _ in range(length)], dtype=pl.Utf8)
+
+
+class PurchaseOrderBulkLoader:
+    """
+    Writes NuOrder line frames to purchase_orders / purchase_order_items in
+    set-based statements instead of one ORM object (and flush) per row.
+    PO ids are generated client-side so line items never wait on the database.
+    Postgres gets COPY straight from the frame, other databases a multi-row INSERT.
+    
+    The loader remembers every PO it wrote, so a file can be loaded in chunks:
+    lines of a PO seen in an earlier chunk are appended to it and its totals
+    are updated, wherever the chunk boundaries fall.
+    
+    mode="upsert" re-imports POs that already exist instead of failing on the
+    unique po_number: their current lines are read in one query per batch of
+    PO numbers and only the differences are written (insert new lines, update
+    changed quantities/prices, delete lines no longer in the file). Deletes
+    and total recalculation happen in finish(), once every chunk was seen.
+    Lines that failed validation are still in the file: pass them to keep()
+    so the existing lines they stand for are not deleted.
+    """
+
+    def __init__(self, db: Session, platform: str = "nuorder", mode: str = INSERT):
+        if mode not in (INSERT, UPSERT):
+            raise ValueError(f"Unknown import mode {mode}")
+        self.db = db
+        self.platform = platform
+        self.mode = mode
+        self._order_ids: Dict[str, str] = {}  # po_number -> id of POs written or reconciled by this loader
+        self._existing_ids: Set[str] = set()  # ids of POs that existed before this import
+        self._changed_ids: Set[str] = set()  # existing POs whose lines or header changed
+        self._unmatched = self._existing_lines([])  # existing lines not (yet) matched by the file
+        self._kept = pl.DataFrame(schema={key: pl.Utf8 for key in LINE_KEY})  # keys of rejected lines
+        self._kept_orders: Set[str] = set()  # POs with a rejected line that has no style
+        self.stats = {
+            "orders_created": 0,
+            "orders_updated": 0,
+            "lines_inserted": 0,
+            "lines_updated": 0,
+            "lines_deleted": 0,
+            "lines_unchanged": 0
+        }
+
+    def build_frames(self, lines: pl.DataFrame) -> Tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+        """
+        Split import lines into (new purchase_orders, totals to add to POs
+        written earlier, purchase_order_items) frames
+        """
+        lines = lines.with_columns(pl.col("po_number").cast(pl.Utf8))
+        orders = lines.group_by("po_number", maintain_order=True).agg(
+            pl.col("customer_name").first(),
+            pl.col("collection_name").first(),
+            pl.count().alias("total_skus"),
+            pl.col("quantity").sum().alias("total_units")
+        )
+
+        is_known = pl.col("po_number").is_in(list(self._order_ids))
+        continued = orders.filter(is_known).with_columns(
+            pl.col("po_number").replace(self._order_ids).alias("id")
+        ).select("id", "po_number", "customer_name", "total_skus", "total_units")
+        new_orders = orders.filter(~is_known)
+        new_orders = new_orders.with_columns(
+            _uuid_column("id", len(new_orders)),
+            pl.lit(self.platform).alias("platform"),
+            pl.lit("received").alias("status"),
+            pl.lit(datetime.now()).alias("order_date")
+        ).select(PO_COLUMNS)
+        self._order_ids.update(zip(new_orders["po_number"].to_list(), new_orders["id"].to_list()))
+
+        po_numbers = orders["po_number"].to_list()
+        order_ids = pl.DataFrame(
+            {"po_number": po_numbers, "po_id": [self._order_ids[po_number] for po_number in po_numbers]},
+            schema={"po_number": pl.Utf8, "po_id": pl.Utf8}
+        )
+        items = lines.join(order_ids, on="po_number", how="left").select(
+            _uuid_column("id", len(lines)),
+            pl.col("po_id"),
+            pl.col("style").alias("style_name"),
+            pl.col("color"),
+            pl.col("size"),
+            pl.col("quantity"),
+            pl.col("price").cast(pl.Float64).alias("unit_price"),
+            # Derived by the validation stage when it ran, computed here otherwise
+            (pl.col("total_price") if "total_price" in lines.columns else pl.col("quantity") * pl.col("price"))
+            .cast(pl.Float64).alias("total_price")
+        )
+        return new_orders, continued, items
+
+    def load(self, lines: pl.DataFrame) -> List[Dict]:
+        """
+        Write one frame of import lines in the session's transaction (the
+        caller commits). Returns the per-PO summaries of this frame's lines.
+        """
+        lines = lines.with_columns(pl.col("po_number").cast(pl.Utf8))
+        summaries = lines.group_by("po_number", maintain_order=True).agg(
+            pl.col("customer_name").first(),
+            pl.count().alias("total_skus"),
+            pl.col("quantity").sum().alias("total_units")
+        )
+
+        if self.mode == UPSERT:
+            lines = self._reconcile(lines)
+
+        new_orders, continued, items = self.build_frames(lines)
+        self.write(new_orders, items)
+        # Totals of POs that existed before are recomputed in finish()
+        self._add_totals(continued.filter(~pl.col("id").is_in(list(self._existing_ids))))
+        self._changed_ids.update(continued.filter(pl.col("id").is_in(list(self._existing_ids)))["id"].to_list())
+        self.stats["orders_created"] += len(new_orders)
+        self.stats["lines_inserted"] += len(items)
+
+        return [
+            {
+                "po_number": row["po_number"],
+                "customer": row["customer_name"],
+                "total_skus": row["total_skus"],
+                "total_units": row["total_units"]
+            }
+            for row in summaries.iter_rows(named=True)
+        ]
+
+    def keep(self, rejected: pl.DataFrame):
+        """
+        Rejected import lines (po_number, style, color, size, normalized like
+        the valid ones) keep the existing lines with the same key out of the
+        upsert deletes. A rejected line without a style keeps its whole PO.
+        """
+        if self.mode != UPSERT or not len(rejected):
+            return
+        rejected = rejected.with_columns(
+            pl.col("po_number").cast(pl.Utf8),
+            pl.col("style").cast(pl.Utf8).fill_null("").alias("_style"),
+            pl.col("color").cast(pl.Utf8).fill_null("").alias("_color"),
+            pl.col("size").cast(pl.Utf8).fill_null("").alias("_size")
+        ).filter(pl.col("po_number").is_not_null() & (pl.col("po_number").str.strip() != ""))
+        no_style = pl.col("_style").str.strip() == ""
+        self._kept_orders.update(rejected.filter(no_style)["po_number"].to_list())
+        self._kept = pl.concat([self._kept, rejected.filter(~no_style).select(LINE_KEY)]).unique()
+
+    def finish(self) -> Dict:
+        """
+        Apply what needs the whole file (upsert deletes and totals), in the
+        session's transaction. Returns the change counts of the import.
+        """
+        if self.mode == UPSERT:
+            # Lines rejected by validation are not missing from the file
+            stale = self._unmatched.join(self._kept, on=LINE_KEY, how="anti").filter(
+                ~pl.col("po_number").is_in(list(self._kept_orders))
+            )
+            self._delete_items(stale["item_id"].to_list())
+            self._changed_ids.update(stale["po_id"].unique().to_list())
+            self.stats["lines_deleted"] += len(stale)
+            self._unmatched = self._existing_lines([])
+
+            self._recompute_totals(self._changed_ids)
+            self.stats["orders_updated"] = len(self._changed_ids)
+        return dict(self.stats)
+
+    def _reconcile(self, lines: pl.DataFrame) -> pl.DataFrame:
+        """Apply updates for lines matching existing ones, return the lines still to insert"""
+        unseen = [po_number for po_number in lines["po_number"].unique().to_list() if po_number not in self._order_ids]
+        if unseen:
+            self._load_existing(lines, unseen)
+        if not len(self._unmatched):
+            return lines
+
+        keyed = self._with_line_key(lines, "style", "quantity", "price").with_row_count("_row")
+
+        # Pass 1: identical lines are unchanged, whatever their order in the PO
+        same = self._pair(keyed, self._unmatched, LINE_KEY + ["_quantity", "_price"])
+        keyed = keyed.join(same.select("_row"), on="_row", how="anti")
+        self._unmatched = self._unmatched.join(same.select("item_id"), on="item_id", how="anti")
+        self.stats["lines_unchanged"] += len(same)
+
+        # Pass 2: remaining lines with the same key changed quantity or price
+        changed = self._pair(keyed, self._unmatched, LINE_KEY)
+        keyed = keyed.join(changed.select("_row"), on="_row", how="anti")
+        self._unmatched = self._unmatched.join(changed.select("item_id"), on="item_id", how="anti")
+        self._update_items(changed)
+        self._changed_ids.update(changed["po_id"].unique().to_list())
+        self.stats["lines_updated"] += len(changed)
+
+        # Whatever is left is new
+        return keyed.drop("_row", *LINE_KEY[1:], "_quantity", "_price")
+
+    @staticmethod
+    def _pair(incoming: pl.DataFrame, existing: pl.DataFrame, key: List[str]) -> pl.DataFrame:
+        """Match incoming to existing lines on key, the n-th repeat with the n-th repeat"""
+        occurrence = pl.int_range(0, pl.count(), dtype=pl.Int64).over(key).alias("_occurrence")
+        return incoming.select("_row", *key).with_columns(occurrence).join(
+            existing.select("item_id", "po_id", *key).with_columns(occurrence),
+            on=key + ["_occurrence"],
+            how="inner"
+        ).join(incoming.select("_row", "quantity", "price"), on="_row")
+
+    def _load_existing(self, lines: pl.DataFrame, po_numbers: List[str]):
+        """Read existing POs and their lines for po_numbers, one query per batch"""
+        rows = []
+        for start in range(0, len(po_numbers), LOOKUP_BATCH_SIZE):
+            batch = po_numbers[start:start + LOOKUP_BATCH_SIZE]
+            rows.extend(
+                self.db.query(
+                    PurchaseOrder.id,
+                    PurchaseOrder.po_number,
+                    PurchaseOrder.customer_name,
+                    PurchaseOrder.collection_name,
+                    PurchaseOrderItem.id,
+                    PurchaseOrderItem.style_name,
+                    PurchaseOrderItem.color,
+                    PurchaseOrderItem.size,
+                    PurchaseOrderItem.quantity,
+                    PurchaseOrderItem.unit_price
+                ).outerjoin(PurchaseOrderItem, PurchaseOrderItem.po_id == PurchaseOrder.id)
+                .filter(PurchaseOrder.po_number.in_(batch))
+                .all()
+            )
+        if not rows:
+            return
+
+        headers = {}
+        for order_id, po_number, customer_name, collection_name, *_ in rows:
+            headers[po_number] = (str(order_id), customer_name, collection_name)
+        for po_number, (order_id, _, _) in headers.items():
+            self._order_ids[po_number] = order_id
+            self._existing_ids.add(order_id)
+        self._update_headers(lines, headers)
+
+        existing = self._existing_lines([
+            (str(order_id), po_number, str(item_id), style, color, size, quantity, unit_price)
+            for order_id, po_number, _, _, item_id, style, color, size, quantity, unit_price in rows
+            if item_id is not None
+        ])
+        self._unmatched = pl.concat([self._unmatched, existing])
+
+    def _update_headers(self, lines: pl.DataFrame, headers: Dict[str, Tuple]):
+        incoming = lines.filter(pl.col("po_number").is_in(list(headers))).group_by("po_number").agg(
+            pl.col("customer_name").first(),
+            pl.col("collection_name").first()
+        )
+        changed = [
+            {"order_id": uuid.UUID(headers[row["po_number"]][0]), "customer": row["customer_name"], "collection": row["collection_name"]}
+            for row in incoming.iter_rows(named=True)
+            if (row["customer_name"], row["collection_name"]) != headers[row["po_number"]][1:]
+        ]
+        if not changed:
+            return
+        table = PurchaseOrder.__table__
+        statement = update(table).where(table.c.id == bindparam("order_id")).values(
+            customer_name=bindparam("customer"),
+            collection_name=bindparam("collection")
+        )
+        self.db.connection().execute(statement, changed)
+        self._changed_ids.update(str(row["order_id"]) for row in changed)
+
+    def _update_items(self, changed: pl.DataFrame):
+        if not len(changed):
+            return
+        table = PurchaseOrderItem.__table__
+        statement = update(table).where(table.c.id == bindparam("item_id")).values(
+            quantity=bindparam("new_quantity"),
+            unit_price=bindparam("new_unit_price"),
+            total_price=bindparam("new_total_price")
+        )
+        self.db.connection().execute(statement, [
+            {
+                "item_id": uuid.UUID(row["item_id"]),
+                "new_quantity": row["quantity"],
+                "new_unit_price": row["price"],
+                "new_total_price": row["quantity"] * row["price"]
+            }
+            for row in changed.iter_rows(named=True)
+        ])
+
+    def _delete_items(self, item_ids: List[str]):
+        table = PurchaseOrderItem.__table__
+        for start in range(0, len(item_ids), LOOKUP_BATCH_SIZE):
+            batch = [uuid.UUID(item_id) for item_id in item_ids[start:start + LOOKUP_BATCH_SIZE]]
+            self.db.connection().execute(delete(table).where(table.c.id.in_(batch)))
+
+    def _recompute_totals(self, order_ids: Iterable[str]):
+        orders, items = PurchaseOrder.__table__, PurchaseOrderItem.__table__
+        order_ids = [uuid.UUID(order_id) for order_id in order_ids]
+        for start in range(0, len(order_ids), LOOKUP_BATCH_SIZE):
+            statement = update(orders).where(orders.c.id.in_(order_ids[start:start + LOOKUP_BATCH_SIZE])).values(
+                total_skus=select(func.count(items.c.id)).where(items.c.po_id == orders.c.id).scalar_subquery(),
+                total_units=select(func.coalesce(func.sum(items.c.quantity), 0)).where(items.c.po_id == orders.c.id).scalar_subquery()
+            )
+            self.db.connection().execute(statement)
+
+    @classmethod
+    def _existing_lines(cls, rows: List[Tuple]) -> pl.DataFrame:
+        """(po_id, po_number, item_id, style, color, size, quantity, unit_price) rows keyed for matching"""
+        lines = pl.DataFrame(rows, schema={
+            "po_id": pl.Utf8,
+            "po_number": pl.Utf8,
+            "item_id": pl.Utf8,
+            "style_name": pl.Utf8,
+            "color": pl.Utf8,
+            "size": pl.Utf8,
+            "quantity": pl.Int64,
+            "unit_price": pl.Float64
+        }, orient="row")
+        return cls._with_line_key(lines, "style_name", "quantity", "unit_price").select(
+            "po_id", "item_id", *LINE_KEY, "_quantity", "_price"
+        )
+
+    @staticmethod
+    def _with_line_key(lines: pl.DataFrame, style: str, quantity: str, price: str) -> pl.DataFrame:
+        return lines.with_columns(
+            pl.col(style).cast(pl.Utf8).fill_null("").alias("_style"),
+            pl.col("color").cast(pl.Utf8).fill_null("").alias("_color"),
+            pl.col("size").cast(pl.Utf8).fill_null("").alias("_size"),
+            pl.col(quantity).cast(pl.Int64).alias("_quantity"),
+            pl.col(price).cast(pl.Float64).round(PRICE_DECIMALS).alias("_price")
+        )
+
+    def write(self, orders: pl.DataFrame, items: pl.DataFrame):
+        # Orders first, items reference them by foreign key
+        if self.db.get_bind().dialect.name == "postgresql":
+            self._copy(PurchaseOrder.__tablename__, orders)
+            self._copy(PurchaseOrderItem.__tablename__, items)
+        else:
+            self._insert(PurchaseOrder, orders)
+            self._insert(PurchaseOrderItem, items)
+
+    def _add_totals(self, continued: pl.DataFrame):
+        if not len(continued):
+            return
+        table = PurchaseOrder.__table__
+        statement = update(table).where(table.c.id == bindparam("order_id")).values(
+            total_skus=table.c.total_skus + bindparam("add_skus"),
+            total_units=table.c.total_units + bindparam("add_units")
+        )
+        self.db.connection().execute(statement, [
+            {"order_id": uuid.UUID(row["id"]), "add_skus": row["total_skus"], "add_units": row["total_units"]}
+            for row in continued.iter_rows(named=True)
+        ])
+
+    def _copy(self, table: str, frame: pl.DataFrame):
+        if not len(frame):
+            return
+        buffer = io.BytesIO()
+        frame.write_csv(buffer, include_header=False)
+        buffer.seek(0)
+        # Same connection (and transaction) as the session
+        cursor = self.db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {table} ({', '.join(frame.columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+        finally:
+            cursor.close()
+
+    def _insert(self, model, frame: pl.DataFrame):
+        if not len(frame):
+            return
+        rows = frame.to_dicts()
+        for row in rows:
+            for column in ("id", "po_id"):
+                if column in row:
+                    row[column] = uuid.UUID(row[column])
+        # executemany, batched into multi-row INSERTs by SQLAlchemy
+        self.db.execute(insert(model.__table__), rows)
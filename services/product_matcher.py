@@ -1,13 +1,30 @@
 import asyncio
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Set
 from difflib import SequenceMatcher
 from sqlalchemy.orm import Session
 from rapidfuzz import fuzz, process
 import re
 from datetime import datetime
+from decouple import config
 
 # Import the models
 from models.product import Product, ProductMapping
+from services.catalog_index import CatalogMatch, catalog_index
+from services.mapping_resolver import ResolvedMapping, mapping_resolver
+from services.mapping_writer import mapping_writer
+from services.name_normalizer import name_normalizer, normalize_name
+from services.worker_pool import BoundedPool
+
+MATCH_POOL_WORKERS = config('MATCH_POOL_WORKERS', default=4, cast=int)
+MATCH_POOL_MAX_QUEUE = config('MATCH_POOL_MAX_QUEUE', default=64, cast=int)
+BATCH_MATCH_POOL_WORKERS = config('BATCH_MATCH_POOL_WORKERS', default=1, cast=int)
+BATCH_MATCH_POOL_MAX_QUEUE = config('BATCH_MATCH_POOL_MAX_QUEUE', default=4, cast=int)
+
+# Matching is CPU-bound (rapidfuzz) plus blocking SQLAlchemy calls, so it runs
+# on these pools instead of the event loop. Batches use cdist(workers=-1) and
+# get their own pool so one large import cannot starve single lookups.
+matching_pool = BoundedPool("matching", MATCH_POOL_WORKERS, MATCH_POOL_MAX_QUEUE)
+batch_matching_pool = BoundedPool("batch_matching", BATCH_MATCH_POOL_WORKERS, BATCH_MATCH_POOL_MAX_QUEUE)
 
 class ProductMatcher:
     def __init__(self, db: Session):
@@ -20,6 +37,20 @@ class ProductMatcher:
         sku: Optional[str] = None,
         platform: str = "unknown",
         external_id: Optional[str] = None
+    ) -> Dict:
+        """Run match() on the matching pool so scoring never blocks the event loop"""
+        return await matching_pool.run(self.match, name, sku, platform, external_id)
+    
+    async def find_best_matches(self, items: List[Dict]) -> List[Dict]:
+        """Run match_many() on the batch matching pool"""
+        return await batch_matching_pool.run(self.match_many, items)
+    
+    def match(
+        self, 
+        name: str, 
+        sku: Optional[str] = None,
+        platform: str = "unknown",
+        external_id: Optional[str] = None
     ) -> Dict:
         """
         Advanced product matching using multiple strategies:
@@ -35,57 +66,132 @@ class ProductMatcher:
                 Product.sku == sku
             ).first()
             if exact_match:
-                await self._save_mapping(exact_match.id, name, sku, platform, external_id)
-                return {
-                    "product_id": exact_match.id,
-                    "confidence": 1.0,
-                    "match_type": "sku_exact",
-                    "matched_name": exact_match.master_name
-                }
-        
-        # Strategy 2: Check existing mappings
-        existing_mapping = self.db.query(ProductMapping).filter(
-            ProductMapping.platform == platform,
-            ProductMapping.external_id == external_id
-        ).first()
+                self._save_mapping(exact_match.id, name, sku, platform, external_id, exact_match.master_name)
+                return self._sku_result(exact_match)
+        
+        # Strategy 2: Check existing mappings (cached, product joined in the same query)
+        existing_mapping = mapping_resolver.resolve(self.db, platform, external_id)
         if existing_mapping:
-            return {
-                "product_id": existing_mapping.product_id,
-                "confidence": 0.95,
-                "match_type": "mapping_exists",
-                "matched_name": existing_mapping.product.master_name
-            }
+            return self._mapping_result(existing_mapping.id, existing_mapping.master_name)
         
-        # Strategy 3: Fuzzy name matching
+        # Strategy 3: Fuzzy name matching against the in-memory catalog index
+        self._prepare_catalog()
         normalized_name = self._normalize_name(name)
-        all_products = self.db.query(Product).filter(Product.active == True).all()
         
-        best_match = None
-        best_score = 0
+        best_match = catalog_index.best_match(normalized_name)
         
-        for product in all_products:
-            normalized_product_name = self._normalize_name(product.master_name)
+        result = self._fuzzy_result(best_match)
+        
+        # Auto-approve high confidence matches
+        if result["match_type"] == "fuzzy_auto":
+            self._save_mapping(best_match.id, name, sku, platform, external_id, best_match.master_name)
+        
+        # Queue for manual review
+        elif result["match_type"] == "manual_review_required":
+            self._queue_for_review(name, sku, platform, external_id, best_match, result["confidence"])
+        
+        # No good match found - create new product
+        else:
+            self._queue_for_new_product(name, sku, platform, external_id)
+        
+        return result
+    
+    def match_many(self, items: List[Dict]) -> List[Dict]:
+        """
+        Batch version of match for platform imports.
+        Runs the same strategies in the same order for every item, but resolves
+        SKUs and existing mappings with set-based queries, scores all remaining
+        names in one matrix across all cores and buffers the new mappings for
+        one bulk upsert.
+        """
+        skus = {item["sku"] for item in items if item.get("sku")}
+        products_by_sku = self._products_by_sku(skus)
+        known_mappings = mapping_resolver.resolve_many(
+            self.db, [(item["platform"], item.get("external_id")) for item in items]
+        )
+        
+        # Score every name that could reach strategy 3 in one pass
+        self._prepare_catalog()
+        fuzzy_names = {
+            self._normalize_name(item["name"]) for item in items
+            if item.get("sku") not in products_by_sku
+            and (item["platform"], item.get("external_id")) not in known_mappings
+        }
+        best_matches = catalog_index.best_matches(list(fuzzy_names), workers=-1)
+        
+        results = []
+        for item in items:
+            name, sku = item["name"], item.get("sku")
+            platform, external_id = item["platform"], item.get("external_id")
+            key = (platform, external_id)
+            
+            # Strategy 1: Exact SKU match
+            exact_match = products_by_sku.get(sku) if sku else None
+            if exact_match:
+                self._save_mapping(exact_match.id, name, sku, platform, external_id, exact_match.master_name)
+                known_mappings[key] = exact_match
+                results.append(self._sku_result(exact_match))
+                continue
+            
+            # Strategy 2: Existing mappings, including ones written earlier in this batch
+            existing_mapping = known_mappings.get(key)
+            if existing_mapping:
+                results.append(self._mapping_result(existing_mapping.id, existing_mapping.master_name))
+                continue
             
-            # Use multiple fuzzy matching algorithms
-            scores = [
-                fuzz.ratio(normalized_name, normalized_product_name),
-                fuzz.partial_ratio(normalized_name, normalized_product_name),
-                fuzz.token_sort_ratio(normalized_name, normalized_product_name),
-                fuzz.token_set_ratio(normalized_name, normalized_product_name)
-            ]
+            # Strategy 3: Fuzzy name matching
+            best_match = best_matches[self._normalize_name(name)]
+            result = self._fuzzy_result(best_match)
             
-            # Weighted average (token_set_ratio gets higher weight)
-            combined_score = (scores[0] + scores[1] + scores[2] + scores[3] * 2) / 5
+            if result["match_type"] == "fuzzy_auto":
+                self._save_mapping(best_match.id, name, sku, platform, external_id, best_match.master_name)
+                known_mappings[key] = best_match
+            elif result["match_type"] == "manual_review_required":
+                self._queue_for_review(name, sku, platform, external_id, best_match, result["confidence"])
+            else:
+                self._queue_for_new_product(name, sku, platform, external_id)
             
-            if combined_score > best_score:
-                best_score = combined_score
-                best_match = product
+            results.append(result)
         
+        return results
+    
+    def _prepare_catalog(self):
+        """Pick up synonym edits, then make sure the catalog index matches them"""
+        name_normalizer.refresh(self.db)
+        catalog_index.ensure_loaded(self.db)
+    
+    def _products_by_sku(self, skus: Set[str]) -> Dict:
+        """Exact SKU lookup for a set of SKUs in one query"""
+        if not skus:
+            return {}
+        
+        rows = self.db.query(Product.id, Product.sku, Product.master_name).filter(
+            Product.sku.in_(skus)
+        ).all()
+        return {row.sku: row for row in rows}
+    
+    def _sku_result(self, product) -> Dict:
+        return {
+            "product_id": product.id,
+            "confidence": 1.0,
+            "match_type": "sku_exact",
+            "matched_name": product.master_name
+        }
+    
+    def _mapping_result(self, product_id, master_name: str) -> Dict:
+        return {
+            "product_id": product_id,
+            "confidence": 0.95,
+            "match_type": "mapping_exists",
+            "matched_name": master_name
+        }
+    
+    def _fuzzy_result(self, best_match: Optional[CatalogMatch]) -> Dict:
+        """Turn the best catalog match into an auto, review or new-product result"""
+        best_score = best_match.score if best_match else 0
         confidence = best_score / 100.0
         
-        # Auto-approve high confidence matches
         if confidence >= self.confidence_threshold and best_match:
-            await self._save_mapping(best_match.id, name, sku, platform, external_id)
             return {
                 "product_id": best_match.id,
                 "confidence": confidence,
@@ -93,9 +199,7 @@ class ProductMatcher:
                 "matched_name": best_match.master_name
             }
         
-        # Queue for manual review
         elif confidence >= 0.5 and best_match:
-            await self._queue_for_review(name, sku, platform, external_id, best_match, confidence)
             return {
                 "product_id": None,
                 "confidence": confidence,
@@ -104,9 +208,7 @@ class ProductMatcher:
                 "suggested_id": best_match.id
             }
         
-        # No good match found - create new product
         else:
-            await self._queue_for_new_product(name, sku, platform, external_id)
             return {
                 "product_id": None,
                 "confidence": 0.0,
@@ -116,46 +218,33 @@ class ProductMatcher:
     
     def _normalize_name(self, name: str) -> str:
         """Normalize product names for better matching"""
-        # Convert to lowercase
-        normalized = name.lower().strip()
-        
-        # Remove common variations
-        replacements = {
-            'knightsbridge': 'knights bridge',
-            'nice bridge': 'knights bridge',
-            '&': 'and',
-            '+': 'and',
-            '-': ' ',
-            '_': ' ',
-        }
-        
-        for old, new in replacements.items():
-            normalized = normalized.replace(old, new)
-        
-        # Remove extra spaces and special characters
-        normalized = re.sub(r'[^\w\s]', ' ', normalized)
-        normalized = re.sub(r'\s+', ' ', normalized)
+        return normalize_name(name)
+    
+    def _save_mapping(self, product_id: str, name: str, sku: str, platform: str, external_id: str, matched_name: Optional[str] = None):
+        """Save successful product mapping (write-behind, see MappingWriter)"""
+        mapping_writer.add(self._mapping_row(product_id, name, platform, external_id))
         
-        return normalized.strip()
+        # Make the buffered mapping visible to strategy 2 before it is flushed
+        if matched_name is not None:
+            mapping_resolver.prime(platform, external_id, ResolvedMapping(product_id, matched_name))
+        else:
+            mapping_resolver.invalidate(platform, external_id)
     
-    async def _save_mapping(self, product_id: str, name: str, sku: str, platform: str, external_id: str):
-        """Save successful product mapping"""
-        mapping = ProductMapping(
-            product_id=product_id,
-            platform=platform,
-            external_id=external_id,
-            external_name=name,
-            last_synced=datetime.now()
-        )
-        self.db.add(mapping)
-        self.db.commit()
+    def _mapping_row(self, product_id, name: str, platform: str, external_id: Optional[str]) -> Dict:
+        return {
+            "product_id": product_id,
+            "platform": platform,
+            "external_id": external_id,
+            "external_name": name,
+            "last_synced": datetime.now()
+        }
     
-    async def _queue_for_review(self, name: str, sku: str, platform: str, external_id: str, suggested_match, confidence: float):
+    def _queue_for_review(self, name: str, sku: str, platform: str, external_id: str, suggested_match, confidence: float):
         """Queue uncertain matches for manual review"""
         # This would integrate with your notification system
         pass
     
-    async def _queue_for_new_product(self, name: str, sku: str, platform: str, external_id: str):
+    def _queue_for_new_product(self, name: str, sku: str, platform: str, external_id: str):
         """Queue for new product creation"""
         # This would create a pending product entry
         pass
\ No newline at end of file
@@ -0,0 +1,281 @@
+# services/production_needs.py
+"""
+production_needs read model: per-product pending demand, stock, incoming
+production and what to produce, so /production/calculate reads a small
+indexed table instead of aggregating orders/inventory history per request.
+
+Rows are kept current per product in the transaction that changes them:
+a session hook notes the products touched by Order/OrderItem/Inventory/
+ProductionOrder writes and recomputes just those rows before the commit.
+The refresh locks the product rows first (FOR NO KEY UPDATE), so concurrent
+transactions touching one product recompute it one after the other, each
+seeing the other's committed changes. The key-share form matters: inserting
+an order item, inventory or production order takes FOR KEY SHARE on its
+product for the foreign key check, which FOR UPDATE would conflict with,
+deadlocking two transactions that both add rows for one product.
+Core statements and bulk query().update()/delete() bypass the hook, code
+using them calls mark_changed() (reservations do).
+
+Safety stock comes from the demand forecast (services.demand_forecast),
+which moves with time, and writers outside this process are not seen, so
+reconcile with a full rebuild (e.g. nightly):
+
+    python -m services.production_needs rebuild
+"""
+import argparse
+import itertools
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+from decouple import config
+from sqlalchemy import case, delete, event, func, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import Inventory, Order, OrderItem, Product, ProductionNeed, ProductionOrder
+from services.demand_forecast import demand_forecaster
+
+SAFETY_STOCK_PERCENTAGE = config('SAFETY_STOCK_PERCENTAGE', default=0.1, cast=float)  # of monthly average sales
+SALES_WINDOW_DAYS = 90
+PENDING_STATUSES = ['pending', 'processing', 'confirmed']
+URGENT_STATUSES = ['pending', 'processing']  # required dates that drive priority
+INCOMING_STATUSES = ['planned', 'sent_to_factory', 'in_production']
+
+REFRESH_BATCH_SIZE = 1000
+
+_CHANGED = "production_needs_changed"
+
+
+def aggregate_needs(
+    db: Session,
+    product_ids: Optional[List] = None,
+    monthly_demand: Optional[Dict[str, float]] = None
+) -> List[Dict]:
+    """
+    production_needs rows computed from the source tables in one CTE query,
+    for every product with pending orders or only for product_ids.
+    monthly_demand (product_id -> forecast units per month) drives safety
+    stock, products missing from it fall back to the last 90 days / 3.
+    """
+    monthly_demand = monthly_demand or {}
+    three_months_ago = datetime.now() - timedelta(days=SALES_WINDOW_DAYS)
+
+    # Pending order quantities, the earliest required date driving priority
+    # and completed sales of the sales window for safety stock
+    pending = db.query(
+        OrderItem.product_id.label('product_id'),
+        func.sum(case((Order.status.in_(PENDING_STATUSES), OrderItem.quantity))).label('total_needed'),
+        func.min(case((Order.status.in_(URGENT_STATUSES), Order.required_date))).label('earliest_required'),
+        func.sum(
+            case(((Order.status == 'completed') & (Order.order_date >= three_months_ago), OrderItem.quantity))
+        ).label('recently_sold')
+    ).join(
+        Order, OrderItem.order_id == Order.id
+    ).filter(
+        Order.status.in_(PENDING_STATUSES + ['completed'])
+    )
+    # Current inventory across all locations
+    stock = db.query(
+        Inventory.product_id.label('product_id'),
+        func.sum(Inventory.quantity_available).label('inventory_total')
+    )
+    # Incoming production
+    incoming = db.query(
+        ProductionOrder.product_id.label('product_id'),
+        func.sum(ProductionOrder.quantity_to_produce).label('incoming_production')
+    ).filter(
+        ProductionOrder.status.in_(INCOMING_STATUSES)
+    )
+
+    if product_ids is not None:
+        pending = pending.filter(OrderItem.product_id.in_(product_ids))
+        stock = stock.filter(Inventory.product_id.in_(product_ids))
+        incoming = incoming.filter(ProductionOrder.product_id.in_(product_ids))
+    pending = pending.group_by(OrderItem.product_id).cte('pending')
+    stock = stock.group_by(Inventory.product_id).cte('stock')
+    incoming = incoming.group_by(ProductionOrder.product_id).cte('incoming')
+
+    rows = db.query(
+        pending.c.product_id,
+        pending.c.total_needed,
+        pending.c.earliest_required,
+        func.coalesce(pending.c.recently_sold, 0).label('recently_sold'),
+        func.coalesce(stock.c.inventory_total, 0).label('inventory_total'),
+        func.coalesce(incoming.c.incoming_production, 0).label('incoming_production')
+    ).outerjoin(
+        stock, stock.c.product_id == pending.c.product_id
+    ).outerjoin(
+        incoming, incoming.c.product_id == pending.c.product_id
+    ).filter(
+        pending.c.total_needed.isnot(None)
+    ).all()
+
+    needs = []
+    for row in rows:
+        # Safety stock: a share of forecast monthly demand, stored NULL without a forecast
+        forecast_monthly = monthly_demand.get(str(row.product_id))
+        monthly_sales = forecast_monthly if forecast_monthly is not None else row.recently_sold / 3
+        safety_stock = int(max(0.0, monthly_sales) * SAFETY_STOCK_PERCENTAGE)
+        total_needed = row.total_needed + safety_stock
+        total_available = row.inventory_total + row.incoming_production
+        needs.append({
+            'product_id': row.product_id,
+            'orders_pending': row.total_needed,
+            'earliest_required': row.earliest_required,
+            'recently_sold': row.recently_sold,
+            'forecast_monthly': forecast_monthly,
+            'current_stock': row.inventory_total,
+            'incoming_production': row.incoming_production,
+            'safety_stock_needed': safety_stock,
+            'total_needed': total_needed,
+            'total_available': total_available,
+            'to_produce': max(0, total_needed - total_available),
+            'updated_at': datetime.now()
+        })
+    return needs
+
+
+class ProductionNeedsStore:
+    """Reads and maintains production_needs, in the session's transaction (the caller commits)"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def refresh(self, product_ids: Iterable) -> int:
+        """Recompute the rows of these products, products without pending orders lose theirs"""
+        # Sorted, so concurrent refreshes lock in the same order and cannot deadlock
+        product_ids = sorted(set(product_ids), key=str)
+        written = 0
+        for start in range(0, len(product_ids), REFRESH_BATCH_SIZE):
+            batch = product_ids[start:start + REFRESH_BATCH_SIZE]
+            # Held until commit: a concurrent refresh of these products waits, then aggregates our changes.
+            # NO KEY UPDATE, not UPDATE: FK checks of concurrent child inserts must not block on it
+            self.db.execute(
+                select(Product.id).where(Product.id.in_(batch)).order_by(Product.id).with_for_update(key_share=True)
+            ).all()
+            needs = aggregate_needs(self.db, batch, self._monthly_demand(batch))
+            kept = [need['product_id'] for need in needs]
+            self.db.execute(delete(ProductionNeed).where(
+                ProductionNeed.product_id.in_(batch), ProductionNeed.product_id.notin_(kept)
+            ))
+            self._upsert(needs)
+            written += len(needs)
+        return written
+
+    def rebuild(self) -> int:
+        """Replace every row from the source tables, with today's demand forecast"""
+        needs = aggregate_needs(self.db, monthly_demand=demand_forecaster.monthly_demand(self.db))
+        self.db.execute(delete(ProductionNeed))
+        # A refresh committed meanwhile may have written some rows again
+        self._upsert(needs)
+        return len(needs)
+
+    def _monthly_demand(self, product_ids: List) -> Dict[str, float]:
+        """
+        The process's cached forecast (computing one here would stall the
+        commit). A process that has none (CLI, workers, a failed warm-up)
+        keeps the forecast stored on the rows by the last rebuild.
+        """
+        if demand_forecaster.ready:
+            return demand_forecaster.monthly_demand()
+        return {
+            str(product_id): forecast for product_id, forecast in self.db.execute(
+                select(ProductionNeed.product_id, ProductionNeed.forecast_monthly).where(
+                    ProductionNeed.product_id.in_(product_ids), ProductionNeed.forecast_monthly.isnot(None)
+                )
+            )
+        }
+
+    def _upsert(self, needs: List[Dict]):
+        if not needs:
+            return
+        dialect = sqlite if self.db.get_bind().dialect.name == "sqlite" else postgresql
+        statement = dialect.insert(ProductionNeed)
+        statement = statement.on_conflict_do_update(
+            index_elements=[ProductionNeed.product_id],
+            set_={column: statement.excluded[column] for column in needs[0] if column != 'product_id'}
+        )
+        self.db.execute(statement, needs)
+
+    def read(self) -> List:
+        """Products with something to produce, most urgent required date first"""
+        return self.db.query(
+            ProductionNeed, Product.master_name, Product.sku
+        ).join(
+            Product, Product.id == ProductionNeed.product_id
+        ).filter(
+            ProductionNeed.to_produce > 0
+        ).order_by(
+            ProductionNeed.earliest_required.asc().nullslast()
+        ).all()
+
+
+def _changes(session: Session) -> Dict[str, Set]:
+    return session.info.setdefault(_CHANGED, {"products": set(), "orders": set()})
+
+
+def mark_changed(db: Session, product_ids: Iterable):
+    """Have the session refresh these products' rows when it commits (for Core writes)"""
+    _changes(db)["products"].update(product_ids)
+
+
+def _collect_changes(session: Session, flush_context):
+    for instance in itertools.chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, Order):
+            _changes(session)["orders"].add(instance.id)
+        elif isinstance(instance, (OrderItem, Inventory, ProductionOrder)):
+            # A row moved to another product changes both
+            history = inspect(instance).attrs.product_id.history
+            _changes(session)["products"].update(
+                product_id for product_id in itertools.chain(history.added, history.unchanged, history.deleted)
+                if product_id is not None
+            )
+
+
+def _refresh_changes(session: Session):
+    # Pending objects are flushed after before_commit, collect them first
+    session.flush()
+    changed = session.info.pop(_CHANGED, None)
+    if not changed:
+        return
+    products: Set = set(changed["products"])
+    if changed["orders"]:
+        order_ids = list(changed["orders"])
+        products.update(session.execute(
+            select(OrderItem.product_id).where(OrderItem.order_id.in_(order_ids)).distinct()
+        ).scalars())
+    if products:
+        ProductionNeedsStore(session).refresh(products)
+
+
+def _discard_changes(session: Session, previous_transaction=None):
+    session.info.pop(_CHANGED, None)
+
+
+def track_changes(session_factory):
+    """Keep production_needs current for sessions made by session_factory (a sessionmaker or Session class)"""
+    event.listen(session_factory, "after_flush", _collect_changes)
+    event.listen(session_factory, "before_commit", _refresh_changes)
+    event.listen(session_factory, "after_rollback", _discard_changes)
+
+
+def main():
+    from database.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Maintain the production_needs read model")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        rows = ProductionNeedsStore(db).rebuild()
+        db.commit()
+        print(f"Rebuilt production_needs: {rows} products in {time.perf_counter() - started:.2f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
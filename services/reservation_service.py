@@ -0,0 +1,186 @@
+# services/reservation_service.py
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from decouple import config
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from models import Inventory, InventoryReservation
+from services.production_needs import mark_changed
+
+# Held reservations not committed within this time are released by release_expired(), 0 = never
+RESERVATION_TTL_MINUTES = config('RESERVATION_TTL_MINUTES', default=30, cast=int)
+
+HELD, COMMITTED, RELEASED = "held", "committed", "released"
+
+
+class ReservationRequest(NamedTuple):
+    product_id: str
+    location: str
+    quantity: int
+    reference: Optional[str] = None
+
+
+class ReservationService:
+    """
+    Holds stock for orders without overselling under concurrent writers.
+
+    A reservation moves units from quantity_available to quantity_reserved
+    with one conditional UPDATE (... WHERE quantity_available >= :quantity):
+    the database checks and decrements in the same statement under the row
+    lock, so there is no read-then-write window and no version column.
+    commit() ships held units (they leave quantity_reserved), release() puts
+    them back. Each call is one transaction however many reservations it holds.
+    """
+
+    def __init__(self, db: Session, ttl_minutes: int = RESERVATION_TTL_MINUTES):
+        self.db = db
+        self.ttl_minutes = ttl_minutes
+
+    def reserve(self, product_id: str, location: str, quantity: int, reference: Optional[str] = None) -> Dict:
+        return self.reserve_many([ReservationRequest(product_id, location, quantity, reference)])[0]
+
+    def reserve_many(self, requests: List[ReservationRequest]) -> List[Dict]:
+        """
+        Reserve a batch in one transaction. Each request succeeds or fails on
+        its own; results are in request order with the reservation id or an error.
+        """
+        results: List[Dict] = [{"reserved": False, "reservation_id": None, "error": None} for _ in requests]
+        if not requests:
+            return results
+
+        try:
+            inventory_ids = self._inventory_ids(requests)
+            planned: Dict[uuid.UUID, List[int]] = {}
+            for position, request in enumerate(requests):
+                inventory_id = inventory_ids.get((self._uuids([request.product_id])[0], request.location))
+                if request.quantity <= 0:
+                    results[position]["error"] = "quantity must be positive"
+                elif inventory_id is None:
+                    results[position]["error"] = "no inventory for product at location"
+                else:
+                    planned.setdefault(inventory_id, []).append(position)
+
+            # Reservation rows go in before the stock UPDATEs, so a hot inventory
+            # row stays locked only from its UPDATE to the commit
+            expires_at = datetime.now(timezone.utc) + timedelta(minutes=self.ttl_minutes) if self.ttl_minutes else None
+            rows = []
+            for inventory_id, positions in planned.items():
+                for position in positions:
+                    reservation_id = uuid.uuid4()
+                    results[position]["reservation_id"] = reservation_id
+                    rows.append({
+                        "id": reservation_id,
+                        "inventory_id": inventory_id,
+                        "quantity": requests[position].quantity,
+                        "reference": requests[position].reference,
+                        "status": HELD,
+                        "expires_at": expires_at
+                    })
+            if rows:
+                self.db.execute(insert(InventoryReservation), rows)
+
+            failed: List[uuid.UUID] = []
+            # Fixed lock order, so concurrent batches over the same SKUs cannot deadlock
+            for inventory_id in sorted(planned, key=str):
+                positions = planned[inventory_id]
+                # Strategy 1: the whole batch for this SKU in one statement
+                if self._take(inventory_id, sum(requests[position].quantity for position in positions)):
+                    continue
+                # Strategy 2: not enough for all of them, reserve request by request
+                for position in positions:
+                    if not self._take(inventory_id, requests[position].quantity):
+                        failed.append(results[position]["reservation_id"])
+                        results[position].update(reservation_id=None, error="insufficient stock")
+
+            if failed:
+                self.db.execute(delete(InventoryReservation).where(InventoryReservation.id.in_(failed)))
+            # Core UPDATEs are invisible to the session, production_needs is told directly
+            mark_changed(self.db, {product_id for (product_id, _), inventory_id in inventory_ids.items()
+                                   if inventory_id in planned})
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        for result in results:
+            if result["reservation_id"] is not None:
+                result.update(reserved=True, reservation_id=str(result["reservation_id"]))
+        return results
+
+    def commit(self, reservation_ids: Iterable[str]) -> int:
+        """Ship held units: they leave quantity_reserved. Returns how many reservations were committed"""
+        return self._finish(InventoryReservation.id.in_(self._uuids(reservation_ids)), COMMITTED)
+
+    def release(self, reservation_ids: Iterable[str]) -> int:
+        """Give held units back to quantity_available. Returns how many reservations were released"""
+        return self._finish(InventoryReservation.id.in_(self._uuids(reservation_ids)), RELEASED)
+
+    def release_expired(self) -> int:
+        """Release held reservations past their expiry (abandoned checkouts)"""
+        return self._finish(InventoryReservation.expires_at < datetime.now(timezone.utc), RELEASED)
+
+    def _take(self, inventory_id: uuid.UUID, quantity: int) -> bool:
+        result = self.db.execute(
+            update(Inventory)
+            .where(Inventory.id == inventory_id, Inventory.quantity_available >= quantity)
+            .values(
+                quantity_available=Inventory.quantity_available - quantity,
+                quantity_reserved=Inventory.quantity_reserved + quantity
+            )
+        )
+        return result.rowcount == 1
+
+    def _finish(self, condition, status: str) -> int:
+        try:
+            # Only held reservations change state, a repeated release/commit is a no-op
+            finished = self.db.execute(
+                update(InventoryReservation)
+                .where(condition, InventoryReservation.status == HELD)
+                .values(status=status)
+                .returning(InventoryReservation.inventory_id, InventoryReservation.quantity)
+            ).all()
+
+            quantities: Dict[uuid.UUID, int] = {}
+            for inventory_id, quantity in finished:
+                quantities[inventory_id] = quantities.get(inventory_id, 0) + quantity
+            if quantities:
+                restock = bindparam("quantity") if status == RELEASED else 0
+                self.db.connection().execute(
+                    update(Inventory)
+                    .where(Inventory.id == bindparam("inventory_id"))
+                    .values(
+                        quantity_available=Inventory.quantity_available + restock,
+                        quantity_reserved=Inventory.quantity_reserved - bindparam("quantity")
+                    ),
+                    [{"inventory_id": inventory_id, "quantity": quantity}
+                     for inventory_id, quantity in sorted(quantities.items(), key=lambda item: str(item[0]))]
+                )
+                if status == RELEASED:
+                    mark_changed(self.db, self.db.execute(
+                        select(Inventory.product_id).where(Inventory.id.in_(list(quantities)))
+                    ).scalars())
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return len(finished)
+
+    def _inventory_ids(self, requests: List[ReservationRequest]) -> Dict[tuple, uuid.UUID]:
+        """(product_id, location) -> inventory row, one query for the batch"""
+        product_ids = self._uuids({request.product_id for request in requests})
+        rows = self.db.execute(
+            select(Inventory.id, Inventory.product_id, Inventory.location)
+            .where(Inventory.product_id.in_(product_ids))
+            .order_by(Inventory.id)
+        ).all()
+        inventory_ids = {}
+        for inventory_id, product_id, location in rows:
+            inventory_ids.setdefault((product_id, location), inventory_id)
+        return inventory_ids
+
+    @staticmethod
+    def _uuids(values: Iterable) -> List[uuid.UUID]:
+        return [value if isinstance(value, uuid.UUID) else uuid.UUID(str(value)) for value in values]
@@ -0,0 +1,225 @@
+# services/scenario_engine.py
+"""
+What-if production planning: "safety stock at 20%", "demand +15%",
+"factory X slips 2 weeks". Demand, stock and incoming production are loaded
+once as arrays, then every scenario is evaluated at the same time as
+(scenarios x products) matrix operations, in chunks of scenarios. One call
+is capped at SCENARIO_MAX scenarios, which evaluate in about a second in one
+process, so calls run on a bounded thread pool instead of spawning processes.
+
+A scenario with the default safety stock, demand x1, no delays and no
+horizon reproduces /production/calculate.
+"""
+import itertools
+import math
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from decouple import config
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import Product, ProductionNeed, ProductionOrder
+from services.production_needs import INCOMING_STATUSES, SAFETY_STOCK_PERCENTAGE
+from services.worker_pool import BoundedPool
+
+# Scenarios evaluated per matrix pass, bounds memory at chunk x (products + production orders)
+SCENARIO_CHUNK_SIZE = config('SCENARIO_CHUNK_SIZE', default=64, cast=int)
+# Largest comparison one call may ask for: the payload holds a row per scenario
+SCENARIO_MAX = config('SCENARIO_MAX', default=1000, cast=int)
+SCENARIO_POOL_WORKERS = config('SCENARIO_POOL_WORKERS', default=1, cast=int)
+SCENARIO_POOL_MAX_QUEUE = config('SCENARIO_POOL_MAX_QUEUE', default=4, cast=int)
+
+# Scenario runs load every product and evaluate matrices, off the event loop
+scenario_pool = BoundedPool("scenarios", SCENARIO_POOL_WORKERS, SCENARIO_POOL_MAX_QUEUE)
+
+
+class Scenario(NamedTuple):
+    name: str
+    safety_stock_pct: float = SAFETY_STOCK_PERCENTAGE
+    demand_multiplier: float = 1.0
+    factory_delays: Optional[Dict[str, int]] = None  # factory_name -> days late, None = none late
+    horizon_days: Optional[int] = None  # incoming counts only if it completes within this, None = all
+
+
+class PlanningInputs(NamedTuple):
+    product_ids: List[str]
+    skus: List[str]
+    pending: np.ndarray  # units on pending orders, per product
+    monthly_sales: np.ndarray  # forecast monthly demand, per product
+    stock: np.ndarray  # available stock, per product
+    factories: List[str]
+    incoming_product: np.ndarray  # per open production order: product position (sorted)
+    incoming_factory: np.ndarray  # factory position, -1 without a factory
+    incoming_quantity: np.ndarray
+    incoming_days: np.ndarray  # days until expected completion, nan when unknown
+
+
+def grid_size(*axes: Sequence) -> int:
+    """Number of scenarios scenario_grid() makes from these axes, an empty axis keeping its default"""
+    return math.prod(len(axis) or 1 for axis in axes)
+
+
+def scenario_grid(
+    safety_stock_pct: Sequence[float] = (SAFETY_STOCK_PERCENTAGE,),
+    demand_multiplier: Sequence[float] = (1.0,),
+    factory_delays: Sequence[Dict[str, int]] = ({},),
+    horizon_days: Sequence[Optional[int]] = (None,)
+) -> List[Scenario]:
+    """Every combination of the given parameter values"""
+    scenarios = []
+    for safety, demand, delays, horizon in itertools.product(safety_stock_pct, demand_multiplier, factory_delays, horizon_days):
+        delayed = ",".join(f"{factory}+{days}d" for factory, days in sorted(delays.items()))
+        name = f"safety={safety:g} demand=x{demand:g}" + (f" delays={delayed}" if delayed else "") + \
+            (f" horizon={horizon}d" if horizon is not None else "")
+        scenarios.append(Scenario(name, safety, demand, dict(delays), horizon))
+    return scenarios
+
+
+def load_inputs(db: Session) -> PlanningInputs:
+    """Products with pending demand (the production_needs read model) and their open production orders"""
+    needs = db.query(
+        ProductionNeed.product_id,
+        Product.sku,
+        ProductionNeed.orders_pending,
+        func.coalesce(ProductionNeed.forecast_monthly, ProductionNeed.recently_sold / 3.0).label('monthly_sales'),
+        ProductionNeed.current_stock
+    ).join(
+        Product, Product.id == ProductionNeed.product_id
+    ).order_by(ProductionNeed.product_id).all()
+    positions = {row.product_id: position for position, row in enumerate(needs)}
+
+    incoming = db.query(
+        ProductionOrder.product_id,
+        ProductionOrder.factory_name,
+        ProductionOrder.quantity_to_produce,
+        ProductionOrder.expected_completion
+    ).filter(
+        ProductionOrder.status.in_(INCOMING_STATUSES),
+        ProductionOrder.product_id.in_(list(positions))
+    ).all()
+    incoming = sorted(incoming, key=lambda row: positions[row.product_id])
+
+    factories = sorted({row.factory_name for row in incoming if row.factory_name})
+    factory_positions = {factory: position for position, factory in enumerate(factories)}
+    now = datetime.now(timezone.utc)
+
+    def days_until(completion: Optional[datetime]) -> float:
+        if completion is None:
+            return np.nan
+        if completion.tzinfo is None:
+            completion = completion.replace(tzinfo=timezone.utc)
+        return (completion - now).total_seconds() / 86400
+
+    return PlanningInputs(
+        product_ids=[str(row.product_id) for row in needs],
+        skus=[row.sku for row in needs],
+        pending=np.array([row.orders_pending for row in needs], dtype=np.int64),
+        monthly_sales=np.maximum(np.array([row.monthly_sales for row in needs], dtype=np.float64), 0.0),
+        stock=np.array([row.current_stock for row in needs], dtype=np.int64),
+        factories=factories,
+        incoming_product=np.array([positions[row.product_id] for row in incoming], dtype=np.int64),
+        incoming_factory=np.array([factory_positions.get(row.factory_name, -1) for row in incoming], dtype=np.int64),
+        incoming_quantity=np.array([row.quantity_to_produce or 0 for row in incoming], dtype=np.int64),
+        incoming_days=np.array([days_until(row.expected_completion) for row in incoming], dtype=np.float64)
+    )
+
+
+def evaluate(inputs: PlanningInputs, scenarios: List[Scenario]) -> Dict[str, np.ndarray]:
+    """(scenarios x products) matrices for a batch of scenarios"""
+    count, products = len(scenarios), len(inputs.product_ids)
+    safety_pct = np.array([scenario.safety_stock_pct for scenario in scenarios])[:, None]
+    demand_multiplier = np.array([scenario.demand_multiplier for scenario in scenarios])[:, None]
+    horizon = np.array([np.inf if scenario.horizon_days is None else scenario.horizon_days for scenario in scenarios])
+
+    # Factory slips as a (scenarios x factories) matrix, a trailing 0 column for orders without a factory
+    delays = np.zeros((count, len(inputs.factories) + 1))
+    factory_positions = {factory: position for position, factory in enumerate(inputs.factories)}
+    for row, scenario in enumerate(scenarios):
+        for factory, days in (scenario.factory_delays or {}).items():
+            if factory in factory_positions:
+                delays[row, factory_positions[factory]] = days
+
+    incoming = np.zeros((count, products), dtype=np.int64)
+    if len(inputs.incoming_quantity):
+        # Orders without a completion date are counted, as the current plan does
+        arrival = inputs.incoming_days[None, :] + delays[:, inputs.incoming_factory]
+        counted = np.isnan(arrival) | (arrival <= horizon[:, None])
+        weighted = counted * inputs.incoming_quantity[None, :]
+        # Production orders are sorted by product: sum each product's run
+        products_with_incoming, starts = np.unique(inputs.incoming_product, return_index=True)
+        incoming[:, products_with_incoming] = np.add.reduceat(weighted, starts, axis=1)
+
+    safety_stock = np.floor(inputs.monthly_sales[None, :] * safety_pct).astype(np.int64)
+    demand = np.ceil(inputs.pending[None, :] * demand_multiplier - 1e-9).astype(np.int64)
+    total_needed = demand + safety_stock
+    total_available = inputs.stock[None, :] + incoming
+    return {
+        "safety_stock": safety_stock,
+        "incoming": incoming,
+        "to_produce": np.maximum(0, total_needed - total_available)
+    }
+
+
+class ScenarioEngine:
+    """Evaluates many production planning scenarios against one load of the inputs"""
+
+    def __init__(self, db: Session, chunk_size: int = SCENARIO_CHUNK_SIZE):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.inputs: Optional[PlanningInputs] = None
+
+    def load(self) -> PlanningInputs:
+        self.inputs = load_inputs(self.db)
+        return self.inputs
+
+    async def compare(self, scenarios: List[Scenario], include_products: bool = True) -> Dict:
+        """Run run() on the scenario pool (PoolSaturated when it is full)"""
+        return await scenario_pool.run(self.run, scenarios, include_products)
+
+    def run(self, scenarios: List[Scenario], include_products: bool = True) -> Dict:
+        """
+        Columnar comparison payload: one entry per scenario in every "totals"
+        list and, with include_products, a to_produce row per scenario over
+        the products that need production in at least one scenario
+        """
+        if not scenarios:
+            raise ValueError("No scenarios given")
+        if len(scenarios) > SCENARIO_MAX:
+            raise ValueError(f"{len(scenarios)} scenarios requested, at most {SCENARIO_MAX} per call")
+        started = time.perf_counter()
+        inputs = self.inputs if self.inputs is not None else self.load()
+        loaded = time.perf_counter()
+
+        results = [
+            evaluate(inputs, scenarios[start:start + self.chunk_size])
+            for start in range(0, len(scenarios), self.chunk_size)
+        ]
+
+        to_produce = np.vstack([result["to_produce"] for result in results])
+        incoming = np.vstack([result["incoming"] for result in results])
+        safety_stock = np.vstack([result["safety_stock"] for result in results])
+
+        payload = {
+            "success": True,
+            "scenarios": [scenario._asdict() for scenario in scenarios],
+            "totals": {
+                "to_produce": to_produce.sum(axis=1).tolist(),
+                "products_to_produce": (to_produce > 0).sum(axis=1).tolist(),
+                "incoming_counted": incoming.sum(axis=1).tolist(),
+                "safety_stock": safety_stock.sum(axis=1).tolist()
+            },
+            "products_evaluated": len(inputs.product_ids),
+            "load_seconds": round(loaded - started, 3),
+            "evaluate_seconds": round(time.perf_counter() - loaded, 3)
+        }
+        if include_products:
+            needed = np.flatnonzero((to_produce > 0).any(axis=0))
+            payload["products"] = {
+                "product_id": [inputs.product_ids[position] for position in needed],
+                "sku": [inputs.skus[position] for position in needed]
+            }
+            payload["to_produce"] = to_produce[:, needed].tolist()
+        return payload
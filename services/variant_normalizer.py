@@ -0,0 +1,153 @@
+# services/variant_normalizer.py
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+
+import polars as pl
+from decouple import config
+from rapidfuzz import fuzz, process
+
+# Canonical value -> spellings seen in NuOrder/Shopify exports
+COLOR_ALIASES = {
+    "Black": ["blk", "bk", "blck", "noir", "jet black"],
+    "White": ["wht", "wh", "whte", "optic white"],
+    "Ivory": ["ivr", "ivry", "off white", "offwhite", "ecru"],
+    "Cream": ["crm"],
+    "Navy": ["nvy", "nav", "navy blue", "dark navy"],
+    "Blue": ["blu", "bl"],
+    "Grey": ["gray", "gry", "gy", "grey marl", "grey melange"],
+    "Charcoal": ["char", "chrcl", "charcoal grey", "charcoal gray", "dark grey", "dark gray"],
+    "Brown": ["brn", "brwn", "chocolate"],
+    "Camel": ["cml", "caml"],
+    "Beige": ["bge", "bei"],
+    "Stone": ["stn"],
+    "Khaki": ["khk", "kaki"],
+    "Olive": ["olv", "olive green"],
+    "Green": ["grn", "gren"],
+    "Burgundy": ["burg", "brgndy", "bgd", "wine", "bordeaux"],
+    "Red": ["rd"],
+    "Pink": ["pnk"],
+    "Purple": ["prpl", "purp"],
+    "Orange": ["org", "orng"],
+    "Yellow": ["ylw", "yel", "yllw"],
+    "Tan": [],
+    "Taupe": ["tpe"],
+    "Silver": ["slv", "slvr"],
+    "Gold": ["gld"],
+}
+
+SIZE_ALIASES = {
+    "XXS": ["2xs", "xxsmall", "xxsml"],
+    "XS": ["xsmall", "xsml", "extrasmall", "xsm"],
+    "S": ["small", "sml", "sm"],
+    "M": ["med", "medium", "md", "mdm"],
+    "L": ["large", "lrg", "lg", "lge"],
+    "XL": ["xlarge", "xlrg", "xlg", "extralarge", "1xl"],
+    "XXL": ["2xl", "xxlarge", "xxlg"],
+    "XXXL": ["3xl", "xxxlarge"],
+    "ONE SIZE": ["os", "onesize", "one", "osfa", "onesizefitsall"],
+}
+
+# Only colors get a fuzzy fallback: sizes are too short ("S" vs "XS") to fuzz safely
+COLOR_FUZZY_CUTOFF = config('COLOR_FUZZY_CUTOFF', default=85, cast=int)
+# Shorter keys are one edit away from another color ("ink" vs "pink") and are never fuzzed
+COLOR_FUZZY_MIN_LENGTH = config('COLOR_FUZZY_MIN_LENGTH', default=4, cast=int)
+VARIANT_NORMALIZER_CACHE_SIZE = config('VARIANT_NORMALIZER_CACHE_SIZE', default=50000, cast=int)
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _key(value: str) -> str:
+    return _NON_ALNUM.sub('', value.lower())
+
+
+def _lookup(aliases: Dict[str, Iterable[str]]) -> Dict[str, str]:
+    lookup = {}
+    for canonical, spellings in aliases.items():
+        lookup[_key(canonical)] = canonical
+        for spelling in spellings:
+            lookup[_key(spelling)] = canonical
+    return lookup
+
+
+class VariantNormalizer:
+    """
+    Canonical color/size values so PO lines and variants compare with plain
+    equality ("Blk" == "Black", "Med" == "M"). Lookup tables are compiled once
+    and every distinct raw value is resolved at most once per process.
+    """
+
+    def __init__(
+        self,
+        color_aliases: Dict[str, Iterable[str]] = COLOR_ALIASES,
+        size_aliases: Dict[str, Iterable[str]] = SIZE_ALIASES,
+        fuzzy_cutoff: int = COLOR_FUZZY_CUTOFF,
+        fuzzy_min_length: int = COLOR_FUZZY_MIN_LENGTH,
+        cache_size: int = VARIANT_NORMALIZER_CACHE_SIZE
+    ):
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.fuzzy_min_length = fuzzy_min_length
+        self._colors = _lookup(color_aliases)
+        self._sizes = _lookup(size_aliases)
+        self._color_keys = list(self._colors)
+        self.color = lru_cache(maxsize=cache_size)(self._color)
+        self.size = lru_cache(maxsize=cache_size)(self._size)
+
+    def _color(self, raw: Optional[str]) -> Optional[str]:
+        if raw is None:
+            return None
+        cleaned = _WHITESPACE.sub(' ', str(raw)).strip()
+        key = _key(cleaned)
+        if not key:
+            return None
+
+        # Strategy 1: exact alias lookup
+        canonical = self._colors.get(key)
+        if canonical:
+            return canonical
+
+        # Strategy 2: fuzzy match against every known spelling ("Blak", "Burgandy")
+        if len(key) >= self.fuzzy_min_length:
+            match = process.extractOne(key, self._color_keys, scorer=fuzz.ratio, score_cutoff=self.fuzzy_cutoff)
+            if match:
+                return self._colors[match[0]]
+
+        # Unknown colors ("Dusty Rose") are kept, in one consistent casing
+        return cleaned.title()
+
+    def _size(self, raw: Optional[str]) -> Optional[str]:
+        if raw is None:
+            return None
+        cleaned = _WHITESPACE.sub(' ', str(raw)).strip()
+        key = _key(cleaned)
+        if not key:
+            return None
+
+        canonical = self._sizes.get(key)
+        if canonical:
+            return canonical
+
+        # Numeric and waist/leg sizes ("10", "32W 34L") only need consistent casing
+        return cleaned.upper()
+
+    def normalize_column(self, column: pl.Series, kind: str) -> pl.Series:
+        """Canonicalize a color or size column, resolving each distinct value once"""
+        resolve = self.color if kind == "color" else self.size
+        raw_values = column.cast(pl.Utf8)
+        mapping = {raw: resolve(raw) for raw in raw_values.drop_nulls().unique().to_list()}
+        return raw_values.replace(mapping)
+
+    def normalize_frame(self, df: pl.DataFrame, color: str = "color", size: str = "size") -> pl.DataFrame:
+        """Canonicalize the color and size columns of an import frame"""
+        return df.with_columns(
+            self.normalize_column(df[color], "color").alias(color),
+            self.normalize_column(df[size], "size").alias(size)
+        )
+
+    def cache_info(self) -> Dict:
+        return {"color": self.color.cache_info()._asdict(), "size": self.size.cache_info()._asdict()}
+
+
+# Shared by every request handled in this process
+variant_normalizer = VariantNormalizer()
@@ -0,0 +1,128 @@
+# services/worker_pool.py
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+# Upper bounds in milliseconds, the last bucket catches everything slower
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+class PoolSaturated(Exception):
+    """Raised when a pool already has max_workers running and max_queue waiting"""
+    pass
+
+
+class Histogram:
+    """Fixed-bucket latency histogram, cheap enough to update on every call"""
+
+    def __init__(self, buckets_ms: List[float] = HISTOGRAM_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self._counts = [0] * (len(buckets_ms) + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        with self._lock:
+            self._counts[bisect_left(self.buckets_ms, ms)] += 1
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counts = list(self._counts)
+        buckets = {f"le_{bound}ms": count for bound, count in zip(self.buckets_ms, counts)}
+        buckets["gt_{}ms".format(self.buckets_ms[-1])] = counts[-1]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 2),
+            "buckets": buckets
+        }
+
+
+class BoundedPool:
+    """
+    Thread pool for blocking work called from async endpoints.
+    At most max_workers calls run at once and at most max_queue more wait;
+    anything beyond that is rejected with PoolSaturated instead of piling up.
+    A cancelled caller (client disconnect) is only released once its call
+    has finished, so the call never outlives the caller's request Session.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+        self.queue_wait = Histogram()
+        self.latency = Histogram()
+        pools[name] = self
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise PoolSaturated(f"{self.name} pool is saturated")
+            self._in_flight += 1
+
+        submitted = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            self.queue_wait.observe(started - submitted)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.latency.observe(time.perf_counter() - started)
+
+        future = self._executor.submit(task)
+        # Release the slot when the work finishes, even if the caller went away
+        future.add_done_callback(self._release)
+        result = asyncio.wrap_future(future)
+        try:
+            return await asyncio.shield(result)
+        except asyncio.CancelledError:
+            # The work still uses the caller's resources (its request Session):
+            # let it finish before the caller's cleanup closes them
+            while not result.done():
+                try:
+                    await asyncio.shield(result)
+                except asyncio.CancelledError:
+                    continue
+                except Exception:
+                    break
+            raise
+
+    def stats(self) -> Dict:
+        with self._lock:
+            in_flight = self._in_flight
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": min(in_flight, self.max_workers),
+            "queued": max(0, in_flight - self.max_workers),
+            "rejected": self.rejected,
+            "queue_wait": self.queue_wait.snapshot(),
+            "latency": self.latency.snapshot()
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+
+
+# Every pool registers itself here for the metrics endpoint
+pools: Dict[str, BoundedPool] = {}
@@ -0,0 +1,45 @@
+# tests/conftest.py
+"""
+Tests run against an in-memory SQLite database built from the models, so
+they need no Postgres. Postgres-only behaviour (COPY, row locks) is not
+exercised here.
+"""
+import pytest
+from sqlalchemy import UUID, create_engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import models  # noqa: F401 - registers every table on Base.metadata
+from database.database import Base
+from services.catalog_index import track_catalog_changes
+from services.production_needs import track_changes
+
+
+@compiles(UUID, "sqlite")
+def _uuid_as_char(type_, compiler, **kw):
+    return "CHAR(32)"
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    # As main.py does for request sessions
+    track_changes(factory)
+    track_catalog_changes(factory)
+    return factory
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
@@ -0,0 +1,49 @@
+# tests/test_allocation_engine.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Inventory, Product, ProductVariant, PurchaseOrder, PurchaseOrderItem
+from models.fashion_extensions import Style
+from services.allocation_engine import AllocationEngine
+
+
+@pytest.fixture
+def shared_product(db):
+    """One product sold under two styles, 6 units in the UK and 4 in New York"""
+    product = Product(sku="KB-BLK-M", master_name="Knightsbridge Jacket Black M")
+    styles = [Style(style_name="Knightsbridge Jacket", style_code="KB"),
+              Style(style_name="Knightsbridge Jacket Heritage", style_code="KBH")]
+    db.add_all([product, *styles])
+    db.flush()
+    db.add_all([
+        ProductVariant(product_id=product.id, style_id=style.id, color="Black", size="M", sku=f"V-{style.style_code}")
+        for style in styles
+    ])
+    db.add_all([
+        Inventory(product_id=product.id, location="warehouse_uk", quantity_available=6),
+        Inventory(product_id=product.id, location="warehouse_ny", quantity_available=4),
+    ])
+    db.commit()
+    return product
+
+
+def purchase_order(db, po_number, days, quantity):
+    po = PurchaseOrder(po_number=po_number, customer_name="Harrods", status="received",
+                       required_date=datetime.now() + timedelta(days=days))
+    db.add(po)
+    db.flush()
+    db.add(PurchaseOrderItem(po_id=po.id, style_name="Knightsbridge Jacket", color="Black", size="M", quantity=quantity))
+    db.commit()
+
+
+def test_variants_of_one_product_share_its_stock(db, shared_product):
+    purchase_order(db, "PO-1", 5, 8)
+    purchase_order(db, "PO-2", 10, 8)
+
+    result = AllocationEngine(db, location_order=["warehouse_uk"]).allocate()
+    first, second = result["orders"]
+    assert (first["po_number"], first["allocated"], first["status"]) == ("PO-1", 8, "allocated")
+    assert first["lines"][0]["allocations"] == {"warehouse_uk": 6, "warehouse_ny": 2}
+    assert (second["po_number"], second["allocated"], second["status"]) == ("PO-2", 2, "partial")
+    assert result["units_short"] == 6
@@ -0,0 +1,39 @@
+# tests/test_batch_ingest.py
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from database.database import get_db
+from services.batch_ingest import BatchIngestor
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(main.job_queue, "submit", lambda job_type, **params: submitted.append(params) or "job-1")
+    main.app.dependency_overrides[get_db] = lambda: db
+    # Not entered as a context manager: startup warm-ups do not run
+    yield TestClient(main.app), submitted
+    main.app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize("options", [{"mode": "replace"}, {"collisions": "newest"}])
+def test_bad_options_fail_before_parsing(options):
+    with pytest.raises(ValueError):
+        BatchIngestor(None, **options)
+
+
+@pytest.mark.parametrize("background", ["false", "true"])
+@pytest.mark.parametrize("options", [{"mode": "replace"}, {"collisions": "newest"}])
+def test_endpoint_rejects_bad_options(client, background, options):
+    http, submitted = client
+    response = http.post("/orders/batch-import", params={"source": "/nowhere/*.csv", "background": background, **options})
+    assert response.status_code == 400
+    assert submitted == []
+
+
+def test_background_import_is_queued(client):
+    http, submitted = client
+    response = http.post("/orders/batch-import", params={"source": "/data/*.csv", "background": "true", "mode": "upsert"})
+    assert response.status_code == 200 and response.json()["job_id"] == "job-1"
+    assert submitted == [{"source": "/data/*.csv", "mode": "upsert", "collisions": "skip", "workers": None}]
@@ -0,0 +1,48 @@
+# tests/test_catalog_index.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Inventory, Product
+from services.catalog_index import CatalogIndex, catalog_version
+
+
+@pytest.fixture
+def catalog(db):
+    db.add_all([Product(sku="SKU-1", master_name="Knightsbridge Jacket"), Product(sku="SKU-2", master_name="Chelsea Boot")])
+    db.commit()
+    return db
+
+
+def test_every_product_write_bumps_the_version(catalog):
+    versions = [catalog_version(catalog)]
+    product = catalog.query(Product).filter(Product.sku == "SKU-1").one()
+    product.master_name = "Knightsbridge Coat"
+    catalog.commit()
+    versions.append(catalog_version(catalog))
+    product.active = False
+    catalog.commit()
+    versions.append(catalog_version(catalog))
+    assert len(set(versions)) == 3
+
+    catalog.add(Inventory(product_id=product.id, location="warehouse_uk", quantity_available=1))
+    catalog.commit()
+    assert catalog_version(catalog) == versions[-1]
+
+
+def test_change_stamped_before_the_latest_update_still_reloads(catalog, session_factory):
+    index = CatalogIndex(index_path="", version_check_interval=0)
+    index.ensure_loaded(catalog)
+
+    # A transaction that started before the last product write commits after it
+    writer = session_factory()
+    try:
+        product = writer.query(Product).filter(Product.sku == "SKU-2").one()
+        product.master_name = "Chelsea Loafer"
+        product.updated_at = datetime.now() - timedelta(days=1)
+        writer.commit()
+    finally:
+        writer.close()
+
+    index.ensure_loaded(catalog)
+    assert "Chelsea Loafer" in list(index.snapshot.names)
@@ -0,0 +1,74 @@
+# tests/test_demand_forecast.py
+from datetime import date, datetime, timedelta
+
+import polars as pl
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from database.database import get_db
+from models import Order, OrderItem, Product, ProductionNeed
+from services.demand_forecast import demand_forecaster, forecast_frame
+from services.production_needs import ProductionNeedsStore
+
+
+def history(rows):
+    return pl.DataFrame(rows, schema={"product_id": pl.Utf8, "month": pl.Int64, "quantity": pl.Float64}, orient="row")
+
+
+def test_flat_demand_forecasts_the_level():
+    forecast = forecast_frame(history([("flat", month, 30.0) for month in range(24)]), first_month=2024 * 12, months=24)
+    assert forecast["forecast_monthly"][0] == pytest.approx(30.0)
+
+
+def test_net_returns_do_not_forecast_negative_demand():
+    rows = [("returns", month, -5.0) for month in range(12)] + [("seller", month, 20.0) for month in range(12)]
+    forecast = forecast_frame(history(rows), first_month=2024 * 12, months=12)
+    assert forecast["forecast_monthly"].min() >= 0
+
+
+@pytest.fixture
+def forecaster_state(monkeypatch):
+    """Sets the process's forecast without computing one"""
+    def set_forecast(monthly):
+        monkeypatch.setattr(demand_forecaster, "_day", date.today() if monthly is not None else None)
+        monkeypatch.setattr(demand_forecaster, "_monthly", monthly or {})
+    return set_forecast
+
+
+def test_refresh_without_a_forecast_keeps_the_stored_one(db, forecaster_state):
+    product = Product(sku="SKU-1", master_name="Coat")
+    db.add(product)
+    db.flush()
+    order = Order(order_number="ORD-1", platform="shopify", status="pending", required_date=datetime.now() + timedelta(days=10))
+    db.add(order)
+    db.flush()
+    db.add(OrderItem(order_id=order.id, product_id=product.id, quantity=5))
+    db.commit()
+
+    # A rebuild in a process with today's forecast
+    forecaster_state({str(product.id): 200.0})
+    ProductionNeedsStore(db).refresh([product.id])
+    db.commit()
+    need = db.get(ProductionNeed, product.id)
+    assert (need.forecast_monthly, need.safety_stock_needed) == (200.0, 20)
+
+    # A worker that never computed one refreshes the row
+    forecaster_state(None)
+    order.status = "processing"
+    db.commit()
+    db.refresh(need)
+    assert (need.forecast_monthly, need.safety_stock_needed) == (200.0, 20)
+
+
+def test_calculate_recomputes_a_stale_forecast(db, session_factory, monkeypatch):
+    monkeypatch.setattr(main, "SessionLocal", session_factory)
+    monkeypatch.setattr(demand_forecaster, "_day", date.today() - timedelta(days=1))
+    monkeypatch.setattr(demand_forecaster, "_monthly", {})
+    main.app.dependency_overrides[get_db] = lambda: db
+    try:
+        assert demand_forecaster.info()["stale"]
+        assert TestClient(main.app).get("/production/calculate").status_code == 200
+    finally:
+        main.app.dependency_overrides.clear()
+    assert demand_forecaster.info() == {"day": date.today().isoformat(), "stale": False, "products": 0}
@@ -0,0 +1,40 @@
+# tests/test_duplicate_detector.py
+import pytest
+
+from models import NameSynonym, Product
+from services import duplicate_detector
+from services.duplicate_detector import DuplicateDetector
+from services.name_normalizer import DEFAULT_SYNONYMS, name_normalizer
+
+
+@pytest.fixture
+def catalog(db):
+    db.add(NameSynonym(phrase="kbr", replacement="knights bridge"))
+    db.add_all([
+        Product(sku="SKU-1", master_name="Knights Bridge Jacket"),
+        Product(sku="SKU-2", master_name="KBR Jacket"),
+        Product(sku="SKU-3", master_name="Chelsea Boot"),
+    ])
+    db.commit()
+    yield db
+    # The normalizer is process-wide, later tests expect the default table
+    name_normalizer.load_synonyms(DEFAULT_SYNONYMS)
+
+
+def cluster_names(clusters):
+    return [sorted(product["master_name"] for product in cluster.products) for cluster in clusters]
+
+
+def test_database_synonyms_are_applied(catalog):
+    clusters = DuplicateDetector(threshold=95, workers=1).find_duplicates(catalog)
+    assert cluster_names(clusters) == [["KBR Jacket", "Knights Bridge Jacket"]]
+
+
+def test_worker_processes_find_the_same_clusters(catalog):
+    clusters = DuplicateDetector(threshold=95, workers=2, chunk_size=1).find_duplicates(catalog)
+    assert cluster_names(clusters) == [["KBR Jacket", "Knights Bridge Jacket"]]
+
+
+def test_worker_fails_when_the_index_cannot_be_loaded(tmp_path):
+    with pytest.raises(RuntimeError):
+        duplicate_detector._init_worker(str(tmp_path / "missing"), 50, dict(name_normalizer.synonyms))
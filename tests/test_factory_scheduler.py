@@ -0,0 +1,59 @@
+# tests/test_factory_scheduler.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import FactoryCapacity, Inventory, Order, OrderItem, Product, ProductionOrder
+from services.factory_scheduler import FactoryScheduler
+
+
+@pytest.fixture
+def plant(db):
+    """Two products short of stock (one urgent, partly in production) and an unassigned low-priority order"""
+    db.add(FactoryCapacity(factory_name="Porto", daily_capacity=100, lead_time_days=3))
+    urgent, later, unassigned = [Product(sku=f"SKU-{number}", master_name=f"Product {number}") for number in range(3)]
+    db.add_all([urgent, later, unassigned])
+    db.flush()
+    db.add(Inventory(product_id=urgent.id, location="warehouse_uk", quantity_available=4))
+    db.add(ProductionOrder(product_id=urgent.id, quantity_to_produce=10, factory_name="Porto", status="in_production"))
+    for number, (product, days) in enumerate([(urgent, 3), (later, 90)]):
+        order = Order(order_number=f"ORD-{number}", platform="shopify", status="pending",
+                      required_date=datetime.now() + timedelta(days=days))
+        db.add(order)
+        db.flush()
+        db.add(OrderItem(order_id=order.id, product_id=product.id, quantity=50))
+    db.add(ProductionOrder(product_id=unassigned.id, quantity_to_produce=20, priority=1, status="planned"))
+    db.commit()
+    return {"urgent": urgent.id, "later": later.id, "unassigned": unassigned.id}
+
+
+def new_orders(db):
+    return {
+        row.product_id: row for row in db.query(ProductionOrder).filter(ProductionOrder.quantity_needed.isnot(None))
+    }
+
+
+def test_new_orders_record_stock_on_hand(db, plant):
+    FactoryScheduler(db).run()
+    order = new_orders(db)[plant["urgent"]]
+    assert (order.quantity_in_stock, order.factory_name) == (4, "Porto")
+
+
+def test_min_priority_applies_to_unassigned_orders(db, plant):
+    result = FactoryScheduler(db).run(min_priority=5, dry_run=True)
+    assert [order["product_id"] for order in result["orders"]] == [plant["urgent"]]
+
+
+def test_a_second_run_does_not_order_the_same_shortfall(db, plant):
+    FactoryScheduler(db).run()
+    first = db.query(ProductionOrder).count()
+    result = FactoryScheduler(db).run()
+    assert result["scheduled"] == 0
+    assert db.query(ProductionOrder).count() == first
+
+
+def test_factories_without_an_active_flag_are_used(db, plant):
+    db.query(FactoryCapacity).update({FactoryCapacity.active: None})
+    db.commit()
+    result = FactoryScheduler(db).run(dry_run=True)
+    assert {order["factory_name"] for order in result["orders"]} == {"Porto"}
@@ -0,0 +1,74 @@
+# tests/test_order_processor.py
+import asyncio
+import itertools
+
+import pytest
+from sqlalchemy import event
+
+from models import Inventory, Product, ProductVariant, PurchaseOrder, PurchaseOrderItem
+from models.fashion_extensions import Style
+from services.order_processor import OrderProcessor
+
+COLORS = ["Black", "Navy", "Ivory"]
+SIZES = ["S", "M", "L"]
+LOCATIONS = ["warehouse_uk", "warehouse_ny"]
+
+
+@pytest.fixture
+def catalog(db):
+    """Two styles in every color and size, 10 units of each at every location"""
+    for style_number, style_name in enumerate(["Knightsbridge Jacket", "Chelsea Boot"]):
+        style = Style(style_name=style_name, style_code=f"S{style_number}")
+        db.add(style)
+        db.flush()
+        for color, size in itertools.product(COLORS, SIZES):
+            product = Product(sku=f"S{style_number}-{color}-{size}", master_name=f"{style_name} {color} {size}")
+            db.add(product)
+            db.flush()
+            db.add(ProductVariant(product_id=product.id, style_id=style.id, color=color, size=size, sku=f"V-{product.sku}"))
+            db.add_all([Inventory(product_id=product.id, location=location, quantity_available=10) for location in LOCATIONS])
+    db.commit()
+    return db
+
+
+def purchase_order(db, lines):
+    po = PurchaseOrder(po_number=f"PO-{lines}", customer_name="Harrods")
+    db.add(po)
+    db.flush()
+    for style_name, color, size in itertools.islice(
+        itertools.cycle(itertools.product(["Knightsbridge Jacket", "Chelsea Boot", "Unknown"], COLORS, SIZES)), lines
+    ):
+        db.add(PurchaseOrderItem(po_id=po.id, style_name=style_name, color=color, size=size, quantity=15))
+    db.commit()
+    return po.id
+
+
+@pytest.fixture
+def statements(engine):
+    counter = {"count": 0}
+
+    def count(*args):
+        counter["count"] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    yield counter
+    event.remove(engine, "before_cursor_execute", count)
+
+
+@pytest.mark.parametrize("lines", [27, 270])
+def test_sync_po_with_inventory_query_count(catalog, session_factory, statements, lines):
+    po_id = purchase_order(catalog, lines)
+    db = session_factory()
+    try:
+        statements["count"] = 0
+        result = asyncio.run(OrderProcessor(db).sync_po_with_inventory(po_id))
+    finally:
+        db.close()
+
+    # The order, its lines and one grouped stock query, however many lines
+    assert statements["count"] == 3
+    assert result["total_items"] == lines
+    by_style = {line["style"]: line for line in result["availability"]}
+    assert by_style["Knightsbridge Jacket"]["available_by_location"] == {location: 10 for location in LOCATIONS}
+    assert by_style["Knightsbridge Jacket"]["status"] == "in_stock"
+    assert by_style["Unknown"]["available"] == 0
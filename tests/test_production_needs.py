@@ -0,0 +1,135 @@
+# tests/test_production_needs.py
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Inventory, Order, OrderItem, Product, ProductionNeed, ProductionOrder
+from services.production_needs import ProductionNeedsStore, aggregate_needs
+from services.reservation_service import ReservationRequest, ReservationService
+
+COLUMNS = [
+    'orders_pending', 'recently_sold', 'current_stock', 'incoming_production',
+    'safety_stock_needed', 'total_needed', 'total_available', 'to_produce'
+]
+
+
+def read_model(db):
+    return {row.product_id: tuple(getattr(row, column) for column in COLUMNS) for row in db.query(ProductionNeed).all()}
+
+
+def fresh(db):
+    return {row['product_id']: tuple(row[column] for column in COLUMNS) for row in aggregate_needs(db, monthly_demand={})}
+
+
+def assert_current(session_factory):
+    # A new session sees only what was committed
+    db = session_factory()
+    try:
+        assert read_model(db) == fresh(db)
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def products(db):
+    rng = random.Random(7)
+    now = datetime.now()
+    products = [Product(sku=f"SKU-{position}", master_name=f"Product {position}") for position in range(40)]
+    db.add_all(products)
+    db.flush()
+    for product in products:
+        for location in ("warehouse_uk", "warehouse_ny"):
+            if rng.random() < 0.6:
+                db.add(Inventory(product_id=product.id, location=location, quantity_available=rng.randint(0, 40), quantity_reserved=0))
+        if rng.random() < 0.3:
+            db.add(ProductionOrder(product_id=product.id, quantity_to_produce=rng.randint(1, 50),
+                                   status=rng.choice(["planned", "in_production", "completed"])))
+    for number in range(120):
+        order = Order(order_number=f"ORD-{number}", platform="shopify",
+                      status=rng.choice(["pending", "processing", "confirmed", "completed", "shipped"]),
+                      order_date=now - timedelta(days=rng.randint(0, 200)),
+                      required_date=now + timedelta(days=rng.randint(-5, 60)))
+        db.add(order)
+        db.flush()
+        for _ in range(rng.randint(1, 4)):
+            db.add(OrderItem(order_id=order.id, product_id=rng.choice(products).id, quantity=rng.randint(1, 30)))
+    db.commit()
+    return products
+
+
+def test_tracked_inserts_build_the_read_model(db, session_factory, products):
+    assert len(read_model(db)) > 0
+    assert_current(session_factory)
+
+
+def test_order_status_change(db, session_factory, products):
+    for order in db.query(Order).order_by(Order.order_number).limit(30):
+        order.status = "completed" if order.status != "completed" else "pending"
+    db.commit()
+    assert_current(session_factory)
+
+
+def test_new_order_and_deleted_order(db, session_factory, products):
+    order = Order(order_number="NEW", platform="nuorder", status="pending", required_date=datetime.now())
+    db.add(order)
+    db.flush()
+    db.add(OrderItem(order_id=order.id, product_id=products[0].id, quantity=999))
+    db.commit()
+    assert_current(session_factory)
+
+    for item in db.query(OrderItem).filter(OrderItem.order_id == order.id):
+        db.delete(item)
+    db.delete(order)
+    db.commit()
+    assert_current(session_factory)
+
+
+def test_order_item_moved_to_another_product(db, session_factory, products):
+    item = db.query(OrderItem).join(Order).filter(Order.status == "pending").first()
+    item.product_id = next(product.id for product in products if product.id != item.product_id)
+    db.commit()
+    assert_current(session_factory)
+
+
+def test_inventory_and_production_orders(db, session_factory, products):
+    for inventory in db.query(Inventory).limit(20):
+        inventory.quantity_available += 25
+    db.add(ProductionOrder(product_id=products[1].id, quantity_to_produce=500, status="planned"))
+    db.commit()
+    assert_current(session_factory)
+
+
+def test_reservations_write_through_core_statements(db, session_factory, products):
+    inventory = db.query(Inventory).filter(Inventory.quantity_available >= 5).limit(10).all()
+    service = ReservationService(db)
+    results = service.reserve_many([
+        ReservationRequest(str(row.product_id), row.location, 5) for row in inventory
+    ])
+    assert all(result["reserved"] for result in results)
+    assert_current(session_factory)
+
+    service.release([result["reservation_id"] for result in results])
+    assert_current(session_factory)
+
+
+def test_refresh_overwrites_existing_rows(db, session_factory, products):
+    product_ids = [product.id for product in products]
+    before = read_model(db)
+    store = ProductionNeedsStore(db)
+    store.refresh(product_ids)
+    store.refresh(product_ids)
+    db.commit()
+    assert read_model(db) == before
+    assert_current(session_factory)
+
+
+def test_rollback_discards_tracked_changes(db, session_factory, products):
+    before = read_model(db)
+    order = db.query(Order).filter(Order.status == "pending").first()
+    order.status = "completed"
+    db.flush()
+    db.rollback()
+    db.commit()
+    assert read_model(db) == before
+    assert_current(session_factory)
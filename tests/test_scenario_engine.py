@@ -0,0 +1,73 @@
+# tests/test_scenario_engine.py
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from models import Inventory, Order, OrderItem, Product, ProductionNeed, ProductionOrder
+from services.scenario_engine import Scenario, ScenarioEngine
+
+
+@pytest.fixture
+def catalog(db):
+    rng = random.Random(11)
+    now = datetime.now()
+    products = [Product(sku=f"SKU-{position}", master_name=f"Product {position}") for position in range(30)]
+    db.add_all(products)
+    db.flush()
+    for product in products:
+        if rng.random() < 0.6:
+            db.add(Inventory(product_id=product.id, location="warehouse_uk", quantity_available=rng.randint(0, 40)))
+        if rng.random() < 0.4:
+            db.add(ProductionOrder(product_id=product.id, quantity_to_produce=rng.randint(1, 30), status="in_production",
+                                   factory_name=rng.choice(["Porto", "Leicester", None]),
+                                   expected_completion=now + timedelta(days=rng.randint(1, 60))))
+    for number in range(80):
+        order = Order(order_number=f"ORD-{number}", platform="shopify", status=rng.choice(["pending", "completed"]),
+                      order_date=now - timedelta(days=rng.randint(0, 120)), required_date=now + timedelta(days=rng.randint(1, 40)))
+        db.add(order)
+        db.flush()
+        for _ in range(rng.randint(1, 3)):
+            db.add(OrderItem(order_id=order.id, product_id=rng.choice(products).id, quantity=rng.randint(1, 20)))
+    db.commit()
+    return db
+
+
+def to_produce_by_product(result, column=0):
+    return {
+        product_id: row[column] for product_id, row in zip(result["products"]["product_id"], zip(*result["to_produce"]))
+    }
+
+
+def test_default_scenario_reproduces_the_current_plan(catalog):
+    result = ScenarioEngine(catalog).run([Scenario("current plan")])
+    # /production/calculate serves the production_needs read model
+    expected = {str(need.product_id): need.to_produce for need in catalog.query(ProductionNeed) if need.to_produce > 0}
+    assert expected and to_produce_by_product(result) == expected
+    assert result["totals"]["to_produce"] == [sum(expected.values())]
+
+
+def test_factory_delay_pushes_production_past_the_horizon(db):
+    product = Product(sku="SKU-1", master_name="Coat")
+    db.add(product)
+    db.flush()
+    order = Order(order_number="ORD-1", platform="shopify", status="pending", required_date=datetime.now())
+    db.add(order)
+    db.flush()
+    db.add(OrderItem(order_id=order.id, product_id=product.id, quantity=10))
+    db.add(ProductionOrder(product_id=product.id, quantity_to_produce=10, status="in_production", factory_name="Porto",
+                           expected_completion=datetime.now(timezone.utc) + timedelta(days=5)))
+    db.commit()
+
+    result = ScenarioEngine(db).run([
+        Scenario("on time", safety_stock_pct=0, horizon_days=7),
+        Scenario("porto late", safety_stock_pct=0, factory_delays={"Porto": 5}, horizon_days=7),
+        Scenario("other factory late", safety_stock_pct=0, factory_delays={"Leicester": 5}, horizon_days=7),
+    ])
+    assert result["totals"]["to_produce"] == [0, 10, 0]
+    assert result["totals"]["incoming_counted"] == [10, 0, 10]
+
+
+def test_scenarios_do_not_share_factory_delays():
+    first, second = Scenario("first"), Scenario("second")
+    assert first.factory_delays is None and second.factory_delays is None
@@ -0,0 +1,38 @@
+# tests/test_variant_normalizer.py
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+from services.variant_normalizer import VariantNormalizer
+
+MIGRATION = Path(__file__).resolve().parent.parent / "alembic" / "versions" / "6e2a9d4c1b87_canonical_variant_color_size.py"
+
+# Real colors a letter away from an alias, and misspellings that should still resolve
+COLORS = [
+    ("Ink", "Ink"),
+    ("Tan", "Tan"),
+    ("Red", "Red"),
+    ("Oat", "Oat"),
+    ("Teal", "Teal"),
+    ("Rust", "Rust"),
+    ("Plum", "Plum"),
+    ("blk", "Black"),
+    ("Blak", "Black"),
+    ("Burgandy", "Burgundy"),
+    ("dusty rose", "Dusty Rose"),
+]
+
+
+@pytest.mark.parametrize("raw, canonical", COLORS)
+def test_color(raw, canonical):
+    assert VariantNormalizer().color(raw) == canonical
+
+
+def test_migration_resolves_colors_like_the_service():
+    pytest.importorskip("alembic.op")  # the repo's alembic/ directory alone is not enough
+    spec = importlib.util.spec_from_file_location("canonical_variant_color_size", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    resolve = migration._resolver(migration.COLOR_ALIASES, fuzzy=True, casing=str.title)
+    assert [resolve(raw) for raw, _ in COLORS] == [canonical for _, canonical in COLORS]
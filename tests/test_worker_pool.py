@@ -0,0 +1,61 @@
+# tests/test_worker_pool.py
+import asyncio
+import threading
+
+import pytest
+
+from services.worker_pool import BoundedPool, PoolSaturated, pools
+
+
+@pytest.fixture
+def pool():
+    pool = BoundedPool("test", max_workers=1, max_queue=1)
+    yield pool
+    pool.shutdown()
+    pools.pop("test", None)
+
+
+def test_cancelled_caller_waits_for_its_call(pool):
+    started, release = threading.Event(), threading.Event()
+    events = []
+
+    def work():
+        started.set()
+        release.wait(5)
+        events.append("work finished")
+
+    async def request():
+        try:
+            await pool.run(work)
+        finally:
+            # Where get_db closes the request Session
+            events.append("request cleaned up")
+
+    async def main():
+        task = asyncio.create_task(request())
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        task.cancel()
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert events == ["work finished", "request cleaned up"]
+    assert pool.stats()["running"] == 0
+
+
+def test_saturated_pool_rejects(pool):
+    release = threading.Event()
+
+    async def main():
+        running = [asyncio.create_task(pool.run(release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(PoolSaturated):
+            await pool.run(release.wait, 5)
+        release.set()
+        await asyncio.gather(*running)
+
+    asyncio.run(main())
+    assert pool.rejected == 1